@@ -0,0 +1,33 @@
+# routers/jobs.py
+
+from fastapi import APIRouter, HTTPException, Query
+import logging
+
+from app.services.jobs import job_runner
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/jobs")
+async def list_jobs(status: str = Query(None, description="按状态筛选: queued / running / completed / failed")):
+    """列出后台任务（不包含任务参数）"""
+    return {
+        "stats": job_runner.stats(),
+        "jobs": [job.summary() for job in job_runner.list(status)]
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """返回后台任务的状态和进度"""
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    return job.summary()
+
+@router.get("/jobs/by_query/{query}")
+async def get_query_job(query: str, kind: str = Query("networks", description="任务类型")):
+    """返回查询的后台任务（未完成的优先，否则为最近完成的一个）"""
+    job = job_runner.find(kind, query)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"查询 {query} 没有后台任务")
+    return job.summary()
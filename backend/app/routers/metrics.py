@@ -0,0 +1,93 @@
+# routers/metrics.py
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+import logging
+
+from app.services.client import get_client
+from app.services.query_cache import query_cache
+from app.services.fetcher import fetch_flight
+from app.services.jobs import job_runner
+from app.services.metrics import registry, local_data_checks
+from app.routers.search import search_flight
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def collect_client():
+    """共享客户端：限流器、连接池和响应缓存"""
+    stats = get_client().stats()
+    limiter = stats["rate_limiter"]
+    cache = stats["response_cache"]
+    yield "client_in_flight", "gauge", "正在进行的上游请求数", [({}, stats["in_flight"])]
+    yield "client_connections_opened_total", "counter", "建立的上游连接数", [({}, stats["connections_opened"])]
+    yield "client_pool_connections", "gauge", "连接池中的连接数", [
+        ({"state": state}, stats["pool"][state]) for state in ("idle", "active")
+    ]
+    yield "rate_limiter_concurrency_limit", "gauge", "限流器当前的并发上限（AIMD 调整）", [
+        ({}, limiter["concurrency_limit"])
+    ]
+    yield "rate_limiter_in_flight", "gauge", "占用限流器并发槽位的请求数", [({}, limiter["in_flight"])]
+    yield "rate_limiter_tokens", "gauge", "令牌桶中剩余的令牌数", [({}, limiter["tokens"])]
+    yield "rate_limiter_acquired_total", "counter", "通过限流器的请求数", [({}, limiter["acquired_total"])]
+    yield "rate_limiter_throttled_total", "counter", "限流器收到的限流信号次数", [({}, limiter["throttled_total"])]
+    yield "response_cache_lookups_total", "counter", "响应缓存的查找次数", [
+        ({"result": result}, cache[key]) for result, key in (("hit", "hits"), ("miss", "misses"), ("expired", "expired"))
+    ]
+    yield "response_cache_bytes", "gauge", "响应缓存占用的字节数", [({}, cache["bytes"])]
+    yield "response_cache_entries", "gauge", "响应缓存的条目数（关闭时不输出）", [({}, cache["entries"])]
+
+
+def collect_query_cache():
+    """进程内查询缓存（论文数据、引用网络、索引）"""
+    stats = query_cache.stats()
+    yield "query_cache_lookups_total", "counter", "查询缓存的查找次数", [
+        ({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])
+    ]
+    yield "query_cache_evictions_total", "counter", "查询缓存淘汰的条目数", [({}, stats["evictions"])]
+    yield "query_cache_entries", "gauge", "查询缓存的条目数", [({}, stats["entries"])]
+    yield "query_cache_bytes", "gauge", "查询缓存估算占用的字节数", [({}, stats["bytes"])]
+
+
+def collect_coalescing():
+    """请求合并（single flight）"""
+    flights = (fetch_flight.stats(), search_flight.stats())
+    yield "coalescing_calls_total", "counter", "经过请求合并的调用数", [
+        ({"name": stats["name"]}, stats["calls"]) for stats in flights
+    ]
+    yield "coalescing_coalesced_total", "counter", "被合并到进行中请求的调用数", [
+        ({"name": stats["name"]}, stats["coalesced"]) for stats in flights
+    ]
+    yield "coalescing_in_flight", "gauge", "正在进行的合并请求数", [
+        ({"name": stats["name"]}, stats["in_flight"]) for stats in flights
+    ]
+
+
+def collect_jobs():
+    """后台任务队列"""
+    stats = job_runner.stats()
+    yield "jobs_queue_depth", "gauge", "等待执行的后台任务数", [({}, stats["queued"])]
+    yield "jobs_workers", "gauge", "后台任务的工作协程数", [({}, stats["workers"])]
+    yield "jobs", "gauge", "各状态的后台任务数", [
+        ({"status": status}, count) for status, count in sorted(stats["jobs"].items())
+    ]
+
+
+def collect_offline_ratio():
+    """hybrid 模式下本地数据完整、走离线路径的比例"""
+    checks = sum(local_data_checks.value(result=result) for result in ("complete", "partial", "missing", "error"))
+    ratio = local_data_checks.value(result="complete") / checks if checks else None
+    yield "offline_hit_ratio", "gauge", "check_local_data 判定本地数据完整的比例", [({}, ratio)]
+
+
+for collector in (collect_client, collect_query_cache, collect_coalescing, collect_jobs, collect_offline_ratio):
+    registry.register_collector(collector)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 格式的运行指标（上游请求、限流、缓存、任务队列、各阶段耗时等）"""
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
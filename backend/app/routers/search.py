@@ -1,10 +1,10 @@
 import asyncio
 import logging
-from datetime import datetime
 from fastapi import APIRouter, Query, HTTPException
-from typing import List, Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Callable
 import json
-import os
+from collections import Counter
 from pathlib import Path
 
 # 这里的 import 需要根据你的项目实际结构做调整
@@ -16,36 +16,50 @@ from config import (
     QUERIES_DIR,
     SearchMode,  # 添加这个导入
     NETWORK_CACHE_SIZE,
-    NETWORK_MINIMUM_REQUIRED
+    NETWORK_MINIMUM_REQUIRED,
+    SIMPLIFIED_PAPER_COUNT,
+    TEXT_INDEX_COVERAGE_THRESHOLD,
+    NETWORK_FRESHNESS_TTL,
+    NETWORK_PREFETCH_IN_BACKGROUND,
+    ADAPTIVE_FETCH_ENABLED,
+    ADAPTIVE_FETCH_CONFIDENCE,
+    ADAPTIVE_FETCH_MIN_PAGES,
+    ADAPTIVE_FETCH_WINDOW_PAGES
 )
+from app.services.client import get_client
 from app.services.fetcher import (
-    get_client,
     fetch_papers_from_multiple_sources,
+    fetch_networks_batch,
     # 如果你还用到了 fetch_paper_details 等，可一并导入
 )
-from app.services.scorer import calculate_paper_score
-from app.routers.paper import get_paper_citations, get_paper_references  # 添加 get_paper_references
+from app.services.scorer import ensure_scores
+from app.services.paper_store import get_store, has_papers, save_papers
+from app.services.network_store import open_network_store, get_network_db
+from app.services.graph_index import get_graph_index
+from app.services.text_index import get_text_index
+from app.services.network_prefetch import prefetch_networks
+from app.services.ranking import IncrementalTopK, AdaptiveFetchEstimator
+from app.services.jobs import Job, job_runner
+from app.services.single_flight import SingleFlight, KeyedLock
+from app.services.persistence import run_io, NetworkWriteBehind
+from app.services.result_pages import get_ranked_results, decode_cursor
+from app.services.metrics import (
+    local_data_checks, search_sources, record_bytes, timed_block, timed_semaphore, timed_stage
+)
+from app.services.tracing import span, traced
+from app.services.search_stats import stats_from_papers, get_search_stats, format_stats
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 async def save_search_results(query: str, papers: list, paper_networks: dict = None):
     """保存所有搜索结果，不考虑筛选条件"""
-    # 1. 保存所有论文数据
-    papers_file = os.path.join(QUERIES_DIR, query, "papers.json")
-    with open(papers_file, 'w', encoding='utf-8') as f:
-        json.dump(papers, f, ensure_ascii=False, indent=2)
-    
+    # 1. 评分（已评分的论文直接复用）并保存所有论文数据（在 I/O 线程池中进行）
+    await run_io(save_papers, query, papers)
+
     # 2. 获取评分最高的N篇论文（不考虑筛选条件）
-    all_scored_papers = []
-    for paper in papers:
-        try:
-            score = calculate_paper_score(paper)
-            paper["score"] = score
-            all_scored_papers.append(paper)
-        except Exception as e:
-            continue
-            
+    all_scored_papers = [paper for paper in papers if paper.get("score") is not None]
+
     # 按评分排序，取前N篇
     all_scored_papers.sort(key=lambda x: x["score"], reverse=True)
     top_papers = all_scored_papers[:NETWORK_CACHE_SIZE]
@@ -62,49 +76,35 @@ async def save_search_results(query: str, papers: list, paper_networks: dict = N
         # 获取这些论文的引用网络
         # ... 获取逻辑 ...
 
+@traced("check_local_data")
 async def check_local_data(query: str) -> tuple[bool, set, int]:
     """检查本地数据完整性"""
     try:
-        query_dir = os.path.join(QUERIES_DIR, query)
-        papers_file = os.path.join(query_dir, "papers.json")
-        networks_dir = os.path.join(query_dir, "networks")
-        
-        if not all(os.path.exists(p) for p in [query_dir, papers_file, networks_dir]):
+        if not has_papers(query):
+            local_data_checks.inc(result="missing")
             return False, set(), 0
             
-        # 1. 读取并筛选论文
-        with open(papers_file, 'r', encoding='utf-8') as f:
-            all_papers = json.load(f)
-            
+        # 1. 打开列式存储（只读取分数列，不解析论文数据）
+        store = await run_io(get_store, query)
+
         # 计算合格论文数量
-        qualified_papers = []
-        for paper in all_papers:
-            try:
-                score = calculate_paper_score(paper)
-                if score >= MIN_SCORE_THRESHOLD:
-                    qualified_papers.append(paper)
-            except Exception:
-                continue
-                
-        total_qualified = len(qualified_papers)  # 合格论文总数
-        
+        total_qualified = store.count_qualified(MIN_SCORE_THRESHOLD)  # 合格论文总数
+
         # 2. 检查引用网络完整性
-        existing_ids = {
-            f.replace('.json', '') 
-            for f in os.listdir(networks_dir) 
-            if f.endswith('.json')
-        }
+        network_store = await run_io(open_network_store, query)
+        existing_ids = await run_io(network_store.ids)
         
         # 3. 判断完整性：
         # - 如果合格论文数 < NETWORK_MINIMUM_REQUIRED，需要所有合格论文的引用网络
         # - 否则需要至少 NETWORK_MINIMUM_REQUIRED 篇
         required_count = min(NETWORK_MINIMUM_REQUIRED, total_qualified)
         is_complete = len(existing_ids) >= required_count
+        local_data_checks.inc(result="complete" if is_complete else "partial")
         
         if is_complete:
             logger.info(f"""
             本地数据检查完成:
-            总论文数: {len(all_papers)}
+            总论文数: {len(store)}
             合格论文数: {total_qualified}
             已有引用网络数: {len(existing_ids)}
             状态: 完整
@@ -113,9 +113,11 @@ async def check_local_data(query: str) -> tuple[bool, set, int]:
         return is_complete, existing_ids, total_qualified
         
     except Exception as e:
+        local_data_checks.inc(result="error")
         logger.error(f"检查本地数据时出错: {str(e)}")
         return False, set(), 0
 
+@traced("papers_txt")
 def generate_simplified_paper_txt(papers: List[Dict[Any, Any]], output_path: Path) -> None:
     """
     生成简化版的论文信息txt文件，只保留前150篇高分论文
@@ -128,7 +130,7 @@ def generate_simplified_paper_txt(papers: List[Dict[Any, Any]], output_path: Pat
     sorted_papers = sorted(papers, key=lambda x: x.get('score', 0), reverse=True)
     
     # 只取前150篇
-    top_papers = sorted_papers[:150]
+    top_papers = sorted_papers[:SIMPLIFIED_PAPER_COUNT]
     
     # 准备简化的论文数据
     simplified_papers = []
@@ -163,6 +165,7 @@ def generate_simplified_paper_txt(papers: List[Dict[Any, Any]], output_path: Pat
             paper_str += f"    score: {paper['score']}\n"
             paper_str += "},\n"
             f.write(paper_str)
+    record_bytes("papers_txt", "written", output_path.stat().st_size)
             
     logger.info(f"""
 ====== 生成精简版论文数据 ======
@@ -171,6 +174,372 @@ def generate_simplified_paper_txt(papers: List[Dict[Any, Any]], output_path: Pat
 分数范围: {simplified_papers[0]['score']:.2f} - {simplified_papers[-1]['score']:.2f}
     """)
 
+def score_and_filter(papers: list, min_year: int = None, min_citations: int = None,
+                     min_score: float = MIN_SCORE_THRESHOLD) -> list:
+    """
+    按年份和引用量筛选论文并批量评分
+    每篇通过筛选的论文都会被写入 'score'，返回分数 >= min_score 的论文（保持原有顺序）
+    """
+    candidates = []
+    for paper in papers:
+        try:
+            # 年份和引用量筛选
+            paper_year = paper.get("year")
+            if paper_year is not None:
+                try:
+                    paper_year = int(paper_year)
+                except (ValueError, TypeError):
+                    continue
+
+            citations = paper.get("citationCount", 0)
+            try:
+                citations = int(citations)
+            except (ValueError, TypeError):
+                citations = 0
+
+            # 筛选条件
+            if min_year and (paper_year is None or paper_year < min_year):
+                continue
+            if min_citations and citations < min_citations:
+                continue
+
+            candidates.append(paper)
+
+        except Exception as e:
+            logger.warning(f"处理论文时出错: {str(e)}, paper: {paper.get('paperId', 'unknown')}")
+            continue
+
+    # 只为缺少分数或分数过期的论文评分（一次性向量化计算），其余直接使用已保存的分数
+    ensure_scores(candidates)
+
+    qualified_papers = []
+    for paper in candidates:
+        score = paper.get("score")
+        if score is None:
+            logger.warning(f"处理论文时出错: 无法计算评分, paper: {paper.get('paperId', 'unknown')}")
+            continue
+
+        # 如果分数>=阈值，则加入合格列表
+        if score >= min_score:
+            qualified_papers.append(paper)
+    return qualified_papers
+
+def format_paper_result(paper: dict) -> dict:
+    """把原始论文数据转换为返回给前端的格式"""
+    return {
+        "id": paper.get("paperId", ""),
+        "title": paper.get("title", "无标题"),
+        "authors": [author.get("name", "") for author in paper.get("authors", [])],
+        "abstract": paper.get("abstract") or "暂无摘要",
+        "year": paper.get("year", "未知"),
+        "journal": paper.get("venue") or "未知期刊",
+        "citations": paper.get("citationCount", 0),
+        "url": paper.get("url", ""),
+        "pdf_url": (paper.get("openAccessPdf") or {}).get("url", ""),
+        "fields": paper.get("fieldsOfStudy", []),
+        "publication_types": paper.get("publicationTypes", []),
+        "publication_date": paper.get("publicationDate", ""),
+        "references": [],
+        "citations_list": [],
+        "keywords": [],
+        "score": paper["score"],
+        "source": paper.get("source", "unknown")
+    }
+
+@timed_stage("persist")
+async def save_search_papers(query: str, all_papers: list, qualified_papers: list,
+                             paper_networks: dict = None):
+    """保存论文数据和简化版 papers.txt（不获取引用网络）"""
+    # 保存所有数据
+    await save_search_results(query, all_papers, paper_networks)
+    logger.info(f"已将搜索结果保存到本地: {query}")
+
+    # 在保存papers.json之后，生成简化版txt文件
+    query_dir = Path(QUERIES_DIR) / query
+    if not query_dir.exists():
+        query_dir.mkdir(parents=True)
+
+    # 保存原始json文件（分数和评分版本一并保存，之后读取时无需重新评分）
+    await run_io(save_papers, query, qualified_papers)
+
+    # 生成简化版txt文件
+    papers_txt_path = query_dir / "papers.txt"
+    await run_io(generate_simplified_paper_txt, qualified_papers, papers_txt_path)
+
+    logger.info(f"Generated simplified papers.txt at {papers_txt_path}")
+
+@timed_stage("graph_index")
+async def build_graph_index(query: str):
+    """论文和引用网络都已保存，预先构建 /citation_network 使用的引用关系索引"""
+    try:
+        await run_io(get_graph_index, query)
+    except Exception as e:
+        logger.warning(f"构建引用关系索引失败: {str(e)}")
+
+async def persist_search_results(query: str, all_papers: list, qualified_papers: list,
+                                 on_progress: Callable[[dict], None] = None) -> dict:
+    """获取合格论文的引用网络，并保存 papers.json 和简化版 papers.txt"""
+    # 在获取引用网络的部分
+    paper_networks = await get_citation_networks(
+        query=query,
+        papers=qualified_papers,  # 传入已经排序的合格论文
+        required_count=NETWORK_CACHE_SIZE,
+        on_progress=on_progress
+    )
+
+    # 如果获取的数据不够，记录警告但不中断流程
+    if len(paper_networks) < NETWORK_MINIMUM_REQUIRED:
+        logger.warning(f"未能获取足够的引用网络数据: {len(paper_networks)}/{NETWORK_MINIMUM_REQUIRED}")
+
+    await save_search_papers(query, all_papers, qualified_papers, paper_networks)
+    await build_graph_index(query)
+    return paper_networks
+
+async def run_network_job(job: Job, report: Callable[[dict], None]) -> dict:
+    """后台任务：获取查询中高分论文的引用网络（已有的网络直接复用，因此重启后可以接着完成）"""
+    paper_ids = job.params.get("paper_ids") or []
+    paper_networks = await get_citation_networks(
+        query=job.key,
+        papers=[{"paperId": paper_id} for paper_id in paper_ids],
+        required_count=len(paper_ids),
+        on_progress=report
+    )
+    if len(paper_networks) < min(NETWORK_MINIMUM_REQUIRED, len(paper_ids)):
+        logger.warning(f"未能获取足够的引用网络数据: {len(paper_networks)}/{NETWORK_MINIMUM_REQUIRED}")
+    await build_graph_index(job.key)
+    return {"required": len(paper_ids), "completed": len(paper_networks)}
+
+job_runner.register("networks", run_network_job)
+
+async def persist_search_results_in_background(query: str, all_papers: list, qualified_papers: list) -> Job:
+    """保存论文数据后立即返回，引用网络交给后台任务获取（同一查询的任务会被合并）"""
+    await save_search_papers(query, all_papers, qualified_papers)
+    paper_ids = [paper.get("paperId") for paper in qualified_papers[:NETWORK_CACHE_SIZE] if paper.get("paperId")]
+    return job_runner.submit("networks", query, {"paper_ids": paper_ids})
+
+def build_search_response(query: str, all_papers: list, qualified_papers: list,
+                          processed_papers: list, min_score: float, total_fetched: int,
+                          stats: dict = None) -> dict:
+    """构建在线搜索的返回结果（stats 为已经计算好的统计信息，没有时在这里计算）"""
+    return {
+        "query": query,
+        "total_available": len(all_papers),
+        "qualified_papers": len(qualified_papers),
+        "showing": len(processed_papers),
+        "min_score": min_score,
+        "results": processed_papers,
+        "total_fetched": total_fetched,
+        "sources_stats": dict(Counter(pp.get("source", "unknown") for pp in qualified_papers)),
+        "stats": stats if stats is not None else stats_from_papers(qualified_papers)
+    }
+
+def log_search_summary(query: str, all_papers: list, qualified_papers: list, processed_papers: list,
+                       min_score: float, stats: dict):
+    """在线搜索的结果统计和前5篇论文示例（调用方先检查日志级别）"""
+    logger.info(f"""
+    ====== 搜索结果统计 ======
+    关键词: {query}
+    检索到的总论文数: {len(all_papers)}
+    符合质量要求的论文数: {len(qualified_papers)}
+    实际展示的论文数: {len(processed_papers)}
+    最低分数要求: {min_score}
+    """)
+
+    logger.info("\n====== 前5篇论文示例 ======")
+    for i, paper in enumerate(qualified_papers[:5]):
+        try:
+            # 确保 fieldsOfStudy 是一个列表
+            fields = paper.get('fieldsOfStudy', [])
+            if not isinstance(fields, (list, tuple)):
+                fields = [str(fields)] if fields else []
+
+            # 确保作者列表是可迭代的
+            authors = paper.get('authors', [])
+            if not isinstance(authors, (list, tuple)):
+                authors = [authors] if authors else []
+
+            author_names = [
+                author.get('name', '') if isinstance(author, dict) else str(author)
+                for author in authors
+            ]
+
+            logger.info(f"""
+            论文 {i+1}:
+            标题: {paper.get('title', '无标题')}
+            作者: {', '.join(filter(None, author_names))}
+            年份: {paper.get('year', '未知')}
+            期刊/会议: {paper.get('venue', '未知')}
+            引用数: {paper.get('citationCount', 0)}
+            评分: {paper.get('score', 0)}
+            来源: {paper.get('source', 'unknown')}
+            研究领域: {', '.join(filter(None, fields))}
+            """)
+        except Exception as e:
+            logger.warning(f"处理论文信息时出错: {str(e)}, paper_id: {paper.get('paperId', 'unknown')}")
+
+    logger.info("\n" + format_stats(stats))
+
+@timed_stage("fetch")
+async def fetch_papers_fixed(client, query: str, fetch_size: int) -> tuple[list, dict]:
+    """按 100 篇一页获取全部 fetch_size 篇论文，每 MAX_PARALLEL_REQUESTS 页并行一批"""
+    # 用于收集所有论文
+    all_papers = []
+    batch_size = 100
+    total_fetched = 0
+
+    # 暂存一批批 fetch 的协程
+    fetch_tasks = []
+
+    # 1. 分批创建并行任务
+    while total_fetched < fetch_size:
+        current_limit = min(batch_size, fetch_size - total_fetched)
+        task = fetch_papers_from_multiple_sources(
+            client,
+            query,
+            offset=total_fetched,
+            limit=current_limit
+        )
+        fetch_tasks.append(task)
+        total_fetched += current_limit
+
+        # 每到达 MAX_PARALLEL_REQUESTS 就并行执行一批，防止过多并发
+        if len(fetch_tasks) >= MAX_PARALLEL_REQUESTS:
+            batch_results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
+            # 检查结果
+            for res in batch_results:
+                if isinstance(res, Exception):
+                    # 如果是 HTTPException，可能是 429/4xx/5xx
+                    if isinstance(res, HTTPException):
+                        logger.error(f"出现 HTTP 错误: {res.status_code}, {res.detail}")
+                        # 你可以选择直接 raise，让前端收到对应状态码
+                        raise res
+                    else:
+                        # 其他异常，记录日志后可跳过
+                        logger.error(f"fetch error: {str(res)}")
+                    continue
+                # 如果是正常的返回 (list of papers)
+                all_papers.extend(res)
+            # 清空本批次任务
+            fetch_tasks = []
+
+    # 处理剩余的任务（不足 MAX_PARALLEL_REQUESTS 的最后一批）
+    if fetch_tasks:
+        batch_results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
+        for res in batch_results:
+            if isinstance(res, Exception):
+                if isinstance(res, HTTPException):
+                    logger.error(f"出现 HTTP 错误: {res.status_code}, {res.detail}")
+                    raise res
+                else:
+                    logger.error(f"fetch error: {str(res)}")
+                continue
+            all_papers.extend(res)
+
+    pages = -(-fetch_size // batch_size)
+    return all_papers, {
+        "mode": "fixed",
+        "requested": total_fetched,
+        "pages_total": pages,
+        "pages_fetched": pages,
+        "pages_skipped": 0
+    }
+
+@timed_stage("fetch")
+async def fetch_papers_adaptive(
+    client,
+    query: str,
+    fetch_size: int,
+    top_k: int,
+    min_year: int = None,
+    min_citations: int = None,
+    min_score: float = MIN_SCORE_THRESHOLD,
+    confidence: float = ADAPTIVE_FETCH_CONFIDENCE
+) -> tuple[list, dict]:
+    """
+    自适应地分页获取论文：最多 MAX_PARALLEL_REQUESTS 页同时请求，每页到达后评分并更新 top-k，
+    估计剩余页面还能进入 top-k 的论文数，足够少时不再请求新的页（已发出的请求照常完成）。
+    上游返回的论文不足一页时说明结果已经取完，同样停止。
+
+    Returns:
+        (all_papers, fetch_stats)：论文按偏移顺序排列；fetch_stats 包含获取和跳过的页数
+    """
+    batch_size = 100
+    offsets = [
+        (offset, min(batch_size, fetch_size - offset))
+        for offset in range(0, fetch_size, batch_size)
+    ]
+    estimator = AdaptiveFetchEstimator(
+        top_k, confidence, min_pages=ADAPTIVE_FETCH_MIN_PAGES, window_pages=ADAPTIVE_FETCH_WINDOW_PAGES
+    )
+
+    async def fetch_page(offset: int, limit: int):
+        papers = await fetch_papers_from_multiple_sources(client, query, offset=offset, limit=limit)
+        return offset, limit, papers
+
+    pages = {}
+    pending = set()
+    launched = 0
+    stop_reason = None
+    try:
+        while True:
+            while stop_reason is None and launched < len(offsets) and len(pending) < MAX_PARALLEL_REQUESTS:
+                pending.add(asyncio.create_task(fetch_page(*offsets[launched])))
+                launched += 1
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    offset, limit, papers = task.result()
+                except HTTPException as e:
+                    logger.error(f"出现 HTTP 错误: {e.status_code}, {e.detail}")
+                    raise
+                except Exception as e:
+                    logger.error(f"fetch error: {str(e)}")
+                    continue
+                pages[offset] = papers
+                estimator.add_page(offset, len(papers), score_and_filter(papers, min_year, min_citations, min_score))
+                if 0 < len(papers) < limit and stop_reason is None:
+                    stop_reason = "exhausted"
+
+            if stop_reason is None and launched < len(offsets):
+                remaining = sum(limit for _, limit in offsets[launched:])
+                if estimator.should_stop(remaining):
+                    stop_reason = "top_k_stable"
+    finally:
+        for task in pending:
+            task.cancel()
+
+    all_papers = [paper for offset in sorted(pages) for paper in pages[offset]]
+    fetch_stats = {
+        "mode": "adaptive",
+        "requested": sum(limit for _, limit in offsets[:launched]),
+        "pages_total": len(offsets),
+        "pages_fetched": launched,
+        "pages_skipped": len(offsets) - launched,
+        "stop_reason": stop_reason,
+        "confidence": confidence,
+        "expected_entrants": (
+            round(estimator.expected_entrants, 3) if estimator.expected_entrants is not None else None
+        )
+    }
+    logger.info(
+        f"自适应获取: 共 {len(offsets)} 页, 获取 {launched} 页, 跳过 {len(offsets) - launched} 页, "
+        f"停止原因: {stop_reason}"
+    )
+    return all_papers, fetch_stats
+
+def normalize_query(query: str) -> str:
+    """合并请求时使用的查询 key：合并空白字符（大小写不变）"""
+    return " ".join(query.split())
+
+# 相同查询（规范化后）和相同筛选条件的并发搜索只执行一次
+search_flight = SingleFlight("search_papers")
+# 同一查询目录同时只有一个搜索在执行（/search_papers 和 /search_papers/stream 共用），
+# 后到的请求等前一个保存完成后重新检查本地数据，不会同时写入相同的文件
+search_locks = KeyedLock("search_papers")
+
 @router.get("/search_papers")
 async def search_papers(
     query: str = Query(..., description="搜索关键词"),
@@ -178,7 +547,32 @@ async def search_papers(
     min_citations: int = Query(None, description="最少引用数"),
     top_k: int = Query(60, description="返回结果数量"),
     fetch_size: int = Query(DEFAULT_FETCH_SIZE, description="实际获取的论文数量"),
-    min_score: float = Query(MIN_SCORE_THRESHOLD, description="最低质量分数")
+    min_score: float = Query(MIN_SCORE_THRESHOLD, description="最低质量分数"),
+    adaptive: bool = Query(ADAPTIVE_FETCH_ENABLED, description="top-k 稳定后提前停止获取"),
+    confidence: float = Query(ADAPTIVE_FETCH_CONFIDENCE, ge=0.5, le=1.0, description="自适应获取的置信度")
+):
+    """
+    搜索论文；同一查询的并发请求共享一次执行（包括上游请求和结果保存）
+    """
+    # 规范化的查询只用于合并请求，数据目录仍按原始查询（与其他接口和已保存的数据一致）
+    key = (normalize_query(query), min_year, min_citations, top_k, fetch_size, min_score, adaptive, confidence)
+    return await search_flight.do(key, lambda: run_locked_search(
+        query, min_year, min_citations, top_k, fetch_size, min_score, adaptive, confidence
+    ))
+
+async def run_locked_search(query: str, *args):
+    async with search_locks.hold(query):
+        return await run_search_papers(query, *args)
+
+async def run_search_papers(
+    query: str,
+    min_year: int = None,
+    min_citations: int = None,
+    top_k: int = 60,
+    fetch_size: int = DEFAULT_FETCH_SIZE,
+    min_score: float = MIN_SCORE_THRESHOLD,
+    adaptive: bool = ADAPTIVE_FETCH_ENABLED,
+    confidence: float = ADAPTIVE_FETCH_CONFIDENCE
 ):
     """
     这是重构后的搜索路由，核心逻辑与原先相同，只做了以下改动：
@@ -201,6 +595,7 @@ async def search_papers(
             
             if is_complete:
                 logger.info(f"找到完整的本地数据（主题总论文数: {total_papers}），使用离线模式")
+                search_sources.inc(source="offline")
                 return await search_papers_offline(
                     query=query,
                     min_year=min_year,
@@ -211,278 +606,253 @@ async def search_papers(
             elif existing_ids:
                 logger.info(f"找到部分本地数据({len(existing_ids)}/{total_papers}篇)，将混合使用本地和在线数据")
             else:
+                # 没有这个查询的本地数据时，看其他查询的本地语料能否覆盖它
+                result = await search_papers_from_index(
+                    query, min_year=min_year, min_citations=min_citations,
+                    top_k=top_k, fetch_size=fetch_size, min_score=min_score
+                )
+                if result is not None:
+                    search_sources.inc(source="local_index")
+                    return result
                 logger.info("本地无数据，使用在线模式")
         
         # 在线模式或本地数据不完整时的处理
         if SEARCH_MODE in [SearchMode.ONLINE, SearchMode.HYBRID]:
-            async with await get_client() as client:
-                # 用于收集所有论文
-                all_papers = []
-                batch_size = 100
-                total_fetched = 0
-
-                # 暂存一批批 fetch 的协程
-                fetch_tasks = []
-
-                # 1. 分批创建并行任务
-                while total_fetched < fetch_size:
-                    current_limit = min(batch_size, fetch_size - total_fetched)
-                    task = fetch_papers_from_multiple_sources(
-                        client,
-                        query,
-                        offset=total_fetched,
-                        limit=current_limit
-                    )
-                    fetch_tasks.append(task)
-                    total_fetched += current_limit
-
-                    # 每到达 MAX_PARALLEL_REQUESTS 就并行执行一批，防止过多并发
-                    if len(fetch_tasks) >= MAX_PARALLEL_REQUESTS:
-                        batch_results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
-                        # 检查结果
-                        for res in batch_results:
-                            if isinstance(res, Exception):
-                                # 如果是 HTTPException，可能是 429/4xx/5xx
-                                if isinstance(res, HTTPException):
-                                    logger.error(f"出现 HTTP 错误: {res.status_code}, {res.detail}")
-                                    # 你可以选择直接 raise，让前端收到对应状态码
-                                    raise res
-                                else:
-                                    # 其他异常，记录日志后可跳过
-                                    logger.error(f"fetch error: {str(res)}")
-                                continue
-                            # 如果是正常的返回 (list of papers)
-                            all_papers.extend(res)
-                        # 清空本批次任务
-                        fetch_tasks = []
-
-                # 处理剩余的任务（不足 MAX_PARALLEL_REQUESTS 的最后一批）
-                if fetch_tasks:
-                    batch_results = await asyncio.gather(*fetch_tasks, return_exceptions=True)
-                    for res in batch_results:
-                        if isinstance(res, Exception):
-                            if isinstance(res, HTTPException):
-                                logger.error(f"出现 HTTP 错误: {res.status_code}, {res.detail}")
-                                raise res
-                            else:
-                                logger.error(f"fetch error: {str(res)}")
-                            continue
-                        all_papers.extend(res)
-
-                # 2. 评分和筛选
-                qualified_papers = []
-                for paper in all_papers:
-                    try:
-                        # 年份和引用量筛选
-                        paper_year = paper.get("year")
-                        if paper_year is not None:
-                            try:
-                                paper_year = int(paper_year)
-                            except (ValueError, TypeError):
-                                continue
-                        
-                        citations = paper.get("citationCount", 0)
-                        try:
-                            citations = int(citations)
-                        except (ValueError, TypeError):
-                            citations = 0
-                        
-                        # 筛选条件
-                        if min_year and (paper_year is None or paper_year < min_year):
-                            continue
-                        if min_citations and citations < min_citations:
-                            continue
+            # 使用全局共享的客户端（连接池由应用生命周期管理，这里不能关闭）
+            client = get_client()
+            search_sources.inc(source="online")
 
-                        # 计算分数 -> 先赋值
-                        score = calculate_paper_score(paper)
-                        paper["score"] = score  # 给每篇paper都添加score
-
-                        # 如果分数>=阈值，则加入合格列表
-                        if score >= min_score:
-                            qualified_papers.append(paper)
+            # 1. 分批获取论文（自适应模式下 top-k 稳定后提前停止翻页）
+            if adaptive:
+                all_papers, fetch_stats = await fetch_papers_adaptive(
+                    client, query, fetch_size, top_k, min_year, min_citations, min_score, confidence
+                )
+            else:
+                all_papers, fetch_stats = await fetch_papers_fixed(client, query, fetch_size)
+            total_fetched = fetch_stats["requested"]
 
-                    except Exception as e:
-                        logger.warning(f"处理论文时出错: {str(e)}, paper: {paper.get('paperId', 'unknown')}")
-                        continue
+            # 2. 评分和筛选
+            with timed_block("score"):
+                qualified_papers = score_and_filter(all_papers, min_year, min_citations, min_score)
 
                 # 按score排序（一定不会再KeyError了）
                 qualified_papers.sort(key=lambda x: x["score"], reverse=True)
-                top_papers = qualified_papers[:top_k]
-
-                # 3. (可选) 并行获取每篇论文的引用信息
-                processed_papers = []
-                citation_tasks = []
-                for paper in top_papers:
-                    paper_data = {
-                        "id": paper.get("paperId", ""),
-                        "title": paper.get("title", "无标题"),
-                        "authors": [author.get("name", "") for author in paper.get("authors", [])],
-                        "abstract": paper.get("abstract") or "暂无摘要",
-                        "year": paper.get("year", "未知"),
-                        "journal": paper.get("venue") or "未知期刊",
-                        "citations": paper.get("citationCount", 0),
-                        "url": paper.get("url", ""),
-                        "pdf_url": (paper.get("openAccessPdf") or {}).get("url", ""),
-                        "fields": paper.get("fieldsOfStudy", []),
-                        "publication_types": paper.get("publicationTypes", []),
-                        "publication_date": paper.get("publicationDate", ""),
-                        "references": [],
-                        "citations_list": [],
-                        "keywords": [],
-                        "score": paper["score"],      # 我们已经赋值了
-                        "source": paper.get("source", "unknown")
-                    }
-
-                    # 如果还想获取更多引用信息，可以和 fetch_paper_details(client, paperId) 结合
-                    # citation_tasks.append(fetch_paper_details(client, paper.get("paperId")))
-
-                    processed_papers.append(paper_data)
-
-                # 如果你开启了 citation_tasks，这里就 await 结果
-                # citation_results = await asyncio.gather(*citation_tasks, return_exceptions=True)
-                # 处理引用信息 -> 略
-
-                # 2. 搜索结果统计
-                logger.info(f"""
-                ====== 搜索结果统计 ======
-                关键词: {query}
-                检索到的总论文数: {len(all_papers)}
-                符合质量要求的论文数: {len(qualified_papers)}
-                实际展示的论文数: {len(processed_papers)}
-                最低分数要求: {min_score}
-                """)
+            top_papers = qualified_papers[:top_k]
 
-                # 3. 前5篇论文示例
-                logger.info("\n====== 前5篇论文示例 ======")
-                for i, paper in enumerate(qualified_papers[:5]):
-                    try:
-                        # 确保 fieldsOfStudy 是一个列表
-                        fields = paper.get('fieldsOfStudy', [])
-                        if not isinstance(fields, (list, tuple)):
-                            fields = [str(fields)] if fields else []
-                            
-                        # 确保作者列表是可迭代的
-                        authors = paper.get('authors', [])
-                        if not isinstance(authors, (list, tuple)):
-                            authors = [authors] if authors else []
-                            
-                        author_names = [
-                            author.get('name', '') if isinstance(author, dict) else str(author)
-                            for author in authors
-                        ]
-                        
-                        logger.info(f"""
-                        论文 {i+1}:
-                        标题: {paper.get('title', '无标题')}
-                        作者: {', '.join(filter(None, author_names))}
-                        年份: {paper.get('year', '未知')}
-                        期刊/会议: {paper.get('venue', '未知')}
-                        引用数: {paper.get('citationCount', 0)}
-                        评分: {paper.get('score', 0)}
-                        来源: {paper.get('source', 'unknown')}
-                        研究领域: {', '.join(filter(None, fields))}
-                        """)
-                    except Exception as e:
-                        logger.warning(f"处理论文信息时出错: {str(e)}, paper_id: {paper.get('paperId', 'unknown')}")
-                        continue
-
-                # 4. 分数分布统计
-                scores = [p.get('score', 0) for p in qualified_papers]
-                if scores:
-                    logger.info(f"""
-                                ====== 分数统计 ======
-                                最高分: {max(scores):.2f}
-                                最低分: {min(scores):.2f}
-                                平均分: {sum(scores)/len(scores):.2f}
-                                分数分布:
-                                90-100: {len([s for s in scores if s >= 90])}篇
-                                80-90: {len([s for s in scores if 80 <= s < 90])}篇
-                                70-80: {len([s for s in scores if 70 <= s < 80])}篇
-                                60-70: {len([s for s in scores if 60 <= s < 70])}篇
-                                50-60: {len([s for s in scores if 50 <= s < 60])}篇
-                                <50: {len([s for s in scores if s < 50])}篇
-                                """)
-
-                # 5. 年份分布
-                years = [p.get('year') for p in qualified_papers if p.get('year')]
-                if years:
-                    current_year = datetime.now().year
-                    logger.info(f"""
-                                ====== 年份分布 ======
-                                最新: {max(years)}
-                                最早: {min(years)}
-                                近1年: {len([y for y in years if y >= current_year - 1])}篇
-                                近3年: {len([y for y in years if y >= current_year - 3])}篇
-                                近5年: {len([y for y in years if y >= current_year - 5])}篇
-                                5年以上: {len([y for y in years if y < current_year - 5])}篇
-                                """)
-
-                # 在获取引用网络的部分
-                paper_networks = await get_citation_networks(
-                    query=query,
-                    papers=qualified_papers,  # 传入已经排序的合格论文
-                    required_count=NETWORK_CACHE_SIZE
-                )
+            # 3. (可选) 并行获取每篇论文的引用信息
+            processed_papers = []
+            citation_tasks = []
+            for paper in top_papers:
+                paper_data = format_paper_result(paper)
+
+                # 如果还想获取更多引用信息，可以和 fetch_paper_details(client, paperId) 结合
+                # citation_tasks.append(fetch_paper_details(client, paper.get("paperId")))
+
+                processed_papers.append(paper_data)
+
+            # 如果你开启了 citation_tasks，这里就 await 结果
+            # citation_results = await asyncio.gather(*citation_tasks, return_exceptions=True)
+            # 处理引用信息 -> 略
+
+            # 2. 统计信息：日志和返回结果共用，只计算一次；日志级别高于 INFO 时不格式化任何日志
+            with span("stats"):
+                stats = stats_from_papers(qualified_papers)
+            if logger.isEnabledFor(logging.INFO):
+                log_search_summary(query, all_papers, qualified_papers, processed_papers, min_score, stats)
+
+            # 获取引用网络并保存所有数据（后台模式下只保存论文，引用网络由后台任务继续获取）
+            network_job = None
+            if NETWORK_PREFETCH_IN_BACKGROUND:
+                network_job = await persist_search_results_in_background(query, all_papers, qualified_papers)
+            else:
+                await persist_search_results(query, all_papers, qualified_papers)
+
+            processed_papers.sort(key=lambda x: x.get("score", 0), reverse=True)
 
-                # 如果获取的数据不够，记录警告但不中断流程
-                if len(paper_networks) < NETWORK_MINIMUM_REQUIRED:
-                    logger.warning(f"未能获取足够的引用网络数据: {len(paper_networks)}/{NETWORK_MINIMUM_REQUIRED}")
-
-                # 保存所有数据
-                await save_search_results(query, all_papers, paper_networks)
-                logger.info(f"已将搜索结果保存到本地: {query}")
-
-                processed_papers.sort(key=lambda x: x.get("score", 0), reverse=True)
-
-                # 在保存papers.json之后，生成简化版txt文件
-                query_dir = Path(QUERIES_DIR) / query
-                if not query_dir.exists():
-                    query_dir.mkdir(parents=True)
-                
-                # 保存原始json文件
-                papers_json_path = query_dir / "papers.json"
-                with open(papers_json_path, 'w', encoding='utf-8') as f:
-                    json.dump(qualified_papers, f, ensure_ascii=False, indent=2)
-                    
-                # 生成简化版txt文件
-                papers_txt_path = query_dir / "papers.txt"
-                generate_simplified_paper_txt(qualified_papers, papers_txt_path)
-                
-                logger.info(f"Generated simplified papers.txt at {papers_txt_path}")
-
-                # 返回搜索结果
-                return {
-                    "query": query,
-                    "total_available": len(all_papers),
-                    "qualified_papers": len(qualified_papers),
-                    "showing": len(processed_papers),
-                    "min_score": min_score,
-                    "results": processed_papers,
-                    "total_fetched": total_fetched,
-                    "sources_stats": {
-                        source: len([pp for pp in qualified_papers if pp.get("source") == source])
-                        for source in set(pp.get("source", "unknown") for pp in qualified_papers)
-                    },
-                    "stats": {
-                        "score_distribution": {
-                            "max": max(scores) if scores else 0,
-                            "min": min(scores) if scores else 0,
-                            "avg": sum(scores)/len(scores) if scores else 0
-                        },
-                        "year_distribution": {
-                            "latest": max(years) if years else None,
-                            "earliest": min(years) if years else None,
-                            "last_year": len([y for y in years if y >= datetime.now().year - 1]) if years else 0,
-                            "last_3_years": len([y for y in years if y >= datetime.now().year - 3]) if years else 0,
-                            "last_5_years": len([y for y in years if y >= datetime.now().year - 5]) if years else 0,
-                        }
-                    }
-                }
+            # 返回搜索结果
+            with span("build_response"):
+                response = build_search_response(
+                    query, all_papers, qualified_papers, processed_papers, min_score, total_fetched, stats
+                )
+            response["fetch_stats"] = fetch_stats
+            if network_job is not None:
+                response["network_job"] = network_job.summary()
+            response["next_cursor"] = await first_page_cursor(
+                query, min_year, min_citations, min_score, len(processed_papers)
+            )
+            return response
 
     except Exception as e:
         logger.error(f"搜索过程中发生错误: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def encode_stream_event(event: dict, fmt: str) -> str:
+    """把事件编码为 NDJSON 行或 SSE 帧"""
+    data = json.dumps(event, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+async def stream_search_events(
+    query: str,
+    min_year: int = None,
+    min_citations: int = None,
+    top_k: int = 60,
+    fetch_size: int = DEFAULT_FETCH_SIZE,
+    min_score: float = MIN_SCORE_THRESHOLD
+):
+    """
+    流式搜索的事件生成器
+
+    事件类型：
+    - start: 搜索开始
+    - partial: 每个批次到达后，当前的 top-k 排名结果
+    - progress: 引用网络预取进度
+    - summary: 最终结果（格式与 /search_papers 相同）
+    - error: 出错，流随即结束
+    """
+    yield {"type": "start", "query": query, "mode": SEARCH_MODE.value, "top_k": top_k}
+
+    # hybrid模式下本地数据完整，或本地语料能覆盖新查询时，直接返回离线结果
+    if SEARCH_MODE in [SearchMode.HYBRID, SearchMode.OFFLINE]:
+        is_complete, existing_ids, _ = await check_local_data(query)
+        result = None
+        if is_complete or SEARCH_MODE == SearchMode.OFFLINE:
+            result = await search_papers_offline(
+                query=query,
+                min_year=min_year,
+                min_citations=min_citations,
+                top_k=top_k,
+                min_score=min_score
+            )
+        elif not existing_ids:
+            result = await search_papers_from_index(
+                query, min_year=min_year, min_citations=min_citations,
+                top_k=top_k, fetch_size=fetch_size, min_score=min_score
+            )
+        if result is not None:
+            yield {"type": "partial", "fetched": result["total_available"],
+                   "qualified": result["qualified_papers"], "results": result["results"]}
+            yield {"type": "summary", **result}
+            return
+
+    client = get_client()
+    batch_size = 100
+    offsets = [
+        (offset, min(batch_size, fetch_size - offset))
+        for offset in range(0, fetch_size, batch_size)
+    ]
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_REQUESTS)
+
+    async def fetch_batch(offset: int, limit: int):
+        async with timed_semaphore(semaphore, "search_pages"):
+            papers = await fetch_papers_from_multiple_sources(client, query, offset=offset, limit=limit)
+            return offset, papers
+
+    # 1. 各批次并发获取，先到先处理，增量维护 top-k
+    tasks = [asyncio.create_task(fetch_batch(offset, limit)) for offset, limit in offsets]
+    batches = {}
+    qualified_batches = {}
+    top_k_heap = IncrementalTopK(top_k)
+    fetched_count = 0
+    qualified_count = 0
+    try:
+        for future in asyncio.as_completed(tasks):
+            try:
+                offset, papers = await future
+            except HTTPException as e:
+                logger.error(f"出现 HTTP 错误: {e.status_code}, {e.detail}")
+                yield {"type": "error", "status_code": e.status_code, "detail": str(e.detail)}
+                return
+            except Exception as e:
+                logger.error(f"fetch error: {str(e)}")
+                continue
+
+            qualified = score_and_filter(papers, min_year, min_citations, min_score)
+            batches[offset] = papers
+            qualified_batches[offset] = qualified
+            fetched_count += len(papers)
+            qualified_count += len(qualified)
+            entered = top_k_heap.extend(qualified)
+            yield {
+                "type": "partial",
+                "offset": offset,
+                "batch_size": len(papers),
+                "fetched": fetched_count,
+                "qualified": qualified_count,
+                "entered_top_k": entered,
+                "results": [format_paper_result(paper) for paper in top_k_heap.ranked()]
+            }
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # 2. 按批次顺序还原完整列表，保证最终排序与非流式接口一致
+    all_papers = [paper for offset in sorted(batches) for paper in batches[offset]]
+    qualified_papers = [paper for offset in sorted(batches) for paper in qualified_batches[offset]]
+    qualified_papers.sort(key=lambda x: x["score"], reverse=True)
+    processed_papers = [format_paper_result(paper) for paper in qualified_papers[:top_k]]
+
+    # 3. 获取引用网络并保存，期间推送预取进度
+    progress_queue: asyncio.Queue = asyncio.Queue()
+    persist_task = asyncio.create_task(
+        persist_search_results(query, all_papers, qualified_papers, on_progress=progress_queue.put_nowait)
+    )
+    while True:
+        next_progress = asyncio.create_task(progress_queue.get())
+        done, _ = await asyncio.wait({next_progress, persist_task}, return_when=asyncio.FIRST_COMPLETED)
+        if next_progress in done:
+            yield {"type": "progress", **next_progress.result()}
+            continue
+        next_progress.cancel()
+        break
+    while not progress_queue.empty():
+        yield {"type": "progress", **progress_queue.get_nowait()}
+
+    try:
+        persist_task.result()
+    except Exception as e:
+        logger.error(f"保存搜索结果失败: {str(e)}", exc_info=True)
+        yield {"type": "error", "status_code": 500, "detail": str(e)}
+        return
+
+    yield {
+        "type": "summary",
+        **build_search_response(
+            query, all_papers, qualified_papers, processed_papers, min_score,
+            sum(limit for _, limit in offsets)
+        )
+    }
+
+@router.get("/search_papers/stream")
+async def search_papers_stream(
+    query: str = Query(..., description="搜索关键词"),
+    min_year: int = Query(None, description="最早年份"),
+    min_citations: int = Query(None, description="最少引用数"),
+    top_k: int = Query(60, description="返回结果数量"),
+    fetch_size: int = Query(DEFAULT_FETCH_SIZE, description="实际获取的论文数量"),
+    min_score: float = Query(MIN_SCORE_THRESHOLD, description="最低质量分数"),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="输出格式: ndjson 或 sse")
+):
+    """
+    流式版本的搜索接口：每个批次到达后立即推送当前排名，
+    随后推送引用网络预取进度，最后推送与 /search_papers 相同格式的汇总结果
+    """
+    async def event_stream():
+        try:
+            async with search_locks.hold(query):
+                async for event in stream_search_events(
+                    query, min_year, min_citations, top_k, fetch_size, min_score
+                ):
+                    yield encode_stream_event(event, format)
+        except Exception as e:
+            logger.error(f"流式搜索过程中发生错误: {str(e)}", exc_info=True)
+            yield encode_stream_event({"type": "error", "status_code": 500, "detail": str(e)}, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(event_stream(), media_type=media_type)
+
+@timed_stage("offline_search")
 async def search_papers_offline(
     query: str,
     min_year: int = None,
@@ -510,59 +880,26 @@ async def search_papers_offline(
         最低分数: {min_score}
         """)
         
-        # 1. 读取基础论文数据
-        papers_file = os.path.join(QUERIES_DIR, query, "papers.json")
-        with open(papers_file, 'r', encoding='utf-8') as f:
-            all_papers = json.load(f)
-            
-        # 2. 评分和筛选（与在线模式相同的逻辑）
-        qualified_papers = []
-        for paper in all_papers:
-            try:
-                # 年份和引用量筛选
-                paper_year = paper.get("year")
-                if paper_year is not None:
-                    try:
-                        paper_year = int(paper_year)
-                    except (ValueError, TypeError):
-                        continue
-                
-                citations = paper.get("citationCount", 0)
-                try:
-                    citations = int(citations)
-                except (ValueError, TypeError):
-                    citations = 0
-                
-                # 筛选条件
-                if min_year and (paper_year is None or paper_year < min_year):
-                    continue
-                if min_citations and citations < min_citations:
-                    continue
-                    
-                # 计算分数
-                score = calculate_paper_score(paper)
-                paper["score"] = score
-                
-                if score >= min_score:
-                    qualified_papers.append(paper)
-                    
-            except Exception as e:
-                logger.warning(f"处理论文时出错: {str(e)}, paper: {paper.get('paperId', 'unknown')}")
-                continue
-                
-        # 3. 排序和截取
-        qualified_papers.sort(key=lambda x: x["score"], reverse=True)
+        # 1-2. 打开列式存储（分数已随论文保存）并筛选排序（与在线模式相同的条件），
+        # 只访问年份、引用量和分数列；排序结果会被缓存，之后翻页直接复用
+        ranked = await run_io(get_ranked_results, query, min_year, min_citations, min_score)
+        store = ranked.store
+        qualified_indices = ranked_indices = ranked.indices
+
+        # 3. 截取，只读取需要返回和写入 papers.txt 的论文
+        qualified_papers = await run_io(store.papers, ranked_indices[:max(top_k, SIMPLIFIED_PAPER_COUNT)])
         
-        # 添加日志，显示排序后的论文及其评分
-        logger.info("\n====== 论文排序和评分 ======")
-        for i, paper in enumerate(qualified_papers[:20]):  # 只显示前20篇，避免日志太长
-            logger.info(f"""
-            论文 {i+1}:
-            标题: {paper.get('title', '无标题')}
-            评分: {paper.get('score', 0):.2f}
-            年份: {paper.get('year', '未知')}
-            引用数: {paper.get('citationCount', 0)}
-            """)
+        # 添加日志，显示排序后的论文及其评分（日志级别高于 INFO 时跳过格式化）
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("\n====== 论文排序和评分 ======")
+            for i, paper in enumerate(qualified_papers[:20]):  # 只显示前20篇，避免日志太长
+                logger.info(f"""
+                论文 {i+1}:
+                标题: {paper.get('title', '无标题')}
+                评分: {paper.get('score', 0):.2f}
+                年份: {paper.get('year', '未知')}
+                引用数: {paper.get('citationCount', 0)}
+                """)
             
         processed_papers = qualified_papers[:top_k]
         
@@ -585,72 +922,234 @@ async def search_papers_offline(
             }
             results.append(paper_data)
             
-        # 5. 读取引用网络数据（如果需要）
-        networks_dir = os.path.join(QUERIES_DIR, query, "networks")
-        if os.path.exists(networks_dir):
-            for paper in results:
-                paper_id = paper["id"]
-                network_file = os.path.join(networks_dir, f"{paper_id}.json")
-                if os.path.exists(network_file):
-                    with open(network_file, 'r', encoding='utf-8') as f:
-                        network = json.load(f)
-                        paper["citations_list"] = network.get("citations", [])
-                        paper["references"] = network.get("references", [])
+        # 5. 读取引用网络数据
+        network_store = await run_io(open_network_store, query)
+        networks = await run_io(network_store.get_many, [paper["id"] for paper in results])
+        for paper in results:
+            network = networks.get(paper["id"])
+            if network is not None:
+                paper["citations_list"] = network.get("citations", [])
+                paper["references"] = network.get("references", [])
                         
         logger.info(f"""
         离线检索完成:
-        总论文数: {len(all_papers)}
-        符合条件数: {len(qualified_papers)}
+        总论文数: {len(store)}
+        符合条件数: {len(qualified_indices)}
         返回结果数: {len(results)}
         """)
         
         # 在返回结果之前，生成简化版txt文件
         query_dir = Path(QUERIES_DIR) / query
         papers_txt_path = query_dir / "papers.txt"
-        generate_simplified_paper_txt(qualified_papers, papers_txt_path)
+        await run_io(generate_simplified_paper_txt, qualified_papers, papers_txt_path)
         
         logger.info(f"""
 ====== 生成精简版论文数据 ======
 位置: {papers_txt_path}
-论文数量: {len(qualified_papers)}
+论文数量: {min(len(qualified_papers), SIMPLIFIED_PAPER_COUNT)}
         """)
         
         return {
             "query": query,
-            "total_available": len(all_papers),
-            "qualified_papers": len(qualified_papers),
+            "total_available": len(store),
+            "qualified_papers": len(qualified_indices),
             "showing": len(results),
             "min_score": min_score,
-            "results": results
+            "results": results,
+            "next_cursor": ranked.cursor(len(results))
         }
         
     except Exception as e:
         logger.error(f"离线搜索失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def get_citation_networks(query: str, papers: list, required_count: int = NETWORK_CACHE_SIZE) -> dict:
-    """渐进式获取引用网络数据"""
+@traced("first_page_cursor")
+async def first_page_cursor(query: str, min_year: int, min_citations: int, min_score: float,
+                            shown: int) -> str:
+    """已保存的搜索结果的下一页游标（结果已全部返回或无法读取本地数据时为 None）"""
+    try:
+        ranked = await run_io(get_ranked_results, query, min_year, min_citations, min_score)
+        return ranked.cursor(shown)
+    except Exception as e:
+        logger.warning(f"生成翻页游标失败: {str(e)}")
+        return None
+
+@router.get("/search_papers/page")
+async def search_papers_page(
+    cursor: str = Query(..., description="上一次搜索或翻页返回的 next_cursor"),
+    limit: int = Query(20, ge=1, le=200, description="本页数量")
+):
+    """
+    按游标读取下一页搜索结果
+
+    排好序的完整结果在第一次搜索时按 (查询, 筛选条件) 缓存，翻页不会重新筛选和排序，
+    也不会请求上游，只读取这一页的论文
+    """
+    try:
+        state = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query = state["query"]
+    if not has_papers(query):
+        raise HTTPException(status_code=404, detail="未找到相关论文数据")
+    ranked = await run_io(get_ranked_results, query, *state["filters"])
+    if ranked.version != state["version"]:
+        raise HTTPException(status_code=409, detail="搜索结果已更新，请重新搜索")
+
+    offset = state["offset"]
+    papers = await run_io(ranked.page, offset, limit)
+    network_store = await run_io(open_network_store, query)
+    networks = await run_io(network_store.get_many, [paper.get("paperId") for paper in papers])
+    results = []
+    for paper in papers:
+        paper_data = format_paper_result(paper)
+        network = networks.get(paper_data["id"])
+        if network is not None:
+            paper_data["citations_list"] = network.get("citations", [])
+            paper_data["references"] = network.get("references", [])
+        results.append(paper_data)
+
+    return {
+        "query": query,
+        "offset": offset,
+        "showing": len(results),
+        "qualified_papers": len(ranked),
+        "results": results,
+        "next_cursor": ranked.cursor(offset + len(results))
+    }
+
+async def get_index_coverage(query: str):
+    """在后台线程中获取（必要时构建）跨查询全文索引，返回 (索引, 覆盖度)"""
+    index = await run_io(get_text_index)
+    return index, index.coverage(query)
+
+@traced("local_index")
+async def search_papers_from_index(
+    query: str,
+    min_year: int = None,
+    min_citations: int = None,
+    top_k: int = 60,
+    fetch_size: int = DEFAULT_FETCH_SIZE,
+    min_score: float = MIN_SCORE_THRESHOLD
+):
+    """
+    用跨查询全文索引，从所有本地查询的语料中回答一个本地没有保存过的查询
+
+    覆盖度低于 TEXT_INDEX_COVERAGE_THRESHOLD 时返回 None（调用方改用在线检索）。
+    否则取 BM25 相关度最高的 fetch_size 篇论文作为这个查询的语料（相当于在线检索的返回结果），
+    之后的筛选、按质量分数排序和返回格式与离线模式相同，另外附带覆盖度和各来源语料的论文数。
+    """
+    if has_papers(query):
+        return None
+    try:
+        index, coverage = await get_index_coverage(query)
+    except Exception as e:
+        logger.warning(f"读取本地全文索引失败: {str(e)}")
+        return None
+
+    if coverage["score"] < TEXT_INDEX_COVERAGE_THRESHOLD:
+        logger.info(f"本地语料对查询 {query} 的覆盖度 {coverage['score']} 低于阈值 {TEXT_INDEX_COVERAGE_THRESHOLD}")
+        return None
+    logger.info(f"本地语料对查询 {query} 的覆盖度为 {coverage['score']}，使用本地全文索引检索")
+
+    # 1. 按相关度取包含全部查询词的候选论文（覆盖度也是按这些论文计算的），记录每篇论文来自哪个查询的语料
+    doc_ids, _ = index.search(query, fetch_size, require_all=True)
+
+    def load_candidates():
+        papers, paper_sources = [], {}
+        for doc_id in doc_ids.tolist():
+            source, row = index.docs[doc_id]
+            paper = get_store(source).paper(row)
+            paper_sources[paper.get("paperId")] = source
+            papers.append(paper)
+        return papers, paper_sources
+
+    all_papers, sources = await run_io(load_candidates)
+
+    # 2. 筛选和排序（与离线模式相同，分数已随论文保存）
+    qualified_papers = score_and_filter(all_papers, min_year, min_citations, min_score)
+    qualified_papers.sort(key=lambda x: x["score"], reverse=True)
+
+    # 3. 格式化输出，引用网络从全局网络数据库中一次读取（只读取返回的论文）
+    top_papers = qualified_papers[:top_k]
+    networks = await run_io(get_network_db().get_many, [paper.get("paperId") for paper in top_papers])
+    results = []
+    for paper in top_papers:
+        paper_data = format_paper_result(paper)
+        network = networks.get(paper_data["id"])
+        if network is not None:
+            paper_data["citations_list"] = network.get("citations", [])
+            paper_data["references"] = network.get("references", [])
+        results.append(paper_data)
+
+    local_sources = {}
+    for source in sources.values():
+        local_sources[source] = local_sources.get(source, 0) + 1
+
+    return {
+        "query": query,
+        "total_available": len(all_papers),
+        "qualified_papers": len(qualified_papers),
+        "showing": len(results),
+        "min_score": min_score,
+        "results": results,
+        "coverage": coverage,
+        "local_sources": local_sources
+    }
+
+@router.get("/search_coverage")
+async def get_search_coverage(query: str = Query(..., description="搜索关键词")):
+    """本地语料对查询的覆盖度，以及 hybrid 模式下会使用本地数据还是在线检索"""
+    index, coverage = await get_index_coverage(query)
+    if has_papers(query):
+        source = "local"
+    elif coverage["score"] >= TEXT_INDEX_COVERAGE_THRESHOLD:
+        source = "local_index"
+    else:
+        source = "online"
+    return {"query": query, "coverage": coverage, "threshold": TEXT_INDEX_COVERAGE_THRESHOLD, "source": source}
+
+@router.get("/search_stats/{query}")
+async def get_search_stats_route(
+    query: str,
+    min_year: int = Query(None, description="最早年份"),
+    min_citations: int = Query(None, description="最少引用数"),
+    min_score: float = Query(MIN_SCORE_THRESHOLD, description="最低质量分数")
+):
+    """
+    已保存查询的统计信息（分数、年份、引用数的分布和百分位数，期刊/会议和研究领域排名），
+    只读取本地数据，结果经过进程内缓存
+    """
+    if not has_papers(query):
+        raise HTTPException(status_code=404, detail="未找到相关论文数据")
+    try:
+        return await run_io(get_search_stats, query, min_year, min_citations, min_score)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="未找到相关论文数据")
+
+@timed_stage("network_prefetch")
+async def get_citation_networks(query: str, papers: list, required_count: int = NETWORK_CACHE_SIZE,
+                                on_progress: Callable[[dict], None] = None) -> dict:
+    """
+    渐进式获取引用网络数据
+
+    on_progress 会收到各阶段的进度字典（stage 为 local / batch / per_paper）
+    """
+    def report(stage: str, **info):
+        if on_progress is not None:
+            on_progress({"stage": stage, **info})
+
     paper_networks = {}
-    networks_dir = os.path.join(QUERIES_DIR, query, "networks")
-    os.makedirs(networks_dir, exist_ok=True)
-    
+    network_store = await run_io(open_network_store, query)
+    top_papers = papers[:required_count]
+
     # 1. 先读取本地已有的网络数据
-    existing_networks = {}
-    if os.path.exists(networks_dir):
-        for filename in os.listdir(networks_dir):
-            if filename.endswith('.json'):
-                paper_id = filename.replace('.json', '')
-                network_path = os.path.join(networks_dir, filename)
-                try:
-                    with open(network_path, 'r', encoding='utf-8') as f:
-                        existing_networks[paper_id] = json.load(f)
-                except Exception as e:
-                    logger.warning(f"读取网络数据文件出错: {filename}, {str(e)}")
+    existing_networks = await run_io(network_store.get_many, [paper.get('paperId') for paper in top_papers])
 
-    logger.info(f"本地已有 {len(existing_networks)} 篇论文的引用网络")
+    logger.info(f"本地已有 {await run_io(network_store.count)} 篇论文的引用网络")
 
     # 2. 确定需要在线获取的论文
-    top_papers = papers[:required_count]
     papers_to_fetch = []
     
     for paper in top_papers:
@@ -660,78 +1159,47 @@ async def get_citation_networks(query: str, papers: list, required_count: int =
         else:
             papers_to_fetch.append(paper)
             
+    # 2.1 其他查询最近获取过的网络直接引用，不再请求上游
+    shared_networks = {}
+    if papers_to_fetch:
+        shared_networks = await run_io(
+            network_store.adopt, [paper.get('paperId') for paper in papers_to_fetch], NETWORK_FRESHNESS_TTL
+        )
+        paper_networks.update(shared_networks)
+        papers_to_fetch = [paper for paper in papers_to_fetch if paper.get('paperId') not in shared_networks]
+
     logger.info(f"""
     引用网络数据状态:
     需要的总量: {required_count}
-    本地已有: {len(paper_networks)}
+    本地已有: {len(paper_networks) - len(shared_networks)}
+    其他查询共享: {len(shared_networks)}
     需要获取: {len(papers_to_fetch)}
     """)
+    report("local", required=len(top_papers), local=len(paper_networks), shared=len(shared_networks),
+           to_fetch=len(papers_to_fetch))
 
     # 3. 在线获取缺失的数据
     if papers_to_fetch:
-        max_retries = 3
         logger.info(f"需要在线获取 {len(papers_to_fetch)} 篇论文的引用网络")
-        
-        for i, paper in enumerate(papers_to_fetch, 1):
-            try:
-                paper_id = paper.get('paperId')
-                if not paper_id:
-                    continue
-                    
-                logger.info(f"正在获取第 {i}/{len(papers_to_fetch)} 篇论文的引用网络")
-                network = {'citations': [], 'references': []}
-                
-                # 获取引用信息（带重试）
-                for attempt in range(max_retries):
-                    try:
-                        citations = await get_paper_citations(paper_id)
-                        if citations:
-                            network['citations'] = citations
-                            logger.info(f"获取到 {len(citations)} 条引用信息")
-                        break
-                    except HTTPException as e:
-                        if e.status_code == 429 and attempt < max_retries - 1:
-                            wait_time = (attempt + 1) * 2
-                            logger.warning(f"遇到429，等待{wait_time}秒后重试...")
-                            await asyncio.sleep(wait_time)
-                        else:
-                            raise
-                            
-                # 获取参考文献（带重试）
-                for attempt in range(max_retries):
-                    try:
-                        references = await get_paper_references(paper_id)
-                        if references:
-                            network['references'] = references
-                            logger.info(f"获取到 {len(references)} 条参考文献")
-                        break
-                    except HTTPException as e:
-                        if e.status_code == 429 and attempt < max_retries - 1:
-                            wait_time = (attempt + 1) * 2
-                            logger.warning(f"遇到429，等待{wait_time}秒后重试...")
-                            await asyncio.sleep(wait_time)
-                        else:
-                            raise
-                
-                # 保存和添加到结果中
-                network_file = os.path.join(networks_dir, f"{paper_id}.json")
-                with open(network_file, 'w', encoding='utf-8') as f:
-                    json.dump(network, f, ensure_ascii=False, indent=2)
-                    
-                paper_networks[paper_id] = network
-                
-            except Exception as e:
-                logger.error(f"获取论文引用网络失败: {str(e)}")
-                continue
-                
-    # 即使本地数据够用，也尝试获取更多数据（后台进行）
-    if papers_to_fetch and len(paper_networks) >= NETWORK_MINIMUM_REQUIRED:
-        logger.info(f"后台获取额外的引用网络数据: {len(papers_to_fetch)} 篇")
+
+        # 3.1 先用 /paper/batch 批量获取，一个请求覆盖上百篇论文（在一个事务中写入）
+        ids_to_fetch = [paper.get('paperId') for paper in papers_to_fetch if paper.get('paperId')]
+        batch_networks, fallback_ids = await fetch_networks_batch(get_client(), ids_to_fetch)
         try:
-            for paper in papers_to_fetch:
-                # ... 获取和保存新数据 ...
-                pass
+            await run_io(network_store.put_many, batch_networks)
+            paper_networks.update(batch_networks)
         except Exception as e:
-            logger.warning(f"获取额外数据时出错: {str(e)}")
-    
+            logger.error(f"保存 {len(batch_networks)} 篇论文的引用网络失败: {str(e)}")
+        report("batch", completed=len(batch_networks), fallback=len(fallback_ids), total=len(paper_networks))
+
+        # 3.2 批量接口返回不完整的论文，再用单篇接口有界并发地补取（延迟批量写入，返回前全部写完）
+        if fallback_ids:
+            async with NetworkWriteBehind(network_store) as writer:
+                fetched_networks = await prefetch_networks(
+                    fallback_ids,
+                    writer.add,
+                    on_progress=lambda progress: report("per_paper", **progress.to_dict())
+                )
+            paper_networks.update(fetched_networks)
+
     return paper_networks
@@ -0,0 +1,50 @@
+# routers/system.py
+
+from fastapi import APIRouter, Header, HTTPException
+import logging
+
+from app.services.client import get_client
+from app.services.query_cache import query_cache
+from app.services.network_store import get_network_db
+from app.services.fetcher import fetch_flight
+from app.routers.search import search_flight
+from app.services.tracing import trace_store
+from app.services.profiler import is_admin
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/system/client_stats")
+async def get_client_stats():
+    """返回 Semantic Scholar 共享客户端的连接池使用统计"""
+    return get_client().stats()
+
+@router.get("/system/cache_stats")
+async def get_cache_stats():
+    """返回进程内查询缓存（论文数据和引用网络）的命中统计"""
+    return query_cache.stats()
+
+@router.get("/system/network_store_stats")
+async def get_network_store_stats():
+    """返回全局引用网络存储的去重统计（不同论文数、各查询的引用数）"""
+    return get_network_db().stats()
+
+@router.get("/system/coalescing_stats")
+async def get_coalescing_stats():
+    """返回请求合并统计：上游请求和 /search_papers 各有多少调用被合并"""
+    return {"fetcher": fetch_flight.stats(), "search_papers": search_flight.stats()}
+
+@router.get("/system/traces")
+async def list_traces():
+    """最近保存的请求追踪记录（请求带 X-Trace: 1 或由管理员开启采样分析时保存）"""
+    return trace_store.recent()
+
+@router.get("/system/traces/{trace_id}")
+async def get_trace(trace_id: str, x_admin_token: str = Header(None)):
+    """返回一条请求的 JSON 追踪记录；带采样分析结果的记录只有管理员可以读取"""
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="追踪记录不存在或已过期")
+    if trace.profile is not None and not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="需要管理员令牌")
+    return trace.to_dict()
@@ -0,0 +1,228 @@
+# services/client.py
+
+import logging
+import importlib.util
+import time
+from typing import Optional
+
+import httpx
+
+from app.services.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from app.services.response_cache import ResponseCache, endpoint_of
+from app.services.metrics import upstream_requests, upstream_latency, upstream_throttled, response_cache_hits
+from app.services.tracing import span
+from app.services.persistence import run_io
+from config import (
+    SEMANTIC_SCHOLAR_API_URL,
+    HTTP_TIMEOUT,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticScholarClient:
+    """
+    Semantic Scholar API 的共享客户端
+
+    整个应用只创建一个 httpx.AsyncClient，复用 keep-alive 连接，
+    避免每次请求都重新进行 TCP/TLS 握手；同时统计连接池的使用情况。
+    所有请求都经过自适应限流器，429 时根据 Retry-After 暂停并降低并发。
+    请求前先查磁盘响应缓存，命中时不占用限流器，也不访问网络。
+    """
+
+    def __init__(
+        self,
+        base_url: str = SEMANTIC_SCHOLAR_API_URL,
+        http2: bool = HTTP2_ENABLED,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        limiter: Optional[AdaptiveRateLimiter] = None,
+        response_cache: Optional[ResponseCache] = None
+    ):
+        self.base_url = base_url
+        self.http2 = http2
+        self.transport = transport  # 可注入自定义 transport（例如测试用的 MockTransport）
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.response_cache = response_cache or ResponseCache()
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # 连接池统计
+        self.requests_total = 0
+        self.requests_failed = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.connections_opened = 0   # 新建的TCP连接数（即握手次数）
+        self.tls_handshakes = 0
+
+    @property
+    def is_started(self) -> bool:
+        return self._client is not None and not self._client.is_closed
+
+    async def start(self):
+        """创建底层连接池"""
+        if self.is_started:
+            return
+
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("未安装 h2，HTTP/2 不可用，回退到 HTTP/1.1")
+            http2 = False
+
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"User-Agent": "Paper Insight Research Tool"},
+            timeout=HTTP_TIMEOUT,
+            http2=http2,
+            transport=self.transport,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+        logger.info(f"Semantic Scholar 客户端已启动: {self.base_url} (HTTP/2: {http2})")
+
+    async def close(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            logger.info(f"Semantic Scholar 客户端已关闭，统计: {self.stats()}")
+        self._client = None
+        self.response_cache.close()
+
+    async def _trace(self, event_name: str, info: dict):
+        """httpcore 的 trace 回调，用于统计新建连接和 TLS 握手"""
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """发送请求，所有上游调用都经过这里"""
+        if not self.is_started:
+            await self.start()
+
+        params, body = kwargs.get("params"), kwargs.get("json")
+        endpoint = endpoint_of(url)
+        # 响应缓存是 SQLite，查询和写入（含淘汰）都在 I/O 线程池中进行，不阻塞事件循环
+        cached = None
+        if self.response_cache.enabled:
+            cached = await run_io(self.response_cache.lookup, method, url, params, body)
+        if cached is not None:
+            cached.request = self._client.build_request(method, url, params=params, json=body)
+            response_cache_hits.inc(endpoint=endpoint)
+            return cached
+
+        extensions = kwargs.pop("extensions", None) or {}
+        extensions.setdefault("trace", self._trace)
+
+        async with self.limiter.slot():
+            self.requests_total += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            start = time.perf_counter()
+            try:
+                with span(f"upstream.{endpoint}"):
+                    response = await self._client.request(method, url, extensions=extensions, **kwargs)
+            except Exception:
+                self.requests_failed += 1
+                upstream_requests.inc(endpoint=endpoint, status="error")
+                raise
+            finally:
+                self.in_flight -= 1
+                upstream_latency.observe(time.perf_counter() - start, endpoint=endpoint)
+            upstream_requests.inc(endpoint=endpoint, status=response.status_code)
+
+            # 429，或带 Retry-After 的 503，都视为被上游限流
+            throttled = response.status_code == 429 or (
+                response.status_code == 503 and "Retry-After" in response.headers
+            )
+            if throttled:
+                upstream_throttled.inc(endpoint=endpoint)
+                self.limiter.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+            elif response.status_code < 500:
+                self.limiter.on_success()
+
+        if self.response_cache.enabled:
+            await run_io(self.response_cache.store, method, url, response, params, body)
+        return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def _pool_snapshot(self) -> dict:
+        """读取连接池当前状态（依赖 httpcore 内部结构，取不到时返回空值）"""
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {"open": None, "idle": None, "active": None}
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "open": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle
+        }
+
+    def stats(self) -> dict:
+        """连接池使用统计"""
+        reused = max(self.requests_total - self.requests_failed - self.connections_opened, 0)
+        return {
+            "started": self.is_started,
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "limits": {
+                "max_connections": HTTP_MAX_CONNECTIONS,
+                "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                "keepalive_expiry": HTTP_KEEPALIVE_EXPIRY
+            },
+            "requests_total": self.requests_total,
+            "requests_failed": self.requests_failed,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "connections_reused": reused,
+            "pool": self._pool_snapshot() if self.is_started else {"open": 0, "idle": 0, "active": 0},
+            "rate_limiter": self.limiter.stats(),
+            "response_cache": self.response_cache.stats()
+        }
+
+
+# 全局共享客户端，由 FastAPI 的 lifespan 负责启动和关闭
+_client: Optional[SemanticScholarClient] = None
+
+
+def get_client() -> SemanticScholarClient:
+    """
+    返回全局共享的客户端
+    在 lifespan 之外（例如脚本中）调用时会自动创建，首次请求时再建立连接池
+    """
+    global _client
+    if _client is None:
+        _client = SemanticScholarClient()
+    return _client
+
+
+async def start_client(client: Optional[SemanticScholarClient] = None) -> SemanticScholarClient:
+    """启动全局客户端；传入 client 时替换全局客户端（例如基准测试注入 MockTransport）"""
+    global _client
+    if client is not None:
+        if _client is not None and _client is not client:
+            await _client.close()
+        _client = client
+    client = get_client()
+    await client.start()
+    return client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+    _client = None
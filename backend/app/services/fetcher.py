@@ -2,67 +2,227 @@
 
 import httpx
 import asyncio
+import json as json_module
 import logging
 from fastapi import HTTPException
-from tenacity import retry, stop_after_attempt, wait_exponential
-from asyncio import Semaphore
-import time
-
-from config import (
-    SEMANTIC_SCHOLAR_API_URL,
-    MAX_CONCURRENT_REQUESTS,
-    REQUEST_INTERVAL
-)
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+from app.services.single_flight import SingleFlight
+from app.services.response_cache import CacheMissError, endpoint_of
+from app.services.metrics import upstream_retries, timed_semaphore
+from app.services.tracing import span
+from config import PAPER_BATCH_SIZE, PAPER_BATCH_PARALLEL, NETWORK_EDGE_LIMIT
 
 logger = logging.getLogger(__name__)
 
-# 全局信号量和上次请求时间
-API_SEMAPHORE = Semaphore(MAX_CONCURRENT_REQUESTS)
-LAST_REQUEST_TIME = 0
+# /paper/search 返回的论文字段
+SEARCH_FIELDS = (
+    "title,authors,abstract,year,citationCount,venue,url,"
+    "openAccessPdf,fieldsOfStudy,publicationTypes,publicationDate"
+)
+
+# 引用/参考文献列表中每篇论文需要的字段
+RELATION_FIELDS = "title,authors,year,citationCount"
+
+# /paper/batch 获取引用网络时使用的字段：嵌套的 citations/references 与单篇接口保持一致
+BATCH_NETWORK_FIELDS = ",".join(
+    ["citationCount", "referenceCount"]
+    + [f"{relation}.{field}" for relation in ("citations", "references")
+       for field in ["paperId"] + RELATION_FIELDS.split(",")]
+)
+
+def is_retryable_error(error: BaseException) -> bool:
+    """只对限流(429)、超时和服务端错误重试，4xx 客户端错误重试没有意义"""
+    if isinstance(error, CacheMissError):
+        # 离线模式下缓存未命中，重试也不会请求上游
+        return False
+    if isinstance(error, HTTPException):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+def record_retry(retry_state):
+    """tenacity 的 before_sleep 回调：按接口统计重试次数"""
+    url = retry_state.args[1] if len(retry_state.args) > 1 else retry_state.kwargs.get("url", "")
+    upstream_retries.inc(endpoint=endpoint_of(str(url)), source="fetcher")
+
+# 相同的并发上游请求只发送一次（例如两个用户同时搜索同一主题，或子网络扩展和预取需要同一篇论文的引用）
+fetch_flight = SingleFlight("fetcher")
+
+def request_key(method: str, url, params, json=None) -> tuple:
+    """请求的合并键：方法、路径和规范化后的参数（参数顺序不影响），论文ID包含在路径中"""
+    normalized_params = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    body = json_module.dumps(json, sort_keys=True, ensure_ascii=False) if json is not None else None
+    return method.upper(), str(url), normalized_params, body
 
-async def get_client():
+async def fetch_papers_once(client, url, params, method: str = "GET", json=None):
     """
-    创建并返回一个配置好的HTTP客户端
+    发送一次请求并统一转换错误（不重试）
+    限速由共享客户端的限流器统一控制（令牌桶 + AIMD 并发 + Retry-After）
+    同一客户端上完全相同的并发请求会被合并，所有调用者共享同一个响应
     """
-    return httpx.AsyncClient(
-        base_url=SEMANTIC_SCHOLAR_API_URL,
-        headers={"User-Agent": "Paper Insight Research Tool"},
-        timeout=60.0
+    return await fetch_flight.do(
+        (id(client), *request_key(method, url, params, json)),
+        lambda: _send_request(client, url, params, method=method, json=json)
     )
 
-async def wait_for_rate_limit():
-    """确保请求间隔符合配置"""
-    global LAST_REQUEST_TIME
-    current_time = time.time()
-    elapsed = current_time - LAST_REQUEST_TIME
-    if elapsed < REQUEST_INTERVAL:
-        await asyncio.sleep(REQUEST_INTERVAL - elapsed)
-    LAST_REQUEST_TIME = time.time()
+async def _send_request(client, url, params, method: str = "GET", json=None):
+    try:
+        # fetch.* 包含限流等待，upstream.*（客户端中记录）只包含 HTTP 请求本身
+        with span(f"fetch.{endpoint_of(url)}"):
+            if method == "GET":
+                response = await client.get(url, params=params)
+            else:
+                response = await client.request(method, url, params=params, json=json)
+        response.raise_for_status()
+        return response
+    except CacheMissError:
+        raise
+    except httpx.TimeoutException as e:
+        logger.error(f"请求超时: {str(e)}")
+        raise HTTPException(status_code=504, detail="API请求超时")
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP错误: {str(e)}")
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+    except Exception as e:
+        logger.error(f"未知错误: {str(e)}")
+        raise HTTPException(status_code=500, detail="服务器内部错误")
 
 @retry(
+    retry=retry_if_exception(is_retryable_error),
     stop=stop_after_attempt(3),
     wait=wait_exponential(min=4, max=10),
+    before_sleep=record_retry,
     reraise=True
 )
-async def fetch_papers(client, url, params):
+async def fetch_papers(client, url, params, method: str = "GET", json=None):
     """
     通用的论文获取函数，包含重试机制和错误处理
     """
-    async with API_SEMAPHORE:  # 使用信号量控制并发
-        await wait_for_rate_limit()  # 确保请求间隔
-        try:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            return response
-        except httpx.TimeoutException as e:
-            logger.error(f"请求超时: {str(e)}")
-            raise HTTPException(status_code=504, detail="API请求超时")
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP错误: {str(e)}")
-            raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
-        except Exception as e:
-            logger.error(f"未知错误: {str(e)}")
-            raise HTTPException(status_code=500, detail="服务器内部错误")
+    return await fetch_papers_once(client, url, params, method=method, json=json)
+
+async def fetch_paper_relations(
+    client,
+    paper_id: str,
+    relation: str,
+    limit: int = NETWORK_EDGE_LIMIT,
+    with_retry: bool = True,
+    max_attempts: int = None
+) -> list:
+    """
+    获取论文的引用（relation="citations"）或参考文献（relation="references"）列表
+    失败时抛出 HTTPException，由调用方决定是否重试或降级
+
+    with_retry=False 时只请求一次，适合自己管理重试的调用方（例如网络预取队列）；
+    max_attempts 指定最多尝试的次数，默认使用 fetch_papers 的重试策略
+    """
+    item_key = "citingPaper" if relation == "citations" else "citedPaper"
+    if not with_retry:
+        fetch = fetch_papers_once
+    elif max_attempts is not None:
+        fetch = fetch_papers.retry_with(stop=stop_after_attempt(max_attempts))
+    else:
+        fetch = fetch_papers
+    response = await fetch(
+        client,
+        f"/paper/{paper_id}/{relation}",
+        params={"fields": RELATION_FIELDS, "limit": limit}
+    )
+    data = response.json().get("data") or []
+    return [item[item_key] for item in data if item.get(item_key)]
+
+async def fetch_papers_by_ids(
+    client,
+    paper_ids: list,
+    fields: str,
+    chunk_size: int = PAPER_BATCH_SIZE,
+    max_parallel: int = PAPER_BATCH_PARALLEL
+) -> tuple[dict, list]:
+    """
+    使用 POST /paper/batch 批量获取论文信息
+
+    paper_ids 会按 chunk_size 分块，各块并发请求（仍受限流器控制）。
+
+    Returns:
+        (papers, failed_ids):
+        papers 为 paper_id -> 论文数据（接口无法解析的 ID 对应 None）；
+        failed_ids 为整块请求失败的 ID，调用方可以改用单篇接口补取
+    """
+    paper_ids = list(dict.fromkeys(pid for pid in paper_ids if pid))
+    chunks = [paper_ids[i:i + chunk_size] for i in range(0, len(paper_ids), chunk_size)]
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def fetch_chunk(chunk):
+        async with timed_semaphore(semaphore, "paper_batch"):
+            response = await fetch_papers(
+                client,
+                "/paper/batch",
+                params={"fields": fields},
+                method="POST",
+                json={"ids": chunk}
+            )
+            return response.json()
+
+    papers = {}
+    failed_ids = []
+    responses = await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks), return_exceptions=True)
+    for chunk, response in zip(chunks, responses):
+        if isinstance(response, Exception) or not isinstance(response, list):
+            logger.warning(f"批量获取 {len(chunk)} 篇论文失败: {str(response)[:200]}")
+            failed_ids.extend(chunk)
+            continue
+        # 返回列表与请求的 ID 一一对应，无法解析的 ID 为 null
+        for paper_id, paper in zip(chunk, response):
+            papers[paper_id] = paper
+
+    logger.info(
+        f"批量获取论文信息: 请求 {len(paper_ids)} 篇, 分 {len(chunks)} 块, "
+        f"成功 {sum(1 for p in papers.values() if p)} 篇, 失败 {len(failed_ids)} 篇"
+    )
+    return papers, failed_ids
+
+def _is_relation_overflow(entry: dict, relation: str, count_key: str, edge_limit: int) -> bool:
+    """判断批量接口返回的嵌套列表是否不完整（缺失或少于应有数量）"""
+    items = entry.get(relation)
+    if items is None:
+        return True
+    expected = min(entry.get(count_key) or 0, edge_limit)
+    return len(items) < expected
+
+async def fetch_networks_batch(
+    client,
+    paper_ids: list,
+    edge_limit: int = NETWORK_EDGE_LIMIT
+) -> tuple[dict, list]:
+    """
+    通过 /paper/batch 一次性获取多篇论文的引用网络
+
+    Returns:
+        (networks, fallback_ids):
+        networks 为 paper_id -> {"citations": [...], "references": [...]}，格式与单篇接口相同；
+        fallback_ids 为嵌套列表溢出（批量接口没有完整返回）或整块失败的论文，需要改用单篇接口
+    """
+    entries, fallback_ids = await fetch_papers_by_ids(client, paper_ids, BATCH_NETWORK_FIELDS)
+
+    networks = {}
+    unresolved = 0
+    for paper_id, entry in entries.items():
+        if not entry:
+            unresolved += 1
+            continue
+        if (_is_relation_overflow(entry, "citations", "citationCount", edge_limit)
+                or _is_relation_overflow(entry, "references", "referenceCount", edge_limit)):
+            fallback_ids.append(paper_id)
+            continue
+        networks[paper_id] = {
+            "citations": [p for p in entry["citations"] if p.get("paperId")][:edge_limit],
+            "references": [p for p in entry["references"] if p.get("paperId")][:edge_limit]
+        }
+
+    logger.info(
+        f"批量获取引用网络: 完成 {len(networks)} 篇, 需单篇补取 {len(fallback_ids)} 篇, "
+        f"无法解析 {unresolved} 篇"
+    )
+    return networks, fallback_ids
 
 async def fetch_papers_batch(client, query: str, offset: int, limit: int):
     """
@@ -72,10 +232,7 @@ async def fetch_papers_batch(client, query: str, offset: int, limit: int):
         "query": query,
         "offset": offset,
         "limit": limit,
-        "fields": (
-            "title,authors,abstract,year,citationCount,venue,url,"
-            "openAccessPdf,fieldsOfStudy,publicationTypes,publicationDate"
-        )
+        "fields": SEARCH_FIELDS
     }
     logger.info(f"Fetching batch {offset}-{offset+limit}...（获取批次 {offset}-{offset+limit}...）")
     response = await fetch_papers(client, "/paper/search", params)
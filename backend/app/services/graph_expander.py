@@ -0,0 +1,171 @@
+# services/graph_expander.py
+
+import asyncio
+import heapq
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.services.metrics import timed_semaphore
+from config import PAPER_NETWORK_MAX_NODES, PAPER_NETWORK_PARALLEL
+
+logger = logging.getLogger(__name__)
+
+# 获取引用或参考文献的函数：传入论文ID，返回论文列表（失败时返回空列表）
+RelationFetcher = Callable[[str], Awaitable[list]]
+
+
+def safe_get_citation_count(paper: dict) -> int:
+    try:
+        return int(paper.get('citationCount', 0) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def top_k_papers(papers: List[dict], k: int, exclude: Set[str]) -> List[dict]:
+    """用堆选出引用数最高的 k 篇未出现过的论文，复杂度 O(n log k)"""
+    candidates = {}
+    for paper in papers:
+        paper_id = paper.get('paperId') if isinstance(paper, dict) else None
+        if paper_id and paper_id not in exclude and paper_id not in candidates:
+            candidates[paper_id] = paper
+    return heapq.nlargest(k, candidates.values(), key=safe_get_citation_count)
+
+
+async def expand_paper_network(
+    paper_id: str,
+    fetch_citations: RelationFetcher,
+    fetch_references: RelationFetcher,
+    depth: int = 2,
+    fanout: int = 2,
+    is_cancelled: Optional[Callable[[], Awaitable[bool]]] = None,
+    max_nodes: int = PAPER_NETWORK_MAX_NODES,
+    parallel: int = PAPER_NETWORK_PARALLEL
+) -> Optional[dict]:
+    """
+    以 paper_id 为中心，按层广度优先扩展引用网络
+
+    - 每一层的前沿节点并发获取引用和参考文献，同时展开的节点数不超过 parallel
+    - 节点总数达到 max_nodes 后不再加入新节点（stats.truncated 为 True），上游请求数因此不超过 2 * max_nodes
+    - 每个节点开始请求前检查 is_cancelled，客户端断开后当前层剩余的节点不再请求
+    - 每个节点在引用和参考文献中各选出引用数最高的 fanout 篇新论文（堆选 top-k）
+    - 用集合去重节点和边，同一篇论文跨层只出现一次
+    - 已在图中的论文之间的引用关系也会补上边
+
+    节点类型与原有前端约定一致：第一层为 citation/reference，
+    更深层为 "<与父节点的关系>_to_<所属第一层节点的类型>"，例如 citation_to_reference。
+
+    Returns:
+        {"nodes": [...], "edges": [...], "stats": {...}}；is_cancelled 返回 True 时返回 None
+    """
+    nodes = [{
+        "id": paper_id,
+        "title": "Center Paper",
+        "type": "center",
+        "layer": 0
+    }]
+    seen: Set[str] = {paper_id}
+    edges = []
+    edge_set: Set[Tuple[str, str]] = set()
+
+    def add_edge(source: str, target: str, edge_type: str):
+        if source != target and (source, target) not in edge_set:
+            edge_set.add((source, target))
+            edges.append({"source": source, "target": target, "type": edge_type})
+
+    # 前沿节点：paper_id -> 所属第一层节点的类型（中心节点为 None）
+    frontier: Dict[str, Optional[str]] = {paper_id: None}
+    requests_made = 0
+    truncated = False
+    cancelled = False
+    semaphore = asyncio.Semaphore(parallel)
+    cancel_lock = asyncio.Lock()
+
+    async def check_cancelled() -> bool:
+        # is_cancelled 读取连接的接收通道，不能并发调用；确认断开后不再检查
+        nonlocal cancelled
+        if cancelled or is_cancelled is None:
+            return cancelled
+        async with cancel_lock:
+            if not cancelled and await is_cancelled():
+                cancelled = True
+        return cancelled
+
+    async def fetch_node(node_id: str) -> Optional[tuple]:
+        nonlocal requests_made
+        async with timed_semaphore(semaphore, "paper_network"):
+            if await check_cancelled():
+                return None
+            requests_made += 2
+            return await asyncio.gather(fetch_citations(node_id), fetch_references(node_id))
+
+    for layer in range(1, depth + 1):
+        if not frontier:
+            break
+        if await check_cancelled():
+            return None
+
+        frontier_ids = list(frontier)
+        logger.info(f"====== Layer {layer} ======（第 {layer} 层，展开 {len(frontier_ids)} 个节点）")
+
+        # 1. 并发获取整层节点的引用和参考文献（受 parallel 限制）
+        results = await asyncio.gather(*(fetch_node(node_id) for node_id in frontier_ids))
+        if cancelled:
+            return None
+
+        next_frontier: Dict[str, Optional[str]] = {}
+        fetched = []
+        for node_id, (citations, references) in zip(frontier_ids, results):
+            citations = citations if isinstance(citations, list) else []
+            references = references if isinstance(references, list) else []
+            fetched.append((node_id, citations, references))
+
+            # 2. 选出每个节点的 top-k 新论文
+            for relation, papers in (("citation", citations), ("reference", references)):
+                root_type = frontier[node_id]
+                node_type = relation if root_type is None else f"{relation}_to_{root_type}"
+                for paper in top_k_papers(papers, fanout, seen):
+                    if len(nodes) >= max_nodes:
+                        truncated = True
+                        break
+                    new_id = paper['paperId']
+                    seen.add(new_id)
+                    next_frontier[new_id] = root_type or relation
+                    nodes.append({
+                        "id": new_id,
+                        "title": paper.get('title', 'Unknown Title'),
+                        "citations_count": safe_get_citation_count(paper),
+                        "year": paper.get('year'),
+                        "type": node_type,
+                        "layer": layer
+                    })
+
+        # 3. 添加边：包括新节点，以及已经在图中的论文之间的引用关系
+        for node_id, citations, references in fetched:
+            for paper in citations:
+                citing_id = paper.get('paperId') if isinstance(paper, dict) else None
+                if citing_id in seen:
+                    add_edge(citing_id, node_id, "citation")
+            for paper in references:
+                cited_id = paper.get('paperId') if isinstance(paper, dict) else None
+                if cited_id in seen:
+                    add_edge(node_id, cited_id, "reference")
+
+        logger.info(f"第 {layer} 层完成: 新增 {len(next_frontier)} 个节点，当前共 {len(nodes)} 个节点、{len(edges)} 条边")
+        frontier = next_frontier
+        if truncated:
+            logger.info(f"节点数达到上限 {max_nodes}，停止扩展")
+            break
+
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "stats": {
+            "depth": depth,
+            "fanout": fanout,
+            "total_nodes": len(nodes),
+            "total_edges": len(edges),
+            "upstream_requests": requests_made,
+            "max_nodes": max_nodes,
+            "truncated": truncated
+        }
+    }
@@ -0,0 +1,227 @@
+# services/graph_index.py
+
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.network_store import open_network_store, load_networks, network_version
+from app.services.paper_store import PaperStore, get_store, store_dir, papers_file
+from app.services.query_cache import query_cache, files_mtime
+from app.services.metrics import record_bytes
+from config import QUERIES_DIR
+
+logger = logging.getLogger(__name__)
+
+GRAPH_INDEX_FORMAT_VERSION = 1
+
+# 边类型编码
+EDGE_CITATION = 0
+EDGE_REFERENCE = 1
+EDGE_TYPE_NAMES = ("citation", "reference")
+
+
+def graph_index_file(query: str) -> str:
+    return os.path.join(QUERIES_DIR, query, "graph.npz")
+
+
+class CitationGraphIndex:
+    """
+    单个查询的论文间引用关系索引（CSR）
+
+    - 节点：语料中有分数的论文，按分数从高到低编号（节点0分数最高），同一 paperId 只保留排名最高的一条
+    - 边：只保留两端都在语料中的引用关系，按 /citation_network 原有的生成顺序排列并去重
+      （按论文排名遍历，先引用后参考文献，同一有向边只保留第一次出现时的类型）
+    - out_* / in_*：按起点 / 终点分组的 CSR 数组，值为边的编号
+
+    由于节点按分数排序，任意 min_score + top_k 选出的论文都是节点编号的一个前缀 [0, k)，
+    诱导子图就是起点和终点都小于 k 的边，不需要读取任何论文的引用网络。
+    """
+
+    def __init__(self, paper_ids: List[str], paper_rows: np.ndarray, scores: np.ndarray,
+                 edge_src: np.ndarray, edge_dst: np.ndarray, edge_type: np.ndarray,
+                 fingerprint: str = ""):
+        self.paper_ids = paper_ids
+        self.paper_rows = paper_rows
+        self.scores = scores
+        self.edge_src = edge_src
+        self.edge_dst = edge_dst
+        self.edge_type = edge_type
+        self.fingerprint = fingerprint
+
+        n = len(paper_ids)
+        self.out_edges, self.out_indptr = _csr(edge_src, n)
+        self.in_edges, self.in_indptr = _csr(edge_dst, n)
+        self._neg_scores = -scores
+
+    @property
+    def node_count(self) -> int:
+        return len(self.paper_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_src)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.paper_rows, self.scores, self.edge_src, self.edge_dst, self.edge_type,
+                  self.out_edges, self.out_indptr, self.in_edges, self.in_indptr)
+        return sum(a.nbytes for a in arrays) + sum(len(pid) + 50 for pid in self.paper_ids)
+
+    def count_at_least(self, min_score: float) -> int:
+        """分数 >= min_score 的节点数（节点按分数降序，二分查找）"""
+        return int(np.searchsorted(self._neg_scores, -min_score, side="right"))
+
+    def select(self, top_k: Optional[int], min_score: float) -> int:
+        """返回选中的节点数 k：分数 >= min_score 的论文中排名前 top_k 的，即节点 [0, k)"""
+        count = self.count_at_least(min_score)
+        # 与原来的 qualified_papers[:top_k] 切片语义一致
+        return len(range(count)[:top_k])
+
+    def subgraph_edges(self, k: int) -> np.ndarray:
+        """节点 [0, k) 的诱导子图的边编号（按原有生成顺序）"""
+        # 起点 < k 的边在 CSR 中是连续的一段
+        edges = self.out_edges[:self.out_indptr[k]]
+        edges = edges[self.edge_dst[edges] < k]
+        edges.sort()
+        return edges
+
+    def neighbours(self, node: int) -> Tuple[np.ndarray, np.ndarray]:
+        """节点的 (出边终点, 入边起点)"""
+        out = self.edge_dst[self.out_edges[self.out_indptr[node]:self.out_indptr[node + 1]]]
+        incoming = self.edge_src[self.in_edges[self.in_indptr[node]:self.in_indptr[node + 1]]]
+        return out, incoming
+
+    def save(self, path: str):
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            format=np.array(GRAPH_INDEX_FORMAT_VERSION),
+            fingerprint=np.array(self.fingerprint),
+            paper_ids=np.array(self.paper_ids, dtype=np.str_),
+            paper_rows=self.paper_rows,
+            scores=self.scores,
+            edge_src=self.edge_src,
+            edge_dst=self.edge_dst,
+            edge_type=self.edge_type
+        )
+        record_bytes("graph", "written", os.path.getsize(tmp))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["CitationGraphIndex"]:
+        try:
+            with np.load(path) as data:
+                if int(data["format"]) != GRAPH_INDEX_FORMAT_VERSION:
+                    return None
+                record_bytes("graph", "read", os.path.getsize(path))
+                return cls(
+                    data["paper_ids"].tolist(), data["paper_rows"], data["scores"],
+                    data["edge_src"], data["edge_dst"], data["edge_type"],
+                    fingerprint=str(data["fingerprint"])
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def _csr(keys: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """按 keys 分组的边编号和每组的起始偏移"""
+    order = np.argsort(keys, kind="stable").astype(np.int64)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=indptr[1:])
+    return order, indptr
+
+
+def build_graph_index(store: PaperStore, networks: Dict[str, dict], fingerprint: str = "") -> CitationGraphIndex:
+    """从论文存储和引用网络构建索引"""
+    ranked_rows = store.rank(np.flatnonzero(~np.isnan(store.scores)))
+
+    paper_ids: List[str] = []
+    paper_rows = []
+    node_of: Dict[str, int] = {}
+    for row in ranked_rows:
+        paper_id = store.paper(int(row), with_abstract=False).get("paperId")
+        if paper_id and paper_id not in node_of:
+            node_of[paper_id] = len(paper_ids)
+            paper_ids.append(paper_id)
+            paper_rows.append(row)
+
+    src, dst, types = [], [], []
+    seen = set()
+
+    def add_edge(source: int, target: int, edge_type: int):
+        if (source, target) not in seen:
+            seen.add((source, target))
+            src.append(source)
+            dst.append(target)
+            types.append(edge_type)
+
+    # 按节点排名遍历，生成顺序与 /citation_network 原来逐篇读取网络文件时一致
+    for node, paper_id in enumerate(paper_ids):
+        network = networks.get(paper_id)
+        if not network:
+            continue
+        for citation in network.get("citations") or []:
+            citing = node_of.get(citation.get("paperId")) if isinstance(citation, dict) else None
+            if citing is not None:
+                add_edge(citing, node, EDGE_CITATION)
+        for reference in network.get("references") or []:
+            cited = node_of.get(reference.get("paperId")) if isinstance(reference, dict) else None
+            if cited is not None:
+                add_edge(node, cited, EDGE_REFERENCE)
+
+    return CitationGraphIndex(
+        paper_ids,
+        np.array(paper_rows, dtype=np.int64),
+        np.asarray(store.scores[np.array(paper_rows, dtype=np.int64)], dtype=np.float64),
+        np.array(src, dtype=np.int32),
+        np.array(dst, dtype=np.int32),
+        np.array(types, dtype=np.int8),
+        fingerprint=fingerprint
+    )
+
+
+def _fingerprint(query: str) -> str:
+    """论文存储和网络数据的版本，任何一方变化时索引需要重建"""
+    meta_path = os.path.join(store_dir(query), "meta.json")
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        meta_version = f"{os.stat(meta_path).st_mtime_ns}:{meta.get('count')}:{meta.get('score_version')}"
+    except (OSError, ValueError):
+        meta_version = "none"
+    count, updated_at = open_network_store(query).fingerprint()
+    return f"{meta_version}|{count}:{updated_at!r}"
+
+
+def get_graph_index(query: str) -> CitationGraphIndex:
+    """
+    获取查询的引用关系索引（经过进程内缓存）
+
+    磁盘上的 graph.npz 与当前的论文和网络数据一致时直接读取，否则重新构建并保存
+    """
+    def load():
+        # 先打开论文存储（必要时导入旧格式），再计算数据版本
+        store = get_store(query)
+        fingerprint = _fingerprint(query)
+        path = graph_index_file(query)
+        index = CitationGraphIndex.load(path)
+        if index is None or index.fingerprint != fingerprint:
+            index = build_graph_index(store, load_networks(query), fingerprint)
+            try:
+                index.save(path)
+            except OSError as e:
+                logger.warning(f"保存引用关系索引失败: {str(e)}")
+            logger.info(f"已构建查询 {query} 的引用关系索引: {index.node_count} 个节点, {index.edge_count} 条边")
+        return index, index.nbytes
+
+    def mtime():
+        return files_mtime([os.path.join(store_dir(query), "meta.json"), papers_file(query)]), network_version(query)
+
+    return query_cache.get_or_load("graph", query, load, mtime)
+
+
+def edge_types(index: CitationGraphIndex, edges: np.ndarray) -> List[str]:
+    return [EDGE_TYPE_NAMES[t] for t in index.edge_type[edges].tolist()]
@@ -0,0 +1,292 @@
+# services/jobs.py
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.persistence import read_json_file, write_json_file
+from config import JOBS_DIR, JOB_WORKERS, JOB_PERSIST_INTERVAL, JOB_RETENTION
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class Job:
+    """一个后台任务：类型 + 去重键（例如查询词）+ 参数，进度和状态会持久化到磁盘"""
+
+    def __init__(self, kind: str, key: str, params: dict, job_id: str = None, status: str = JOB_QUEUED,
+                 progress: dict = None, result: dict = None, error: str = None,
+                 created_at: float = None, updated_at: float = None, attempts: int = 0):
+        now = time.time()
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.params = params
+        self.status = status
+        self.progress = progress or {}
+        self.result = result
+        self.error = error
+        self.created_at = created_at or now
+        self.updated_at = updated_at or now
+        self.attempts = attempts
+        # 运行期间又提交了新参数：结束后重新运行一次
+        self.rerun = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "key": self.key,
+            "params": self.params,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "attempts": self.attempts
+        }
+
+    def summary(self) -> dict:
+        """不包含参数的状态信息（参数可能很大，例如上百个论文ID）"""
+        info = self.to_dict()
+        info.pop("params")
+        return info
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        return cls(
+            data["kind"], data["key"], data.get("params") or {},
+            job_id=data["id"], status=data.get("status", JOB_QUEUED),
+            progress=data.get("progress"), result=data.get("result"), error=data.get("error"),
+            created_at=data.get("created_at"), updated_at=data.get("updated_at"),
+            attempts=data.get("attempts", 0)
+        )
+
+
+# 任务处理函数：传入任务和进度回调，返回结果字典（可为 None）
+JobHandler = Callable[[Job, Callable[[dict], None]], Awaitable[Optional[dict]]]
+
+
+def _merge_params(current: dict, new: dict) -> dict:
+    """合并参数：列表取并集（保持顺序），其他值用新值覆盖"""
+    merged = dict(current)
+    for name, value in new.items():
+        if isinstance(value, list) and isinstance(merged.get(name), list):
+            merged[name] = list(dict.fromkeys(merged[name] + value))
+        else:
+            merged[name] = value
+    return merged
+
+
+class JobRunner:
+    """
+    进程内的后台任务队列
+
+    - 固定数量的 worker 从队列中取任务执行，处理函数按任务类型注册
+    - 同一类型、同一去重键的未完成任务只有一个：重复提交时合并参数，
+      任务已在运行时，结束后用合并后的参数再运行一次
+    - 每个任务一个 JSON 文件（JOBS_DIR/<id>.json），状态变化时立即写入，进度最多每
+      JOB_PERSIST_INTERVAL 秒写入一次；启动时未完成的任务（包括上次退出时正在运行的）重新排队
+    - 状态在事件循环中取快照，写入交给专用的单线程执行器：不阻塞事件循环，同一任务的多次写入按提交顺序完成
+    """
+
+    def __init__(self, jobs_dir: str = JOBS_DIR, workers: int = JOB_WORKERS):
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self._handlers: Dict[str, JobHandler] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[Tuple[str, str], Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._persisted_at: Dict[str, float] = {}
+        self._loaded = False
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist-jobs")
+
+    @property
+    def is_started(self) -> bool:
+        return bool(self._worker_tasks)
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _persist(self, job: Job):
+        """取任务状态的快照并提交写入，不等待写入完成"""
+        job.updated_at = time.time()
+        self._persisted_at[job.id] = time.monotonic()
+        self._writer.submit(self._write, job.id, job.to_dict())
+
+    def _write(self, job_id: str, data: dict):
+        try:
+            os.makedirs(self.jobs_dir, exist_ok=True)
+            write_json_file(self._path(job_id), data)
+        except OSError as e:
+            logger.warning(f"保存任务 {job_id} 状态失败: {str(e)}")
+
+    async def flush(self):
+        """等待已提交的状态写入完成"""
+        await asyncio.get_running_loop().run_in_executor(self._writer, lambda: None)
+
+    def _load(self):
+        """读取磁盘上的任务，清理过期的已完成任务"""
+        if self._loaded or not os.path.isdir(self.jobs_dir):
+            self._loaded = True
+            return
+        self._loaded = True
+        now = time.time()
+        for filename in os.listdir(self.jobs_dir):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.jobs_dir, filename)
+            try:
+                job = Job.from_dict(read_json_file(path))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"读取任务文件出错: {filename}, {str(e)}")
+                continue
+            if job.finished and now - job.updated_at > JOB_RETENTION:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            self._jobs[job.id] = job
+            if not job.finished:
+                job.status = JOB_QUEUED
+                self._active[(job.kind, job.key)] = job
+
+    async def start(self):
+        """启动 worker，并恢复上次未完成的任务"""
+        if self.is_started:
+            return
+        self._load()
+        self._queue = asyncio.Queue()
+        resumed = sorted(self._active.values(), key=lambda job: job.created_at)
+        for job in resumed:
+            self._queue.put_nowait(job)
+        if resumed:
+            logger.info(f"恢复 {len(resumed)} 个未完成的后台任务")
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+
+    async def stop(self):
+        """停止 worker；正在运行的任务在磁盘上保持 running 状态，下次启动时重新运行"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+        await self.flush()
+
+    def submit(self, kind: str, key: str, params: dict) -> Job:
+        """提交任务，同一 (kind, key) 已有未完成的任务时合并参数并返回该任务"""
+        if kind not in self._handlers:
+            raise ValueError(f"未注册的任务类型: {kind}")
+        self._load()
+        job = self._active.get((kind, key))
+        if job is not None:
+            merged = _merge_params(job.params, params)
+            if merged != job.params:
+                job.params = merged
+                job.rerun = job.status == JOB_RUNNING
+                self._persist(job)
+            return job
+
+        job = Job(kind, key, params)
+        self._jobs[job.id] = job
+        self._active[(kind, key)] = job
+        self._persist(job)
+        # 未启动时任务只写入磁盘，启动后恢复执行
+        if self._queue is not None:
+            self._queue.put_nowait(job)
+        logger.info(f"提交后台任务 {job.id}: {kind} {key}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._load()
+        return self._jobs.get(job_id)
+
+    def find(self, kind: str, key: str) -> Optional[Job]:
+        """同一 (kind, key) 未完成的任务，没有时返回最近完成的任务"""
+        self._load()
+        job = self._active.get((kind, key))
+        if job is not None:
+            return job
+        finished = [job for job in self._jobs.values() if job.kind == kind and job.key == key]
+        return max(finished, key=lambda job: job.updated_at) if finished else None
+
+    def list(self, status: str = None) -> List[Job]:
+        self._load()
+        jobs = [job for job in self._jobs.values() if status is None or job.status == status]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def stats(self) -> dict:
+        counts = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": len(self._worker_tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": counts
+        }
+
+    async def _run(self, job: Job):
+        handler = self._handlers.get(job.kind)
+        job.status = JOB_RUNNING
+        job.attempts += 1
+        job.error = None
+        self._persist(job)
+
+        def report(progress: dict):
+            job.progress = progress
+            if time.monotonic() - self._persisted_at.get(job.id, 0.0) >= JOB_PERSIST_INTERVAL:
+                self._persist(job)
+
+        try:
+            if handler is None:
+                raise ValueError(f"未注册的任务类型: {job.kind}")
+            job.result = await handler(job, report)
+            job.status = JOB_COMPLETED
+            logger.info(f"后台任务 {job.id} 完成: {job.kind} {job.key}")
+        except asyncio.CancelledError:
+            # 进程退出：磁盘上保持 running，下次启动时恢复
+            raise
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            logger.error(f"后台任务 {job.id} 失败: {job.kind} {job.key}, {str(e)}", exc_info=True)
+
+        if job.rerun:
+            job.rerun = False
+            job.status = JOB_QUEUED
+            self._persist(job)
+            self._queue.put_nowait(job)
+            return
+        self._active.pop((job.kind, job.key), None)
+        self._persist(job)
+        self._persisted_at.pop(job.id, None)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+
+# 进程内共享的任务队列，由 FastAPI 的 lifespan 负责启动和停止
+job_runner = JobRunner()
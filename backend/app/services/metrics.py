@@ -0,0 +1,250 @@
+# services/metrics.py
+
+import asyncio
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from app.services.tracing import span
+from config import METRICS_PREFIX, METRICS_LATENCY_BUCKETS, METRICS_STAGE_BUCKETS, METRICS_WAIT_BUCKETS
+
+# 采集时生成的样本：(指标名, 类型, 说明, [(标签字典, 值), ...])
+Family = Tuple[str, str, str, List[Tuple[dict, float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """
+    指标基类：按标签值分组保存，记录时只做一次加锁的字典更新
+
+    I/O 线程池中也会记录指标，因此需要加锁
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple) -> dict:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Tuple[str, dict, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, self._labels(key), value) for key, value in sorted(items)]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """固定分桶的直方图：每个标签组合保存各桶计数、总和与次数"""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = ()):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块的耗时（秒），出现异常时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items()]
+        samples = []
+        for key, (counts, total, count) in sorted(items):
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    进程内的指标注册表
+
+    - counter / gauge / histogram 在记录时更新
+    - collector 在采集时调用，把已有的统计（限流器、缓存、任务队列等）转换为指标，平时没有任何开销
+    """
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已存在: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(self.prefix + name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(self.prefix + name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = METRICS_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self.prefix + name, help, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus 文本格式（version 0.0.4）"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, metric_type, help, samples in collector():
+                name = self.prefix + name
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共享的指标注册表，由 /metrics 路由输出
+registry = MetricsRegistry()
+
+# 上游（Semantic Scholar）请求
+upstream_requests = registry.counter(
+    "upstream_requests_total", "发送到 Semantic Scholar 的请求数（不含响应缓存命中）", ("endpoint", "status"))
+upstream_latency = registry.histogram(
+    "upstream_request_duration_seconds", "上游请求耗时（不含限流等待）", ("endpoint",))
+upstream_throttled = registry.counter(
+    "upstream_throttled_total", "上游返回 429（或带 Retry-After 的 503）的次数", ("endpoint",))
+upstream_retries = registry.counter(
+    "upstream_retries_total", "上游请求失败后的重试次数", ("endpoint", "source"))
+response_cache_hits = registry.counter(
+    "response_cache_hits_total", "响应缓存命中、没有访问上游的请求数", ("endpoint",))
+
+# 等待时间
+limiter_wait = registry.histogram(
+    "rate_limiter_wait_seconds", "等待限流器（并发槽位和令牌）的时间", buckets=METRICS_WAIT_BUCKETS)
+semaphore_wait = registry.histogram(
+    "semaphore_wait_seconds", "等待并发信号量的时间", ("name",), buckets=METRICS_WAIT_BUCKETS)
+
+# 搜索流程
+stage_duration = registry.histogram(
+    "stage_duration_seconds", "搜索流程各阶段的耗时", ("stage",), buckets=METRICS_STAGE_BUCKETS)
+local_data_checks = registry.counter(
+    "local_data_checks_total", "check_local_data 的结果（complete 时走离线路径）", ("result",))
+search_sources = registry.counter(
+    "search_requests_total", "搜索请求的数据来源", ("source",))
+
+# 本地数据读写
+data_bytes = registry.counter(
+    "data_bytes_total", "查询数据的读写字节数", ("store", "direction"))
+
+
+def record_bytes(store: str, direction: str, nbytes: int):
+    if nbytes:
+        data_bytes.inc(nbytes, store=store, direction=direction)
+
+
+@asynccontextmanager
+async def timed_semaphore(semaphore: asyncio.Semaphore, name: str):
+    """获取信号量并记录等待时间"""
+    start = time.perf_counter()
+    async with semaphore:
+        semaphore_wait.observe(time.perf_counter() - start, name=name)
+        yield
+
+
+@contextmanager
+def timed_block(stage: str):
+    """代码块的耗时记入 stage_duration，同时在当前请求的追踪记录中记录同名的 span"""
+    with span(stage), stage_duration.time(stage=stage):
+        yield
+
+
+def timed_stage(stage: str):
+    """异步函数的装饰器：每次调用的耗时记入 stage_duration 和请求追踪"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with timed_block(stage):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,168 @@
+# services/network_prefetch.py
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.services.client import get_client
+from app.services.fetcher import fetch_paper_relations, is_retryable_error
+from app.services.metrics import upstream_retries
+from config import (
+    NETWORK_PREFETCH_WORKERS,
+    NETWORK_PREFETCH_MAX_RETRIES,
+    NETWORK_PREFETCH_RETRY_DELAY,
+    NETWORK_PREFETCH_LOG_EVERY
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchProgress:
+    """引用网络预取的进度与吞吐量统计"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def finished(self) -> int:
+        return self.completed + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """每秒完成的论文网络数"""
+        elapsed = self.elapsed
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        throughput = self.throughput
+        remaining = self.total - self.finished
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "elapsed": round(self.elapsed, 2),
+            "throughput": round(throughput, 3),
+            "eta": round(remaining / throughput, 1) if throughput > 0 else None
+        }
+
+
+async def fetch_network(client, paper_id: str) -> dict:
+    """并行获取单篇论文的引用和参考文献（只请求一次，失败时抛出异常）"""
+    citations, references = await asyncio.gather(
+        fetch_paper_relations(client, paper_id, "citations", with_retry=False),
+        fetch_paper_relations(client, paper_id, "references", with_retry=False)
+    )
+    return {"citations": citations, "references": references}
+
+
+async def prefetch_networks(
+    paper_ids: List[str],
+    save_network: Callable[[str, dict], None],
+    workers: int = NETWORK_PREFETCH_WORKERS,
+    max_retries: int = NETWORK_PREFETCH_MAX_RETRIES,
+    on_progress: Optional[Callable[[PrefetchProgress], None]] = None
+) -> Dict[str, dict]:
+    """
+    有界并发地获取一组论文的引用网络
+
+    - 固定数量的 worker 从队列中取任务，真正的请求速率由共享客户端的限流器决定
+    - 每篇论文完成后立即调用 save_network 写入，不等待整批结束
+    - 失败的论文延迟后重新放回队尾，重试期间不占用 worker，也不阻塞队列
+    - 通过日志和 on_progress 回调报告进度和吞吐量
+
+    Returns:
+        dict: paper_id -> network，只包含成功获取的论文
+    """
+    paper_ids = list(dict.fromkeys(pid for pid in paper_ids if pid))
+    progress = PrefetchProgress(len(paper_ids))
+    results: Dict[str, dict] = {}
+    if not paper_ids:
+        return results
+
+    client = get_client()
+    queue: asyncio.Queue = asyncio.Queue()
+    for paper_id in paper_ids:
+        queue.put_nowait((paper_id, 0))
+
+    retry_tasks = set()
+
+    def report():
+        if on_progress is not None:
+            try:
+                on_progress(progress)
+            except Exception as e:
+                logger.warning(f"进度回调出错: {str(e)}")
+        if progress.finished % NETWORK_PREFETCH_LOG_EVERY == 0 or progress.finished == progress.total:
+            stats = progress.to_dict()
+            logger.info(
+                f"引用网络预取进度: {progress.finished}/{progress.total} "
+                f"(失败 {progress.failed}, 重试 {progress.retried}), "
+                f"吞吐量 {stats['throughput']:.2f} 篇/秒, 预计剩余 {stats['eta']} 秒"
+            )
+
+    async def requeue_later(item, delay: float):
+        # 延迟后放回队列，再结束原任务，保证 queue.join() 不会提前返回
+        try:
+            await asyncio.sleep(delay)
+            queue.put_nowait(item)
+        finally:
+            queue.task_done()
+
+    async def worker():
+        while True:
+            paper_id, attempt = await queue.get()
+            try:
+                network = await fetch_network(client, paper_id)
+            except Exception as e:
+                retryable = is_retryable_error(e) or not isinstance(e, HTTPException)
+                if retryable and attempt < max_retries:
+                    progress.retried += 1
+                    upstream_retries.inc(endpoint="citations+references", source="prefetch")
+                    delay = NETWORK_PREFETCH_RETRY_DELAY * (2 ** attempt)
+                    logger.warning(f"获取论文 {paper_id} 的引用网络失败，{delay:.1f} 秒后重试: {str(e)}")
+                    task = asyncio.create_task(requeue_later((paper_id, attempt + 1), delay))
+                    retry_tasks.add(task)
+                    task.add_done_callback(retry_tasks.discard)
+                    continue
+                progress.failed += 1
+                logger.error(f"获取论文 {paper_id} 的引用网络失败: {str(e)}")
+                report()
+                queue.task_done()
+                continue
+
+            try:
+                save_network(paper_id, network)
+                results[paper_id] = network
+                progress.completed += 1
+            except Exception as e:
+                progress.failed += 1
+                logger.error(f"保存论文 {paper_id} 的引用网络失败: {str(e)}")
+            report()
+            queue.task_done()
+
+    worker_tasks = [asyncio.create_task(worker()) for _ in range(max(1, min(workers, len(paper_ids))))]
+    try:
+        await queue.join()
+    finally:
+        for task in worker_tasks + list(retry_tasks):
+            task.cancel()
+        await asyncio.gather(*worker_tasks, *retry_tasks, return_exceptions=True)
+
+    stats = progress.to_dict()
+    logger.info(
+        f"引用网络预取完成: 成功 {progress.completed}, 失败 {progress.failed}, "
+        f"重试 {progress.retried}, 耗时 {stats['elapsed']} 秒, 吞吐量 {stats['throughput']} 篇/秒"
+    )
+    return results
@@ -0,0 +1,444 @@
+"""
+所有查询共享一个 SQLite 数据库保存论文的引用网络（DATA_DIR/networks.db）
+
+- networks：按 paperId 去重的全局网络数据，每条记录带更新时间（新鲜度）
+- query_networks：查询引用了哪些论文的网络，同一篇论文被多个查询引用时只保存一份
+
+上游请求数和磁盘占用随不同论文的数量增长，而不是随查询数量增长。
+
+迁移已有的 networks/*.json 和旧版每个查询一个的 networks.db
+（在 backend 目录下运行，不指定查询词时迁移所有查询）:
+    python -m app.services.network_store [查询词 ...] [--remove-legacy]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services.query_cache import query_cache
+from app.services.persistence import dumps_str, loads, read_json_file
+from app.services.metrics import record_bytes
+from config import QUERIES_DIR, NETWORKS_DB
+
+logger = logging.getLogger(__name__)
+
+# SQLite 单条语句的参数数量上限（旧版本为 999）
+_SQL_VARIABLE_LIMIT = 900
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS networks (
+        paper_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS query_networks (
+        query TEXT NOT NULL,
+        paper_id TEXT NOT NULL,
+        PRIMARY KEY (query, paper_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS query_networks_paper ON query_networks (paper_id)",
+    """
+    CREATE TABLE IF NOT EXISTS migrated_queries (
+        query TEXT PRIMARY KEY,
+        migrated_at REAL NOT NULL
+    ) WITHOUT ROWID
+    """
+)
+
+# 同一篇论文已有数据时，只用更新的数据覆盖（导入旧数据不会覆盖较新的网络）
+_UPSERT = """
+INSERT INTO networks (paper_id, data, updated_at) VALUES (?, ?, ?)
+ON CONFLICT (paper_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+WHERE excluded.updated_at >= networks.updated_at
+"""
+
+
+def networks_db(query: str) -> str:
+    """旧格式：每个查询一个 networks.db（曾短暂替代 networks/*.json，现已由全局数据库取代，只用于迁移）"""
+    return os.path.join(QUERIES_DIR, query, "networks.db")
+
+
+def legacy_networks_dir(query: str) -> str:
+    """旧格式：每篇论文一个 JSON 文件"""
+    return os.path.join(QUERIES_DIR, query, "networks")
+
+
+def _chunks(items: List[str]):
+    for start in range(0, len(items), _SQL_VARIABLE_LIMIT):
+        yield items[start:start + _SQL_VARIABLE_LIMIT]
+
+
+def _encode(network: dict) -> str:
+    return dumps_str(network)
+
+
+class NetworkDatabase:
+    """
+    全局引用网络数据库（进程内共享一个连接）
+
+    - networks 按 paperId 主键查询，单篇读取 O(1)
+    - 写入时同一篇论文覆盖旧数据，并通知所有引用了这篇论文的查询的缓存失效
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+
+    def read(self, sql: str, params: Iterable = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, tuple(params)).fetchall()
+
+    def read_in(self, sql: str, paper_ids: List[str], params: Iterable = ()) -> list:
+        """sql 中的 {ids} 替换为 paper_ids 的占位符，按参数上限分块查询"""
+        rows = []
+        with self._lock:
+            for chunk in _chunks(paper_ids):
+                statement = sql.format(ids=",".join("?" * len(chunk)))
+                rows.extend(self._conn.execute(statement, (*params, *chunk)).fetchall())
+        return rows
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def write(self, entries: List[Tuple[str, dict, float]], query: Optional[str] = None):
+        """
+        写入 (paper_id, network, updated_at)，query 不为空时同时把这些论文加入该查询
+
+        网络数据是共享的：引用了这些论文的其他查询的缓存也会失效
+        """
+        if not entries:
+            return
+        rows = [(paper_id, _encode(network), updated_at) for paper_id, network, updated_at in entries]
+        paper_ids = [row[0] for row in rows]
+        record_bytes("networks", "written", sum(len(row[1]) for row in rows))
+        with self.transaction() as conn:
+            conn.executemany(_UPSERT, rows)
+            if query is not None:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO query_networks (query, paper_id) VALUES (?, ?)",
+                    [(query, paper_id) for paper_id in paper_ids]
+                )
+        self._bump(self.queries_of(paper_ids) | ({query} if query is not None else set()))
+
+    def link(self, query: str, paper_ids: List[str]) -> int:
+        """把全局已有的网络加入查询（不写入网络数据），返回新增的引用数"""
+        if not paper_ids:
+            return 0
+        with self.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO query_networks (query, paper_id) "
+                "SELECT ?, paper_id FROM networks WHERE paper_id = ?",
+                [(query, paper_id) for paper_id in paper_ids]
+            )
+            added = conn.total_changes - before
+        if added:
+            self._bump({query})
+        return added
+
+    def get_many(self, paper_ids: Iterable[str]) -> Dict[str, dict]:
+        """批量读取任意查询保存过的网络（论文来自多个查询的语料时使用），按请求的顺序返回"""
+        paper_ids = list(dict.fromkeys(pid for pid in paper_ids if pid))
+        networks = dict(self.read_in("SELECT paper_id, data FROM networks WHERE paper_id IN ({ids})", paper_ids))
+        record_bytes("networks", "read", sum(len(data) for data in networks.values()))
+        return {pid: loads(networks[pid]) for pid in paper_ids if pid in networks}
+
+    def get_fresh(self, paper_ids: List[str], max_age: float) -> Dict[str, dict]:
+        """读取任意查询在 max_age 秒内获取过的网络"""
+        cutoff = time.time() - max_age
+        rows = self.read_in(
+            "SELECT paper_id, data FROM networks WHERE updated_at >= ? AND paper_id IN ({ids})",
+            paper_ids, (cutoff,)
+        )
+        return {paper_id: loads(data) for paper_id, data in rows}
+
+    def queries_of(self, paper_ids: List[str]) -> Set[str]:
+        rows = self.read_in("SELECT DISTINCT query FROM query_networks WHERE paper_id IN ({ids})", paper_ids)
+        return {row[0] for row in rows}
+
+    def is_migrated(self, query: str) -> bool:
+        return bool(self.read("SELECT 1 FROM migrated_queries WHERE query = ?", (query,)))
+
+    def mark_migrated(self, query: str):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO migrated_queries (query, migrated_at) VALUES (?, ?)",
+                         (query, time.time()))
+
+    def _bump(self, queries: Iterable[str]):
+        for query in queries:
+            query_cache.bump("networks", query)
+            query_cache.bump("graph", query)
+
+    def stats(self) -> dict:
+        papers, data_bytes = self.read("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM networks")[0]
+        links, queries = self.read("SELECT COUNT(*), COUNT(DISTINCT query) FROM query_networks")[0]
+        return {
+            "path": self.path,
+            "papers": papers,
+            "data_bytes": data_bytes,
+            "query_links": links,
+            "queries": queries,
+            "dedup_ratio": round(links / papers, 3) if papers else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class NetworkStore:
+    """
+    单个查询的引用网络（全局数据库上的视图）
+
+    - count() / ids() 只扫描 query_networks 的主键索引，不解析网络数据
+    - get_many() / put_many() 一条语句批量读写
+    - adopt() 直接引用其他查询最近获取过的网络，不需要请求上游
+    """
+
+    def __init__(self, db: NetworkDatabase, query: str):
+        self.db = db
+        self.query = query
+
+    @property
+    def path(self) -> str:
+        return self.db.path
+
+    def count(self) -> int:
+        return self.db.read("SELECT COUNT(*) FROM query_networks WHERE query = ?", (self.query,))[0][0]
+
+    def __len__(self):
+        return self.count()
+
+    def __contains__(self, paper_id: str) -> bool:
+        return bool(self.db.read(
+            "SELECT 1 FROM query_networks WHERE query = ? AND paper_id = ?", (self.query, paper_id)
+        ))
+
+    def ids(self) -> Set[str]:
+        return {row[0] for row in self.db.read(
+            "SELECT paper_id FROM query_networks WHERE query = ?", (self.query,)
+        )}
+
+    def get(self, paper_id: str) -> Optional[dict]:
+        return self.get_many([paper_id]).get(paper_id)
+
+    def get_many(self, paper_ids: Iterable[str]) -> Dict[str, dict]:
+        """批量读取，只返回本查询引用了的论文"""
+        paper_ids = list(dict.fromkeys(pid for pid in paper_ids if pid))
+        rows = self.db.read_in(
+            "SELECT n.paper_id, n.data FROM query_networks q JOIN networks n ON n.paper_id = q.paper_id "
+            "WHERE q.query = ? AND q.paper_id IN ({ids})",
+            paper_ids, (self.query,)
+        )
+        networks = dict(rows)
+        record_bytes("networks", "read", sum(len(data) for data in networks.values()))
+        # 解析放在锁外，按请求的顺序返回
+        return {pid: loads(networks[pid]) for pid in paper_ids if pid in networks}
+
+    def all(self) -> Dict[str, dict]:
+        rows = self.db.read(
+            "SELECT n.paper_id, n.data FROM query_networks q JOIN networks n ON n.paper_id = q.paper_id "
+            "WHERE q.query = ?", (self.query,)
+        )
+        record_bytes("networks", "read", sum(len(data) for _, data in rows))
+        return {paper_id: loads(data) for paper_id, data in rows}
+
+    def fingerprint(self):
+        """(网络数量, 最近更新时间)，本查询的引用变化或引用的网络被任何查询更新时都会改变"""
+        return tuple(self.db.read(
+            "SELECT COUNT(*), MAX(n.updated_at) FROM query_networks q JOIN networks n ON n.paper_id = q.paper_id "
+            "WHERE q.query = ?", (self.query,)
+        )[0])
+
+    def data_size(self) -> int:
+        """本查询引用的网络数据的总字节数"""
+        return self.db.read(
+            "SELECT COALESCE(SUM(LENGTH(n.data)), 0) FROM query_networks q "
+            "JOIN networks n ON n.paper_id = q.paper_id WHERE q.query = ?", (self.query,)
+        )[0][0]
+
+    def put(self, paper_id: str, network: dict):
+        self.put_many({paper_id: network})
+
+    def put_many(self, networks: Dict[str, dict]):
+        """批量写入（同一篇论文覆盖旧数据）并加入本查询，在一个事务中完成"""
+        now = time.time()
+        self.db.write([(paper_id, network, now) for paper_id, network in networks.items()], self.query)
+
+    def adopt(self, paper_ids: Iterable[str], max_age: float) -> Dict[str, dict]:
+        """
+        任意查询在 max_age 秒内获取过的网络直接加入本查询，返回这些网络
+
+        没有命中或已经过期的论文需要调用方在线获取
+        """
+        paper_ids = list(dict.fromkeys(pid for pid in paper_ids if pid))
+        networks = self.db.get_fresh(paper_ids, max_age)
+        self.db.link(self.query, list(networks))
+        return networks
+
+
+_db: Optional[NetworkDatabase] = None
+_db_lock = threading.Lock()
+
+
+def get_network_db() -> NetworkDatabase:
+    """
+    全局网络数据库的共享连接
+
+    数据库文件被删除（例如清空数据目录）时关闭旧连接再重新创建：继续使用旧连接会写入已删除的文件，
+    仍持有旧连接的 NetworkStore 之后的操作会报错而不是静默丢失数据
+    """
+    global _db
+    with _db_lock:
+        if _db is not None and not os.path.exists(NETWORKS_DB):
+            logger.warning(f"网络数据库 {NETWORKS_DB} 已被删除，重新创建")
+            _db.close()
+            _db = None
+            query_cache.invalidate("networks")
+        if _db is None:
+            _db = NetworkDatabase(NETWORKS_DB)
+        return _db
+
+
+def open_network_store(query: str) -> NetworkStore:
+    """
+    获取查询的引用网络视图
+
+    查询第一次打开时，自动导入旧的 networks/*.json 和每个查询一个的 networks.db
+    """
+    db = get_network_db()
+    store = NetworkStore(db, query)
+    if not db.is_migrated(query):
+        migrate_legacy_networks(query, db)
+    return store
+
+
+def load_networks(query: str) -> Dict[str, dict]:
+    """
+    读取查询的全部引用网络（经过进程内缓存，调用方不应修改返回的数据）
+
+    本进程写入网络数据，或本查询的网络被其他进程修改时重新读取
+    """
+    def load():
+        store = open_network_store(query)
+        return store.all(), store.data_size()
+
+    return query_cache.get_or_load("networks", query, load, lambda: network_version(query))
+
+
+def network_version(query: str):
+    """查询网络数据的版本（用作缓存的修改时间），数据库不存在时为 None"""
+    if not os.path.exists(NETWORKS_DB):
+        return None
+    # 只读取，不触发旧数据导入（缓存检查时持有缓存的锁，导入会写缓存）
+    return NetworkStore(get_network_db(), query).fingerprint()
+
+
+def close_network_stores():
+    global _db
+    with _db_lock:
+        if _db is not None:
+            _db.close()
+        _db = None
+
+
+def _read_legacy_entries(query: str) -> List[Tuple[str, dict, float]]:
+    """读取旧格式的网络数据 (paper_id, network, updated_at)，无法解析的文件会被跳过"""
+    entries = []
+
+    legacy_db = networks_db(query)
+    if os.path.exists(legacy_db):
+        try:
+            conn = sqlite3.connect(legacy_db)
+            try:
+                for paper_id, data, updated_at in conn.execute("SELECT paper_id, data, updated_at FROM networks"):
+                    entries.append((paper_id, loads(data), updated_at))
+            finally:
+                conn.close()
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"读取旧网络数据库出错: {legacy_db}, {str(e)}")
+
+    legacy_dir = legacy_networks_dir(query)
+    if os.path.isdir(legacy_dir):
+        for filename in os.listdir(legacy_dir):
+            if not filename.endswith('.json'):
+                continue
+            network_path = os.path.join(legacy_dir, filename)
+            try:
+                # 用文件修改时间作为网络数据的更新时间
+                entries.append((filename[:-len('.json')], read_json_file(network_path), os.path.getmtime(network_path)))
+            except Exception as e:
+                logger.warning(f"读取网络数据文件出错: {filename}, {str(e)}")
+    return entries
+
+
+def migrate_legacy_networks(query: str, db: NetworkDatabase = None, remove_legacy: bool = False) -> int:
+    """
+    把查询旧格式的网络数据导入全局数据库，返回导入的网络数量
+
+    同一篇论文在多个查询中都有时只保存一份（保留更新时间最新的）
+    """
+    if db is None:
+        db = get_network_db()
+    entries = _read_legacy_entries(query)
+    db.write(entries, query)
+    db.mark_migrated(query)
+    if entries:
+        logger.info(f"已将查询 {query} 的 {len(entries)} 个引用网络导入 {db.path}")
+
+    if remove_legacy and entries:
+        shutil.rmtree(legacy_networks_dir(query), ignore_errors=True)
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(networks_db(query) + suffix)
+            except OSError:
+                pass
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把各查询旧格式的引用网络迁移到全局网络数据库")
+    parser.add_argument("queries", nargs="*", help="要迁移的查询词，默认迁移全部")
+    parser.add_argument("--remove-legacy", action="store_true",
+                        help="迁移后删除旧的 networks/ 目录和每个查询的 networks.db")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    queries = args.queries or sorted(
+        name for name in os.listdir(QUERIES_DIR)
+        if os.path.isdir(legacy_networks_dir(name)) or os.path.exists(networks_db(name))
+    )
+    db = get_network_db()
+    for query in queries:
+        count = migrate_legacy_networks(query, db, remove_legacy=args.remove_legacy)
+        print(json.dumps({"query": query, "migrated": count, "total": NetworkStore(db, query).count()},
+                         ensure_ascii=False))
+    print(json.dumps(db.stats(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
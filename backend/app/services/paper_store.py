@@ -0,0 +1,331 @@
+# services/paper_store.py
+
+import json
+import logging
+import mmap
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.services.query_cache import query_cache, files_mtime
+from app.services.persistence import dumps, loads, read_json_file
+from app.services.metrics import record_bytes
+from app.services.tracing import traced
+from app.services.scorer import ensure_scores, scorer_version
+from config import QUERIES_DIR
+
+logger = logging.getLogger(__name__)
+
+# 列式存储格式版本，格式变化时递增，旧格式会从 papers.json 重新导入
+STORE_FORMAT_VERSION = 1
+
+# 年份列的特殊值：缺失（None）和无法解析（这样的论文在筛选时总是被排除，与 score_and_filter 一致）
+YEAR_MISSING = -1
+YEAR_INVALID = -2
+
+
+def query_dir(query: str) -> str:
+    return os.path.join(QUERIES_DIR, query)
+
+
+def papers_file(query: str) -> str:
+    """旧格式的 papers.json（仍然可以导入）"""
+    return os.path.join(query_dir(query), "papers.json")
+
+
+def store_dir(query: str) -> str:
+    return os.path.join(query_dir(query), "store")
+
+
+def _year_value(value) -> int:
+    if value is None:
+        return YEAR_MISSING
+    try:
+        return int(value)
+    except (ValueError, TypeError, OverflowError):
+        return YEAR_INVALID
+
+
+def _citation_value(value) -> int:
+    try:
+        return int(value)
+    except (ValueError, TypeError, OverflowError):
+        return 0
+
+
+def _encode(value) -> bytes:
+    return dumps(value)
+
+
+def _write_lines(path: str, values: Iterable) -> np.ndarray:
+    """逐行写入紧凑 JSON，返回每行的起始偏移（最后一个元素是文件总长度）"""
+    offsets = [0]
+    with open(path, "wb") as f:
+        for value in values:
+            data = _encode(value) + b"\n"
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    return np.array(offsets, dtype=np.int64)
+
+
+def write_store(query: str, papers: list):
+    """
+    把已评分的论文写入列式存储
+
+    目录结构（QUERIES_DIR/<query>/store/）：
+    - year.npy / citations.npy / score.npy：数值列，可以直接内存映射
+    - records.jsonl + records.idx.npy：除摘要以外的字段，每篇论文一行，按偏移按需读取
+    - abstracts.jsonl + abstracts.idx.npy：摘要单独存放，筛选和排序时完全不会读取
+    - meta.json：论文数量、格式版本和评分器版本（最后写入）
+    """
+    target = store_dir(query)
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    scores = [paper.get("score") for paper in papers]
+    np.save(os.path.join(tmp, "year.npy"),
+            np.array([_year_value(paper.get("year")) for paper in papers], dtype=np.int64))
+    np.save(os.path.join(tmp, "citations.npy"),
+            np.array([_citation_value(paper.get("citationCount", 0)) for paper in papers], dtype=np.int64))
+    np.save(os.path.join(tmp, "score.npy"),
+            np.array([np.nan if score is None else score for score in scores], dtype=np.float64))
+
+    records = (
+        {key: value for key, value in paper.items() if key != "abstract"}
+        for paper in papers
+    )
+    np.save(os.path.join(tmp, "records.idx.npy"), _write_lines(os.path.join(tmp, "records.jsonl"), records))
+    np.save(os.path.join(tmp, "abstracts.idx.npy"),
+            _write_lines(os.path.join(tmp, "abstracts.jsonl"), (paper.get("abstract") for paper in papers)))
+
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": STORE_FORMAT_VERSION,
+            "count": len(papers),
+            "score_version": scorer_version()
+        }, f)
+    record_bytes("papers", "written", sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)))
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+
+
+class PaperStore:
+    """
+    单个查询的列式论文存储
+
+    year / citations / scores 是内存映射的数组，筛选和排序只访问这三列；
+    论文的其余字段和摘要只在 paper() / papers() 时按偏移读取对应的行，
+    解析结果会被保留，同一个 PaperStore 再次读取同一篇论文时不再访问文件。
+    """
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+        self.count = meta["count"]
+        self.years = self._load_column("year.npy")
+        self.citations = self._load_column("citations.npy")
+        self.scores = self._load_column("score.npy")
+        self._record_offsets = self._load_column("records.idx.npy")
+        self._abstract_offsets = self._load_column("abstracts.idx.npy")
+        self._records = None
+        self._abstracts = None
+        self._parsed_records: Dict[int, dict] = {}
+        self._parsed_abstracts: Dict[int, Optional[str]] = {}
+
+    def _load_column(self, name: str) -> np.ndarray:
+        path = os.path.join(self.path, name)
+        try:
+            return np.load(path, mmap_mode="r")
+        except ValueError:
+            # 空数组无法内存映射
+            return np.load(path)
+
+    def _map(self, name: str):
+        path = os.path.join(self.path, name)
+        if os.path.getsize(path) == 0:
+            return b""
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def score_version(self) -> Optional[str]:
+        return self.meta.get("score_version")
+
+    @property
+    def nbytes(self) -> int:
+        """数据在磁盘上的总大小"""
+        return sum(
+            os.path.getsize(os.path.join(self.path, name))
+            for name in os.listdir(self.path)
+        )
+
+    def filter(self, min_year: int = None, min_citations: int = None,
+               min_score: float = None) -> np.ndarray:
+        """按年份、引用量和分数筛选，返回符合条件的论文下标（保持原有顺序）"""
+        years = self.years
+        mask = years != YEAR_INVALID
+        if min_year:
+            mask &= (years != YEAR_MISSING) & (years >= min_year)
+        if min_citations:
+            mask &= self.citations >= min_citations
+        # 无法评分的论文分数为 NaN，任何比较结果都是 False
+        mask &= ~np.isnan(self.scores)
+        if min_score is not None:
+            mask &= self.scores >= min_score
+        return np.flatnonzero(mask)
+
+    def rank(self, indices: np.ndarray) -> np.ndarray:
+        """按分数从高到低排序下标，分数相同时保持原有顺序（与 list.sort 的稳定排序一致）"""
+        indices = np.asarray(indices, dtype=np.int64)
+        order = np.argsort(-self.scores[indices], kind="stable")
+        return indices[order]
+
+    def pin_columns(self):
+        """把数值列和偏移读入内存（数据很小），之后筛选和排序不再访问文件"""
+        self.years = np.array(self.years)
+        self.citations = np.array(self.citations)
+        self.scores = np.array(self.scores)
+        self._record_offsets = np.array(self._record_offsets)
+        self._abstract_offsets = np.array(self._abstract_offsets)
+        record_bytes("papers", "read", sum(column.nbytes for column in (
+            self.years, self.citations, self.scores, self._record_offsets, self._abstract_offsets
+        )))
+
+    def count_qualified(self, min_score: float) -> int:
+        return int(np.count_nonzero(self.scores >= min_score))
+
+    def paper(self, index: int, with_abstract: bool = True) -> dict:
+        """读取单篇论文的完整数据（返回副本，调用方可以修改）"""
+        record = self._parsed_records.get(index)
+        if record is None:
+            if self._records is None:
+                self._records = self._map("records.jsonl")
+            start, end = self._record_offsets[index], self._record_offsets[index + 1]
+            record = self._parsed_records[index] = loads(self._records[start:end])
+            record_bytes("papers", "read", int(end - start))
+        paper = dict(record)
+        if with_abstract:
+            if index not in self._parsed_abstracts:
+                if self._abstracts is None:
+                    self._abstracts = self._map("abstracts.jsonl")
+                start, end = self._abstract_offsets[index], self._abstract_offsets[index + 1]
+                self._parsed_abstracts[index] = loads(self._abstracts[start:end])
+                record_bytes("papers", "read", int(end - start))
+            paper["abstract"] = self._parsed_abstracts[index]
+        return paper
+
+    def papers(self, indices: Iterable[int] = None, with_abstract: bool = True) -> List[dict]:
+        if indices is None:
+            indices = range(self.count)
+        return [self.paper(int(i), with_abstract) for i in indices]
+
+    def close(self):
+        for mapped in (self._records, self._abstracts):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._records = None
+        self._abstracts = None
+
+
+def _read_meta(path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _store_is_current(query: str, meta: Optional[dict]) -> bool:
+    if meta is None or meta.get("format") != STORE_FORMAT_VERSION:
+        return False
+    # papers.json 比列式存储新（例如手动替换或旧版本写入）时，重新导入
+    legacy = papers_file(query)
+    if os.path.exists(legacy):
+        store_mtime = os.path.getmtime(os.path.join(store_dir(query), "meta.json"))
+        if os.path.getmtime(legacy) > store_mtime:
+            return False
+    return True
+
+
+def has_papers(query: str) -> bool:
+    return (
+        os.path.exists(os.path.join(store_dir(query), "meta.json"))
+        or os.path.exists(papers_file(query))
+    )
+
+
+@traced("save_papers")
+def save_papers(query: str, papers: list):
+    """评分（已评分的论文直接复用）并保存查询的论文数据"""
+    ensure_scores(papers)
+    os.makedirs(query_dir(query), exist_ok=True)
+    write_store(query, papers)
+    query_cache.bump("papers", query)
+    query_cache.bump("graph", query)
+    query_cache.bump("text", "*")
+
+
+def import_papers_json(query: str) -> int:
+    """把旧格式的 papers.json 导入列式存储，返回导入的论文数量"""
+    papers = read_json_file(papers_file(query))
+    record_bytes("papers", "read", os.path.getsize(papers_file(query)))
+    save_papers(query, papers)
+    logger.info(f"已将查询 {query} 的 papers.json 导入列式存储: {len(papers)} 篇论文")
+    return len(papers)
+
+
+def open_store(query: str) -> PaperStore:
+    """
+    打开查询的列式论文存储
+
+    - 只有 papers.json（或它更新）时，先导入为列式存储
+    - 评分器版本变化时，重新评分过期的论文并重写存储；之后的读取不需要任何评分
+    - 两者都不存在时抛出 FileNotFoundError
+    """
+    path = store_dir(query)
+    meta = _read_meta(path)
+    if not _store_is_current(query, meta):
+        if not os.path.exists(papers_file(query)):
+            raise FileNotFoundError(f"未找到查询 {query} 的论文数据")
+        import_papers_json(query)
+        meta = _read_meta(path)
+    elif meta.get("score_version") != scorer_version():
+        papers = PaperStore(path, meta).papers()
+        save_papers(query, papers)
+        logger.info(f"评分器版本变化，已重新评分查询 {query} 的 {len(papers)} 篇论文")
+        meta = _read_meta(path)
+    return PaperStore(path, meta)
+
+
+def get_store(query: str) -> PaperStore:
+    """
+    获取查询的论文存储（经过进程内缓存）
+
+    同一查询的重复请求直接复用已打开的存储和已解析的论文；
+    本进程保存新数据、其他进程修改了文件或评分器版本变化时重新打开。
+    """
+    def load():
+        store = open_store(query)
+        store.pin_columns()
+        return store, store.nbytes
+
+    def mtime():
+        return files_mtime([os.path.join(store_dir(query), "meta.json"), papers_file(query)])
+
+    store = query_cache.get_or_load("papers", query, load, mtime)
+    if store.score_version != scorer_version():
+        query_cache.bump("papers", query)
+        store = query_cache.get_or_load("papers", query, load, mtime)
+    return store
+
+
+def load_papers(query: str) -> list:
+    """读取查询的全部论文（包含已保存的分数），文件不存在时抛出 FileNotFoundError"""
+    return get_store(query).papers()
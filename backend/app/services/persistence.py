@@ -0,0 +1,135 @@
+# services/persistence.py
+
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config import PERSIST_IO_WORKERS, NETWORK_WRITE_BATCH_SIZE, NETWORK_WRITE_FLUSH_INTERVAL
+
+try:
+    import orjson
+except ImportError:  # orjson 是可选依赖，没有安装时回退到标准库
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default(value):
+    """numpy 标量和数组转换为 Python 类型"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def dumps(value) -> bytes:
+    """紧凑 JSON（UTF-8，不转义非 ASCII 字符）"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def dumps_str(value) -> str:
+    return dumps(value).decode("utf-8")
+
+
+def loads(data):
+    """解析 JSON（str、bytes 或 memoryview）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    return json.loads(data)
+
+
+# 文件读写和序列化使用的线程池，避免阻塞事件循环
+io_executor = ThreadPoolExecutor(max_workers=PERSIST_IO_WORKERS, thread_name_prefix="persist")
+
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """在 I/O 线程池中执行同步的读写函数"""
+    loop = asyncio.get_running_loop()
+    # 带上当前上下文（与 asyncio.to_thread 相同），线程中记录的 span 归入发起请求的追踪记录
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(io_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def write_json_file(path: str, value):
+    """原子地写入 JSON 文件（先写临时文件再替换）"""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(dumps(value))
+    os.replace(tmp, path)
+
+
+def read_json_file(path: str):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+class NetworkWriteBehind:
+    """
+    引用网络的延迟批量写入
+
+    add() 只放入内存缓冲区，不阻塞调用方；缓冲区达到 batch_size 篇，或距第一篇加入超过
+    flush_interval 秒时，在 I/O 线程池中用一个事务写入。close() 写入剩余的网络并等待完成。
+    """
+
+    def __init__(self, store, batch_size: int = NETWORK_WRITE_BATCH_SIZE,
+                 flush_interval: float = NETWORK_WRITE_FLUSH_INTERVAL):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failed = 0
+        self._buffer: Dict[str, dict] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    def add(self, paper_id: str, network: dict):
+        self._buffer[paper_id] = network
+        if len(self._buffer) >= self.batch_size:
+            self._spawn(self.flush())
+        elif self._timer is None:
+            self._timer = self._spawn(self._flush_later())
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, {}
+            try:
+                await run_io(self.store.put_many, batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"批量保存 {len(batch)} 篇论文的引用网络失败: {str(e)}")
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
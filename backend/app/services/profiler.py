@@ -0,0 +1,150 @@
+# services/profiler.py
+
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from config import ADMIN_TOKEN, PROFILE_INTERVAL, PROFILE_MAX_DURATION, PROFILE_TOP_STACKS
+
+logger = logging.getLogger(__name__)
+
+# 除事件循环线程外还要采样的线程（I/O 线程池、asyncio.to_thread、同步路由的线程池）
+SAMPLED_THREAD_PREFIXES = ("persist", "asyncio", "AnyIO worker thread")
+
+# 同一时间只运行一个采样分析，避免多个采样线程互相干扰
+_profile_lock = threading.Lock()
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """没有配置 ADMIN_TOKEN 时任何请求都不是管理员"""
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+def _is_idle_worker(frame) -> bool:
+    """线程池中空闲的工作线程（停在 _worker 里等待任务），不计入样本"""
+    code = frame.f_code
+    return code.co_name == "_worker" and code.co_filename.endswith(os.path.join("concurrent", "futures", "thread.py"))
+
+
+class SamplingProfiler:
+    """
+    周期性采样线程调用栈的分析器，用于生产环境中临时定位热点
+
+    事件循环线程上的协程交替执行，采样到的是当时正在运行的代码，因此同一时间其他请求的工作也会出现在结果中；
+    事件循环空闲（所有协程都在等待上游响应）时的样本停在 selectors 的 select 上
+    """
+
+    def __init__(self, target_thread: int, interval: float = PROFILE_INTERVAL,
+                 max_duration: float = PROFILE_MAX_DURATION):
+        self.target_thread = target_thread
+        self.interval = interval
+        self.max_duration = max_duration
+        self.stacks = Counter()
+        self.threads = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.truncated = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _threads_to_sample(self) -> dict:
+        names = {}
+        for thread in threading.enumerate():
+            if thread.ident == self.target_thread:
+                names[thread.ident] = "event_loop"
+            elif thread.name.startswith(SAMPLED_THREAD_PREFIXES):
+                names[thread.ident] = thread.name
+        return names
+
+    def _sample(self, names: dict):
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident)
+            if name is None or _is_idle_worker(frame):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(name)
+            self.stacks[";".join(reversed(stack))] += 1
+            self.threads[name] += 1
+        self.samples += 1
+
+    def _run(self):
+        names = self._threads_to_sample()
+        refreshed = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now - self.started > self.max_duration:
+                self.truncated = True
+                break
+            # 线程池中的线程是按需创建的，定期刷新采样的线程列表
+            if now - refreshed > 0.5:
+                names, refreshed = self._threads_to_sample(), now
+            self._sample(names)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def result(self, top: int = PROFILE_TOP_STACKS) -> dict:
+        """
+        采样结果：stacks 为折叠格式的调用栈（"线程;外层函数;...;内层函数"，可以直接生成火焰图），
+        functions 按函数汇总 self（位于栈顶）和 total（出现在栈中）的样本数
+        """
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        return {
+            "interval": self.interval,
+            "duration_seconds": round(self.elapsed, 3),
+            "samples": self.samples,
+            "truncated": self.truncated,
+            "threads": dict(self.threads),
+            "stacks": [{"stack": stack, "samples": count} for stack, count in self.stacks.most_common(top)],
+            "functions": [
+                {"function": function, "self": self_counts[function], "total": count}
+                for function, count in total_counts.most_common(top)
+            ]
+        }
+
+
+@asynccontextmanager
+async def profile_request(trace):
+    """对代码块运行采样分析，结果写入 trace.profile；已有分析在运行时跳过"""
+    if not _profile_lock.acquire(blocking=False):
+        trace.profile = {"skipped": "已有其他请求正在进行采样分析"}
+        yield
+        return
+    profiler = SamplingProfiler(threading.get_ident())
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        _profile_lock.release()
+        trace.profile = profiler.result()
+        logger.info(f"请求 {trace.id} 的采样分析完成: {profiler.samples} 次采样，耗时 {profiler.elapsed:.2f}s")
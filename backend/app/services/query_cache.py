@@ -0,0 +1,180 @@
+# services/query_cache.py
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from config import (
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_MAX_BYTES,
+    QUERY_CACHE_TTL,
+    QUERY_CACHE_REVALIDATE_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+
+def files_mtime(paths: Iterable[str]) -> float:
+    """一组文件中最新的修改时间（不存在的文件忽略，全部不存在时为0）"""
+    latest = 0.0
+    for path in paths:
+        try:
+            latest = max(latest, os.path.getmtime(path))
+        except OSError:
+            pass
+    return latest
+
+
+class _Entry:
+    __slots__ = ("value", "size", "version", "mtime", "loaded_at", "checked_at")
+
+    def __init__(self, value, size: int, version: int, mtime: float, now: float):
+        self.value = value
+        self.size = size
+        self.version = version
+        self.mtime = mtime
+        self.loaded_at = now
+        self.checked_at = now
+
+
+class QueryCache:
+    """
+    按查询词缓存解析后的论文数据和引用网络（LRU + TTL，进程内共享）
+
+    缓存项在以下情况失效：
+    - 本进程写入了对应数据（bump() 递增数据版本号）
+    - 距上次检查超过 revalidate_interval 秒，且源文件的修改时间变化（其他进程写入）
+    - 加载后超过 ttl 秒
+
+    在 revalidate_interval 内重复访问同一查询完全不访问磁盘。
+    超过 max_entries 或总大小超过 max_bytes 时淘汰最久未使用的项。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        max_bytes: int = QUERY_CACHE_MAX_BYTES,
+        ttl: float = QUERY_CACHE_TTL,
+        revalidate_interval: float = QUERY_CACHE_REVALIDATE_INTERVAL
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.revalidate_interval = revalidate_interval
+
+        self._entries: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        self._versions: Dict[Tuple[str, Hashable], int] = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidated = 0
+        self.evictions = 0
+
+    def bump(self, kind: str, key: Hashable):
+        """数据已被本进程修改：递增数据版本号，已缓存的旧数据不再命中"""
+        with self._lock:
+            self._versions[(kind, key)] = self._versions.get((kind, key), 0) + 1
+            self._remove((kind, key))
+
+    def invalidate(self, kind: Optional[str] = None, key: Hashable = None):
+        """清除缓存项：不指定 kind 时清空全部，不指定 key 时清除该类型的全部项"""
+        with self._lock:
+            for cache_key in list(self._entries):
+                if (kind is None or cache_key[0] == kind) and (key is None or cache_key[1] == key):
+                    self._remove(cache_key)
+
+    def _remove(self, cache_key):
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+
+    def _lookup(self, cache_key, mtime_of: Callable[[], float]):
+        """返回仍然有效的缓存项，失效时移除并返回 None"""
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if entry.version != self._versions.get(cache_key, 0):
+            self.invalidated += 1
+        elif now - entry.loaded_at >= self.ttl:
+            self.expired += 1
+        elif now - entry.checked_at < self.revalidate_interval:
+            return entry
+        elif mtime_of() == entry.mtime:
+            entry.checked_at = now
+            return entry
+        else:
+            self.invalidated += 1
+        self._remove(cache_key)
+        return None
+
+    def get_or_load(
+        self,
+        kind: str,
+        key: Hashable,
+        loader: Callable[[], Tuple[Any, int]],
+        mtime_of: Callable[[], float]
+    ):
+        """
+        读取缓存，未命中时调用 loader 加载并缓存
+
+        Args:
+            loader: 返回 (数据, 估算的大小字节数)
+            mtime_of: 返回数据源文件的修改时间，用于发现其他进程的修改
+        """
+        cache_key = (kind, key)
+        with self._lock:
+            entry = self._lookup(cache_key, mtime_of)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+
+        # 加载在锁外进行。先记录修改时间，加载期间文件的修改会在下次检查时发现；
+        # 数据版本号在加载之后读取，loader 自身的写入（例如导入旧格式）不会让结果作废
+        mtime = mtime_of()
+        value, size = loader()
+
+        with self._lock:
+            version = self._versions.get(cache_key, 0)
+            if size > self.max_bytes:
+                # 单项超过容量上限：不缓存
+                return value
+            self._remove(cache_key)
+            self._entries[cache_key] = _Entry(value, size, version, mtime, time.monotonic())
+            self.total_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.size
+                self.evictions += 1
+                logger.debug(f"查询缓存淘汰: {evicted_key}")
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "invalidated": self.invalidated,
+                "evictions": self.evictions,
+                "keys": [f"{kind}:{key}" for kind, key in self._entries]
+            }
+
+
+# 进程内共享的查询缓存（search 和 network 路由共用）
+query_cache = QueryCache()
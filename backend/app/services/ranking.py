@@ -0,0 +1,103 @@
+# services/ranking.py
+
+import heapq
+import itertools
+from typing import List
+
+
+class IncrementalTopK:
+    """
+    增量维护评分最高的 k 篇论文
+
+    论文分批到达时逐篇 push，内部用大小为 k 的最小堆，单次插入 O(log k)。
+    分数相同时先到达的论文排在前面，与对完整列表做稳定排序的结果一致。
+    """
+
+    def __init__(self, k: int):
+        self.k = max(k, 0)
+        self._heap = []
+        self._counter = itertools.count()
+        self.total_seen = 0
+
+    def push(self, paper: dict, score: float) -> bool:
+        """加入一篇论文，返回它当前是否进入了 top-k"""
+        self.total_seen += 1
+        if self.k == 0:
+            return False
+        # 堆顶是“最差”的论文：分数最低，分数相同时最晚到达
+        entry = (score, -next(self._counter), paper)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def extend(self, papers: List[dict], score_key: str = "score") -> int:
+        """批量加入论文，返回进入 top-k 的数量"""
+        return sum(1 for paper in papers if self.push(paper, paper[score_key]))
+
+    @property
+    def threshold(self):
+        """进入 top-k 所需的最低分数（未满 k 篇时为 None）"""
+        if len(self._heap) < self.k:
+            return None
+        return self._heap[0][0]
+
+    def __len__(self):
+        return len(self._heap)
+
+    def ranked(self) -> List[dict]:
+        """按分数从高到低返回当前的 top-k"""
+        return [entry[2] for entry in sorted(self._heap, key=lambda e: (-e[0], -e[1]))]
+
+
+class AdaptiveFetchEstimator:
+    """
+    分页获取搜索结果时，估计剩余的页还能让多少篇论文进入 top-k
+
+    - 每页到达后更新 top-k；最近 window_pages 页（按偏移）中分数高于当前第 k 名
+      （未满 k 篇时为任何合格论文）的比例，作为后续页面中论文能进入 top-k 的概率
+    - 比例加 0.5 的平滑，避免最近几页恰好没有高分论文时过早认为后续页不会再有
+    - 预计进入 top-k 的论文数不超过 (1 - confidence) * k 时，认为 top-k 已经稳定
+    """
+
+    def __init__(self, k: int, confidence: float, min_pages: int = 1, window_pages: int = 2):
+        self.top = IncrementalTopK(k)
+        self.k = max(k, 1)
+        self.confidence = confidence
+        self.min_pages = min_pages
+        self.window_pages = window_pages
+        # offset -> (本页论文数, 本页合格论文的分数)
+        self._pages = {}
+        self.expected_entrants = None
+
+    @property
+    def pages(self) -> int:
+        return len(self._pages)
+
+    def add_page(self, offset: int, fetched: int, qualified: List[dict], score_key: str = "score") -> int:
+        """加入一页的合格论文，返回进入 top-k 的数量"""
+        self._pages[offset] = (fetched, [paper[score_key] for paper in qualified])
+        return self.top.extend(qualified, score_key)
+
+    def entry_rate(self) -> float:
+        """最近几页中论文能进入当前 top-k 的比例（平滑后）"""
+        threshold = self.top.threshold
+        recent = [self._pages[offset] for offset in sorted(self._pages)[-self.window_pages:]]
+        fetched = sum(count for count, _ in recent)
+        entering = sum(
+            1 for _, scores in recent for score in scores
+            if threshold is None or score > threshold
+        )
+        return (entering + 0.5) / (fetched + 1)
+
+    def should_stop(self, remaining: int) -> bool:
+        """剩余 remaining 篇论文预计进入 top-k 的数量足够少时返回 True"""
+        if remaining <= 0:
+            return True
+        if self.pages < self.min_pages:
+            return False
+        self.expected_entrants = self.entry_rate() * remaining
+        return self.expected_entrants <= (1 - self.confidence) * self.k
@@ -0,0 +1,189 @@
+# services/rate_limiter.py
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.services.metrics import limiter_wait
+from config import (
+    RATE_LIMIT_RPS,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_MIN_CONCURRENCY,
+    RATE_LIMIT_MAX_CONCURRENCY,
+    RATE_LIMIT_INITIAL_CONCURRENCY,
+    RATE_LIMIT_INCREASE_STEP,
+    RATE_LIMIT_DECREASE_FACTOR,
+    RATE_LIMIT_DEFAULT_BACKOFF,
+    RATE_LIMIT_MAX_BACKOFF
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头，返回需要等待的秒数
+
+    Retry-After 可以是秒数，也可以是 HTTP 日期；无法解析时返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """
+    自适应限流器
+
+    1. 令牌桶：按 rate（每秒请求数）补充令牌，最多积累 burst 个，控制请求速率
+    2. AIMD 并发控制：成功时并发上限缓慢增加（加性增），遇到429时减半（乘性减）
+    3. Retry-After：遇到429时在指定时间内暂停所有请求
+
+    令牌的预留在同步代码中完成（中间没有 await），因此并发协程不会读到同一个状态而一起突发。
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_RPS,
+        burst: int = RATE_LIMIT_BURST,
+        min_concurrency: int = RATE_LIMIT_MIN_CONCURRENCY,
+        max_concurrency: int = RATE_LIMIT_MAX_CONCURRENCY,
+        initial_concurrency: float = RATE_LIMIT_INITIAL_CONCURRENCY,
+        increase_step: float = RATE_LIMIT_INCREASE_STEP,
+        decrease_factor: float = RATE_LIMIT_DECREASE_FACTOR,
+        default_backoff: float = RATE_LIMIT_DEFAULT_BACKOFF,
+        max_backoff: float = RATE_LIMIT_MAX_BACKOFF
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate 必须大于0，burst 至少为1")
+
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.default_backoff = default_backoff
+        self.max_backoff = max_backoff
+
+        # 令牌桶状态（允许为负数，表示已经被预留的未来令牌）
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+
+        # AIMD 并发状态
+        self.concurrency_limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+        # 统计
+        self.acquired_total = 0
+        self.throttled_total = 0
+        self.total_wait_time = 0.0
+
+    def _get_condition(self) -> asyncio.Condition:
+        # 延迟创建，保证绑定到实际运行的事件循环
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _reserve_token(self) -> float:
+        """预留一个令牌，返回需要等待的秒数"""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+        self._tokens -= 1
+        wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+        return max(wait, self._blocked_until - now)
+
+    async def acquire(self):
+        """获取一个请求许可：先占用并发槽位，再等待令牌"""
+        start = time.monotonic()
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.concurrency_limit))
+            self.in_flight += 1
+
+        try:
+            wait = self._reserve_token()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            await self.release()
+            raise
+
+        waited = time.monotonic() - start
+        self.acquired_total += 1
+        self.total_wait_time += waited
+        limiter_wait.observe(waited)
+
+    async def release(self):
+        """释放并发槽位"""
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def on_success(self):
+        """请求成功：加性增加并发上限（大约每个并发窗口 +increase_step）"""
+        self.concurrency_limit = min(
+            float(self.max_concurrency),
+            self.concurrency_limit + self.increase_step / max(self.concurrency_limit, 1.0)
+        )
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """遇到429：乘性减少并发上限，并在 Retry-After 期间暂停发送"""
+        self.throttled_total += 1
+        self.concurrency_limit = max(
+            float(self.min_concurrency),
+            self.concurrency_limit * self.decrease_factor
+        )
+
+        backoff = retry_after if retry_after is not None else self.default_backoff
+        backoff = min(backoff, self.max_backoff)
+        self._blocked_until = max(self._blocked_until, time.monotonic() + backoff)
+        # 清空已积累的令牌，暂停结束后不会立即突发
+        self._tokens = min(self._tokens, 0.0)
+
+        logger.warning(
+            f"触发限流(429)，并发上限降为 {int(self.concurrency_limit)}，暂停 {backoff:.1f} 秒"
+        )
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(min(float(self.burst), self._tokens + (now - self._last_refill) * self.rate), 3),
+            "concurrency_limit": round(self.concurrency_limit, 3),
+            "in_flight": self.in_flight,
+            "blocked_for": round(max(self._blocked_until - now, 0.0), 3),
+            "acquired_total": self.acquired_total,
+            "throttled_total": self.throttled_total,
+            "avg_wait_time": round(self.total_wait_time / self.acquired_total, 4) if self.acquired_total else 0.0
+        }
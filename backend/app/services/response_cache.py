@@ -0,0 +1,245 @@
+# services/response_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+from config import (
+    RESPONSE_CACHE_DB,
+    RESPONSE_CACHE_MODE,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTLS
+)
+
+logger = logging.getLogger(__name__)
+
+# 缓存模式
+CACHE_OFF = "off"              # 不使用缓存
+CACHE_READWRITE = "readwrite"  # 命中且未过期时直接返回，否则请求上游并保存
+CACHE_OFFLINE = "offline"      # 只读缓存（过期的也返回），未命中时不请求上游
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+# 按路径识别接口，用于选择 TTL
+_ENDPOINT_PATTERNS = (
+    ("search", re.compile(r"^/paper/search$")),
+    ("batch", re.compile(r"^/paper/batch$")),
+    ("citations", re.compile(r"^/paper/[^/]+/citations$")),
+    ("references", re.compile(r"^/paper/[^/]+/references$")),
+    ("paper", re.compile(r"^/paper/[^/]+$")),
+)
+
+# 只保存这些响应头，其余（日期、连接、限流计数等）与内容无关
+_KEPT_HEADERS = ("content-type",)
+
+
+class CacheMissError(HTTPException):
+    """离线模式下缓存未命中（不会重试，也不会请求上游）"""
+
+    def __init__(self, method: str, url: str):
+        super().__init__(status_code=504, detail=f"离线模式：响应缓存中没有 {method} {url}")
+
+
+def endpoint_of(path: str) -> str:
+    path = "/" + path.split("?", 1)[0].strip("/")
+    for name, pattern in _ENDPOINT_PATTERNS:
+        if pattern.match(path):
+            return name
+    return "other"
+
+
+def cache_key(method: str, url: str, params=None, json_body=None) -> str:
+    """
+    响应的内容地址：方法、路径、规范化后的参数（顺序和值类型不影响）和请求体的 SHA-256
+    """
+    normalized = {
+        "method": method.upper(),
+        "path": "/" + str(url).strip("/"),
+        "params": sorted((str(k), str(v)) for k, v in (params or {}).items()),
+        "body": json_body
+    }
+    encoded = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Semantic Scholar 响应的磁盘缓存（一个 SQLite 数据库）
+
+    - 只缓存 200 响应，按接口设置 TTL（RESPONSE_CACHE_TTLS，TTL 为 0 的接口不缓存）
+    - 总大小超过 max_bytes 时，按最近访问时间淘汰到上限的 90%
+    - offline 模式只读缓存，未命中时抛出 CacheMissError；可以用录制好的缓存在没有网络的环境下
+      确定性地重放真实请求（测试和基准测试）
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_DB, mode: str = RESPONSE_CACHE_MODE,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES, ttls: dict = None):
+        if mode not in (CACHE_OFF, CACHE_READWRITE, CACHE_OFFLINE):
+            raise ValueError(f"未知的响应缓存模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.ttls = dict(RESPONSE_CACHE_TTLS if ttls is None else ttls)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.total_bytes = 0
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stores = 0
+        self.evictions = 0
+        self.offline_misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != CACHE_OFF
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        return self._conn
+
+    def ttl_of(self, endpoint: str) -> float:
+        return self.ttls.get(endpoint, self.ttls.get("other", 0))
+
+    def lookup(self, method: str, url: str, params=None, json_body=None) -> Optional[httpx.Response]:
+        """
+        读取缓存的响应；readwrite 模式下未命中或过期时返回 None，offline 模式下未命中时抛出 CacheMissError
+        """
+        if not self.enabled:
+            return None
+        endpoint = endpoint_of(url)
+        offline = self.mode == CACHE_OFFLINE
+        if not offline and self.ttl_of(endpoint) <= 0:
+            return None
+
+        key = cache_key(method, url, params, json_body)
+        now = time.time()
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT status, headers, body, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            fresh = row is not None and (offline or now - row[3] < self.ttl_of(endpoint))
+            if fresh:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                self.hits += 1
+            elif row is not None:
+                self.expired += 1
+            else:
+                self.misses += 1
+
+        if not fresh:
+            if offline:
+                self.offline_misses += 1
+                raise CacheMissError(method, url)
+            return None
+        status, headers, body, _ = row
+        # 调用方负责设置 response.request（需要拼接 base_url）
+        return httpx.Response(
+            status,
+            headers={**json.loads(headers), "X-Response-Cache": "hit"},
+            content=body
+        )
+
+    def store(self, method: str, url: str, response: httpx.Response, params=None, json_body=None):
+        """保存 200 响应（offline 模式和 TTL 为 0 的接口不保存）"""
+        if self.mode != CACHE_READWRITE or response.status_code != 200:
+            return
+        endpoint = endpoint_of(url)
+        if self.ttl_of(endpoint) <= 0:
+            return
+
+        key = cache_key(method, url, params, json_body)
+        body = response.content
+        headers = json.dumps({name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers})
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, endpoint, method, url, status, headers, body, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, endpoint, method.upper(), str(url), response.status_code, headers, body, len(body), now, now)
+            )
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            self.stores += 1
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到总大小不超过上限的 90%"""
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            evicted.append((key,))
+            self.total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+        logger.info(f"响应缓存淘汰 {len(evicted)} 项，当前 {self.total_bytes} 字节")
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.expired
+        entries = None
+        if self.enabled:
+            with self._lock:
+                entries = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "entries": entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttls": self.ttls,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "offline_misses": self.offline_misses
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
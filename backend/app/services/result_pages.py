@@ -0,0 +1,89 @@
+# services/result_pages.py
+
+import base64
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from app.services.paper_store import PaperStore, get_store, store_dir, papers_file
+from app.services.persistence import dumps, loads
+from app.services.query_cache import query_cache, files_mtime
+
+logger = logging.getLogger(__name__)
+
+
+class RankedResults:
+    """
+    一个 (查询, 筛选条件) 的完整排序结果：只保存排序后的论文下标，
+    翻页时按下标从列式存储读取这一页的论文，代价与页大小成正比
+    """
+
+    def __init__(self, query: str, filters: tuple, store: PaperStore, indices: np.ndarray, version: str):
+        self.query = query
+        self.filters = filters
+        self.store = store
+        self.indices = indices
+        self.version = version
+
+    def __len__(self):
+        return len(self.indices)
+
+    def page(self, offset: int, limit: int) -> List[dict]:
+        return self.store.papers(self.indices[offset:offset + limit])
+
+    def cursor(self, offset: int) -> Optional[str]:
+        """指向 offset 的游标，已经到末尾时为 None"""
+        if offset >= len(self):
+            return None
+        return encode_cursor({"q": self.query, "f": list(self.filters), "o": offset, "v": self.version})
+
+
+def encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(dumps(state)).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """解析游标，格式不对时抛出 ValueError"""
+    try:
+        state = loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        query, filters, offset, version = state["q"], state["f"], state["o"], state["v"]
+    except Exception as e:
+        raise ValueError(f"无效的游标: {str(e)}")
+    if not isinstance(query, str) or not isinstance(offset, int) or offset < 0 or len(filters) != 3:
+        raise ValueError("无效的游标")
+    return {"query": query, "filters": tuple(filters), "offset": offset, "version": version}
+
+
+def _store_version(query: str) -> str:
+    try:
+        return str(os.stat(os.path.join(store_dir(query), "meta.json")).st_mtime_ns)
+    except OSError:
+        return "none"
+
+
+def get_ranked_results(query: str, min_year: int = None, min_citations: int = None,
+                       min_score: float = None) -> RankedResults:
+    """
+    获取查询在给定筛选条件下的排序结果（经过进程内缓存）
+
+    筛选和排序只在第一次请求时执行，之后的翻页直接复用；论文存储重新打开时（保存了新数据、
+    其他进程修改或评分器版本变化）重新计算
+    """
+    filters = (min_year, min_citations, min_score)
+    key = (query, *filters)
+    store = get_store(query)
+
+    def load():
+        indices = store.rank(store.filter(min_year, min_citations, min_score))
+        return RankedResults(query, filters, store, indices, _store_version(query)), indices.nbytes + 256
+
+    def mtime():
+        return files_mtime([os.path.join(store_dir(query), "meta.json"), papers_file(query)])
+
+    ranked = query_cache.get_or_load("ranked", key, load, mtime)
+    if ranked.store is not store:
+        query_cache.bump("ranked", key)
+        ranked = query_cache.get_or_load("ranked", key, load, mtime)
+    return ranked
@@ -1,37 +1,60 @@
 # services/scorer.py
+import re
+import zlib
+import hashlib
+import inspect
 import numpy as np
 from datetime import datetime
+from functools import lru_cache
+from typing import Mapping, Optional, Sequence, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 顶级期刊/会议及其加分（按优先级排列，命中多个时取排在最前面的）
+TOP_VENUES = {
+    "nature": 10, "science": 10,    # 从50降到10
+    "cell": 8,                      # 从40降到8
+    "neural information processing systems": 7,  # 从35降到7
+    "icml": 7, "iclr": 7,
+    "ieee": 6, "acm": 6             # 从30降到6
+}
+
+# 无效摘要
+INVALID_ABSTRACTS = ("no abstract", "暂无摘要")
+
+# 预编译的期刊匹配器：零宽前瞻可以找出所有位置（包括重叠位置）上的关键词
+_VENUE_PATTERN = re.compile("(?=(" + "|".join(re.escape(v) for v in TOP_VENUES) + "))")
+_VENUE_PRIORITY = {venue: index for index, venue in enumerate(TOP_VENUES)}
+_VENUE_WEIGHTS = list(TOP_VENUES.values())
+
 def calculate_paper_score(paper: dict) -> float:
     """
     计算论文的重要性分数
-    
+
     评分标准：
     1. 年份权重：越新的文章分数越高
     2. 引用量权重：使用对数计算，避免引用差异过大
     3. 期刊/会议权重：顶级期刊和会议有额外加分
     4. 摘要加分：有摘要的论文额外加分
-    
+
     Args:
         paper (dict): 包含论文信息的字典
-    
+
     Returns:
         float: 论文的综合评分
     """
     try:
         # 1. 基础分数 (30分)
         base_score = 30
-        
+
         # 2. 引用量权重 (最高40分) - 增加引用的权重
         citations = paper.get("citationCount", 0)
         if citations and isinstance(citations, (int, float)):
             citation_score = np.log1p(float(citations)) * 15  # 从10增加到15
         else:
             citation_score = 0
-            
+
         # 3. 年份权重 (最高20分)
         current_year = datetime.now().year
         year = paper.get("year")
@@ -45,29 +68,22 @@ def calculate_paper_score(paper: dict) -> float:
                 year_score = 10
         else:
             year_score = 0
-            
+
         # 4. 期刊/会议权重 (最高10分) - 大幅降低期刊权重
         venue_score = 0
         venue = paper.get("venue", "").lower() if paper.get("venue") else ""
-        top_venues = {
-            "nature": 10, "science": 10,    # 从50降到10
-            "cell": 8,                      # 从40降到8
-            "neural information processing systems": 7,  # 从35降到7
-            "icml": 7, "iclr": 7,
-            "ieee": 6, "acm": 6             # 从30降到6
-        }
-        for top_venue, weight in top_venues.items():
+        for top_venue, weight in TOP_VENUES.items():
             if venue and top_venue in venue:
                 venue_score = weight
                 break
-                
+
         # 5. 添加摘要评分 (10分)
         abstract_score = 0
         abstract = paper.get("abstract", "")
         if abstract and isinstance(abstract, str):
             abstract = abstract.strip()
             # 排除无效摘要
-            if abstract.lower() not in ["no abstract", "暂无摘要"]:
+            if abstract.lower() not in INVALID_ABSTRACTS:
                 # 根据摘要长度和质量给分
                 words = len(abstract.split())
                 if words >= 100:  # 完整摘要
@@ -76,8 +92,258 @@ def calculate_paper_score(paper: dict) -> float:
                     abstract_score = 15
                 else:  # 极短摘要
                     abstract_score = 10
-                    
+
         return base_score + citation_score + year_score + venue_score + abstract_score
-        
+
     except Exception as e:
         raise ValueError(f"计算论文评分时出错: {str(e)}")
+
+@lru_cache(maxsize=8192)
+def venue_weight(venue: str) -> int:
+    """期刊/会议加分，venue 需已转为小写；结果按 venue 缓存，同一期刊只匹配一次"""
+    best = None
+    for match in _VENUE_PATTERN.finditer(venue):
+        priority = _VENUE_PRIORITY[match.group(1)]
+        if best is None or priority < best:
+            best = priority
+    return _VENUE_WEIGHTS[best] if best is not None else 0
+
+def abstract_score(abstract) -> int:
+    """摘要加分，与 calculate_paper_score 的规则相同，但最多只切分前100个词"""
+    if not abstract or not isinstance(abstract, str):
+        return 0
+    # 只需要知道词数是否达到 50/100，maxsplit=99 时结果最多100段
+    words = len(abstract.split(None, 99))
+    # 无效摘要最多2个词，只有这种情况才需要 strip/lower 比较
+    if words <= 2 and abstract.strip().lower() in INVALID_ABSTRACTS:
+        return 0
+    if words >= 100:
+        return 20
+    if words >= 50:
+        return 15
+    return 10
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float))
+
+def calculate_paper_scores_batch(
+    papers: Union[Sequence[dict], Mapping[str, Sequence]],
+    current_year: Optional[int] = None,
+    return_components: bool = False
+):
+    """
+    批量计算论文评分，结果与逐篇调用 calculate_paper_score 完全一致
+
+    Args:
+        papers: 论文字典列表，或列式数据（包含 citationCount/year/venue/abstract 列的映射，
+                例如 dict of lists 或 pandas.DataFrame）。列式数据中数值列的 NaN 视为缺失。
+        current_year: 计算年份权重时使用的当前年份，默认取今年
+        return_components: 为 True 时同时返回各评分分项（citation/year/venue/abstract）
+
+    Returns:
+        np.ndarray: float64 数组；calculate_paper_score 会抛出异常的论文对应 NaN
+        return_components=True 时返回 (scores, components)
+    """
+    if current_year is None:
+        current_year = datetime.now().year
+
+    if isinstance(papers, Mapping) or hasattr(papers, "columns"):
+        citations, citation_valid, years, year_valid, venue_scores, abstract_scores, errors = \
+            _extract_columns(papers)
+    else:
+        citations, citation_valid, years, year_valid, venue_scores, abstract_scores, errors = \
+            _extract_records(papers)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # 引用量权重
+        citation_scores = np.where(citation_valid, np.log1p(citations) * 15, 0.0)
+
+        # 年份权重
+        year_diff = current_year - years
+        year_scores = np.select(
+            [~year_valid, year_diff <= 5, year_diff <= 10],
+            [0, 20, 15],
+            default=10
+        )
+
+    # 按与标量版本相同的顺序累加，保证浮点结果一致
+    scores = 30 + citation_scores + year_scores + venue_scores + abstract_scores
+    scores[errors] = np.nan
+    if return_components:
+        return scores, {
+            "citation": citation_scores,
+            "year": year_scores,
+            "venue": venue_scores,
+            "abstract": abstract_scores
+        }
+    return scores
+
+def scorer_version(current_year: Optional[int] = None) -> str:
+    """
+    评分器版本号：评分函数源码、期刊权重表和当前年份的哈希
+
+    评分规则改变或跨年（年份权重随之变化）时版本号改变，已保存的分数会被重新计算
+    """
+    if current_year is None:
+        current_year = datetime.now().year
+    return f"{_SCORER_SOURCE_HASH}-{current_year}"
+
+def score_inputs_key(paper: dict) -> str:
+    """影响评分的输入字段的指纹，字段变化时需要重新评分"""
+    raw = "\x1f".join(
+        repr(paper.get(field)) for field in ("citationCount", "year", "venue", "abstract")
+    )
+    return format(zlib.crc32(raw.encode("utf-8", "surrogatepass")), "08x")
+
+def needs_rescore(paper: dict, version: Optional[str] = None) -> bool:
+    """论文是否缺少分数，或分数由旧版本评分器/旧的输入字段计算得到"""
+    return (
+        paper.get("score_version") != (version or scorer_version())
+        or paper.get("score_inputs") != score_inputs_key(paper)
+    )
+
+def ensure_scores(papers: list) -> int:
+    """
+    为缺少分数或分数已过期的论文评分，并把分数、分项和版本信息写回论文字典
+
+    写入的字段：
+    - score: 综合评分（无法评分时为 None）
+    - score_components: 各评分分项
+    - score_version: 评分器版本号
+    - score_inputs: 评分输入字段的指纹
+
+    Returns:
+        int: 本次重新评分的论文数量（为0表示全部命中缓存，没有做任何评分）
+    """
+    version = scorer_version()
+    stale = [paper for paper in papers if needs_rescore(paper, version)]
+    if not stale:
+        return 0
+
+    scores, components = calculate_paper_scores_batch(stale, return_components=True)
+    for i, paper in enumerate(stale):
+        try:
+            if np.isnan(scores[i]):
+                paper["score"] = None
+                paper.pop("score_components", None)
+            else:
+                paper["score"] = float(scores[i])
+                paper["score_components"] = {
+                    name: float(values[i]) for name, values in components.items()
+                }
+            paper["score_version"] = version
+            paper["score_inputs"] = score_inputs_key(paper)
+        except Exception as e:
+            logger.warning(f"保存论文评分失败: {str(e)}")
+    logger.debug(f"重新评分 {len(stale)}/{len(papers)} 篇论文 (评分器版本 {version})")
+    return len(stale)
+
+def _extract_records(papers: Sequence[dict]):
+    """从论文字典列表中一次性提取各评分所需的列（先填充 Python 列表，最后整体转换为数组）"""
+    n = len(papers)
+    citations = [0.0] * n
+    years = [0] * n
+    year_valid = [False] * n
+    venue_scores = [0] * n
+    abstract_scores = [0] * n
+    error_indices = []
+    number_types = (int, float)
+
+    for i, paper in enumerate(papers):
+        try:
+            get = paper.get
+            value = get("citationCount", 0)
+            if value and isinstance(value, number_types):
+                citations[i] = float(value)
+
+            value = get("year")
+            if value and isinstance(value, number_types):
+                years[i] = int(value)
+                year_valid[i] = True
+
+            venue = get("venue")
+            if venue:
+                venue_scores[i] = venue_weight(venue.lower())
+
+            # 摘要评分规则与 abstract_score 相同，这里内联以减少函数调用开销
+            abstract = get("abstract", "")
+            if abstract and isinstance(abstract, str):
+                words = len(abstract.split(None, 99))
+                if words >= 100:
+                    abstract_scores[i] = 20
+                elif words >= 50:
+                    abstract_scores[i] = 15
+                elif words > 2 or abstract.strip().lower() not in INVALID_ABSTRACTS:
+                    abstract_scores[i] = 10
+        except Exception:
+            # 与 calculate_paper_score 抛出 ValueError 的情况对应
+            error_indices.append(i)
+
+    citations = np.array(citations, dtype=np.float64)
+    years = np.array(years, dtype=np.int64)
+    errors = np.zeros(n, dtype=bool)
+    errors[error_indices] = True
+    # 有效的引用量一定非0（0 与缺失的得分相同），NaN 引用量与标量版本一样保留
+    citation_valid = citations != 0
+    return (citations, citation_valid, years, np.array(year_valid, dtype=bool),
+            np.array(venue_scores, dtype=np.int64), np.array(abstract_scores, dtype=np.int64), errors)
+
+def _column(table, name: str, n: int):
+    if name in table:
+        return table[name]
+    return [None] * n
+
+def _extract_columns(table):
+    """从列式数据中提取各评分所需的列，数值列为数组时完全向量化"""
+    n = len(next(iter(table.values()))) if isinstance(table, Mapping) else len(table)
+    errors = np.zeros(n, dtype=bool)
+
+    def numeric(name: str):
+        column = _column(table, name, n)
+        array = np.asarray(column)
+        if array.dtype.kind in "iuf":
+            values = array.astype(np.float64)
+            valid = (values != 0) & ~np.isnan(values)
+            return values, valid
+        values = np.zeros(n, dtype=np.float64)
+        valid = np.zeros(n, dtype=bool)
+        for i, value in enumerate(column):
+            if value and _is_number(value):
+                values[i] = float(value)
+                valid[i] = True
+        return values, valid
+
+    citations, citation_valid = numeric("citationCount")
+    year_values, year_valid = numeric("year")
+    finite = np.isfinite(year_values)
+    errors |= year_valid & ~finite
+    years = np.where(year_valid & finite, np.trunc(np.where(finite, year_values, 0)), 0).astype(np.int64)
+
+    venue_scores = np.zeros(n, dtype=np.int64)
+    for i, venue in enumerate(_column(table, "venue", n)):
+        if venue:
+            try:
+                venue_scores[i] = venue_weight(venue.lower())
+            except Exception:
+                errors[i] = True
+
+    abstract_scores = np.fromiter(
+        (abstract_score(abstract) for abstract in _column(table, "abstract", n)),
+        dtype=np.int64,
+        count=n
+    )
+
+    return citations, citation_valid, years, year_valid, venue_scores, abstract_scores, errors
+
+def _source_hash() -> str:
+    """计算评分相关函数和常量的哈希，源码不可用时退回到常量哈希"""
+    parts = [repr(TOP_VENUES), repr(INVALID_ABSTRACTS)]
+    for func in (calculate_paper_score, calculate_paper_scores_batch, venue_weight,
+                 abstract_score, _extract_records, _extract_columns):
+        try:
+            parts.append(inspect.getsource(func))
+        except (OSError, TypeError):
+            parts.append(func.__name__)
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:12]
+
+_SCORER_SOURCE_HASH = _source_hash()
@@ -0,0 +1,208 @@
+# services/search_stats.py
+
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, List
+
+import numpy as np
+
+from app.services.paper_store import PaperStore, store_dir, papers_file
+from app.services.query_cache import query_cache, files_mtime
+from app.services.result_pages import get_ranked_results
+from config import SEARCH_STATS_SCORE_BINS, SEARCH_STATS_CITATION_BINS, SEARCH_STATS_TOP_N
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (25, 50, 75, 90, 99)
+
+
+def _bin_labels(edges: tuple, unit: str = "") -> List[str]:
+    """[50, 60, 70] -> ["<50", "50-60", "60-70", ">=70"]"""
+    labels = [f"<{edges[0]}{unit}"]
+    labels += [f"{low}-{high}{unit}" for low, high in zip(edges, edges[1:])]
+    labels.append(f">={edges[-1]}{unit}")
+    return labels
+
+
+def _histogram(sorted_values: np.ndarray, edges: tuple) -> dict:
+    """按分桶边界统计数量（左闭右开），利用已排序的数组只需二分查找"""
+    bounds = np.searchsorted(sorted_values, edges, side="left")
+    counts = np.diff(np.concatenate(([0], bounds, [len(sorted_values)])))
+    return dict(zip(_bin_labels(edges), counts.tolist()))
+
+
+def _describe(sorted_values: np.ndarray, digits: int = 2) -> dict:
+    """最小值、最大值、均值和百分位数（输入已排序）"""
+    if len(sorted_values) == 0:
+        return {"min": None, "max": None, "avg": None, **{f"p{p}": None for p in PERCENTILES}}
+    quantiles = np.percentile(sorted_values, PERCENTILES)
+    return {
+        "min": round(float(sorted_values[0]), digits),
+        "max": round(float(sorted_values[-1]), digits),
+        "avg": round(float(sorted_values.mean()), digits),
+        **{f"p{p}": round(float(q), digits) for p, q in zip(PERCENTILES, quantiles)}
+    }
+
+
+def _top(counter: Counter, top_n: int) -> dict:
+    return {
+        "distinct": len(counter),
+        "top": [{"name": name, "count": count} for name, count in counter.most_common(top_n)]
+    }
+
+
+def compute_stats(scores: np.ndarray, years: np.ndarray, citations: np.ndarray,
+                  venues: Iterable[str], fields: Iterable[Iterable[str]],
+                  top_n: int = SEARCH_STATS_TOP_N, current_year: int = None) -> dict:
+    """
+    一组论文的统计信息：每列只排序一次，最值、百分位数和分布都从排序后的数组得到
+
+    Args:
+        scores: 分数（缺失为 NaN，不参与统计）
+        years: 年份（缺失为 0）
+        citations: 引用数
+        venues: 每篇论文的期刊/会议（空值不计）
+        fields: 每篇论文的研究领域列表
+    """
+    current_year = current_year or datetime.now().year
+    count = len(scores)
+    scores = np.sort(scores[~np.isnan(scores)])
+    years = np.sort(years[years > 0])
+    citations = np.sort(citations)
+
+    # 与以往的返回格式兼容：score_distribution 的 max/min/avg、year_distribution 的 latest/earliest/last_*
+    score_stats = _describe(scores)
+    if len(scores) == 0:
+        score_stats.update({"min": 0, "max": 0, "avg": 0})
+
+    recent = np.searchsorted(years, [current_year - 1, current_year - 3, current_year - 5], side="left")
+    year_values, year_counts = np.unique(years, return_counts=True)
+    year_stats = {
+        "latest": int(years[-1]) if len(years) else None,
+        "earliest": int(years[0]) if len(years) else None,
+        "last_year": int(len(years) - recent[0]),
+        "last_3_years": int(len(years) - recent[1]),
+        "last_5_years": int(len(years) - recent[2]),
+        "older": int(recent[2]),
+        "median": float(np.median(years)) if len(years) else None,
+        "histogram": dict(zip(year_values.tolist(), year_counts.tolist()))
+    }
+
+    venue_counter = Counter(venue for venue in venues if venue)
+    field_counter = Counter(field for paper_fields in fields for field in (paper_fields or ()) if field)
+
+    return {
+        "count": count,
+        "score_distribution": {**score_stats, "histogram": _histogram(scores, SEARCH_STATS_SCORE_BINS)},
+        "year_distribution": year_stats,
+        "citation_distribution": {
+            **_describe(citations, digits=1),
+            "total": int(citations.sum()),
+            "histogram": _histogram(citations, SEARCH_STATS_CITATION_BINS)
+        },
+        "venues": _top(venue_counter, top_n),
+        "fields": _top(field_counter, top_n)
+    }
+
+
+def _number(value, default: float) -> float:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+
+def stats_from_papers(papers: List[dict], top_n: int = SEARCH_STATS_TOP_N) -> dict:
+    """论文字典列表的统计信息：一次遍历取出各列，之后全部向量化计算"""
+    n = len(papers)
+    scores = np.empty(n, dtype=np.float64)
+    years = np.empty(n, dtype=np.int64)
+    citations = np.empty(n, dtype=np.int64)
+    venues, fields = [], []
+    for i, paper in enumerate(papers):
+        scores[i] = _number(paper.get("score"), 0.0)
+        years[i] = _number(paper.get("year"), 0)
+        citations[i] = _number(paper.get("citationCount"), 0)
+        venues.append(paper.get("venue"))
+        paper_fields = paper.get("fieldsOfStudy")
+        fields.append(paper_fields if isinstance(paper_fields, (list, tuple)) else ())
+    return compute_stats(scores, years, citations, venues, fields, top_n)
+
+
+def stats_from_store(store: PaperStore, indices: np.ndarray, top_n: int = SEARCH_STATS_TOP_N) -> dict:
+    """
+    列式存储中一组论文的统计信息：分数、年份和引用数直接取自列，
+    期刊和研究领域需要解析论文记录（不读取摘要）
+    """
+    papers = store.papers(indices, with_abstract=False)
+    return compute_stats(
+        np.asarray(store.scores[indices], dtype=np.float64),
+        np.asarray(store.years[indices], dtype=np.int64),
+        np.asarray(store.citations[indices], dtype=np.int64),
+        [paper.get("venue") for paper in papers],
+        [paper.get("fieldsOfStudy") for paper in papers],
+        top_n
+    )
+
+
+def get_search_stats(query: str, min_year: int = None, min_citations: int = None,
+                     min_score: float = None) -> dict:
+    """
+    已保存的查询在给定筛选条件下的统计信息（经过进程内缓存）
+
+    依赖 get_ranked_results 的筛选结果，排序结果重新计算时（论文数据变化）统计信息也随之重新计算
+    """
+    filters = (min_year, min_citations, min_score)
+    key = (query, *filters)
+    ranked = get_ranked_results(query, *filters)
+
+    def load():
+        stats = {
+            "query": query,
+            "filters": {"min_year": min_year, "min_citations": min_citations, "min_score": min_score},
+            "total_available": len(ranked.store),
+            "qualified_papers": len(ranked),
+            "stats": stats_from_store(ranked.store, ranked.indices)
+        }
+        return (ranked, stats), 16 * 1024
+
+    def mtime():
+        return files_mtime([os.path.join(store_dir(query), "meta.json"), papers_file(query)])
+
+    cached_ranked, stats = query_cache.get_or_load("search_stats", key, load, mtime)
+    if cached_ranked is not ranked:
+        query_cache.bump("search_stats", key)
+        _, stats = query_cache.get_or_load("search_stats", key, load, mtime)
+    return stats
+
+
+def format_stats(stats: dict) -> str:
+    """统计信息的日志文本"""
+    scores = stats["score_distribution"]
+    years = stats["year_distribution"]
+    citations = stats["citation_distribution"]
+    lines = ["====== 分数统计 ======"]
+    if scores["p50"] is not None:
+        lines.append(
+            f"最高分: {scores['max']:.2f}  最低分: {scores['min']:.2f}  平均分: {scores['avg']:.2f}  "
+            f"中位数: {scores['p50']:.2f}  P90: {scores['p90']:.2f}"
+        )
+        lines.append("分数分布: " + ", ".join(f"{label}: {count}篇" for label, count in scores["histogram"].items()))
+    if years["latest"] is not None:
+        lines.append("====== 年份分布 ======")
+        lines.append(
+            f"最新: {years['latest']}  最早: {years['earliest']}  近1年: {years['last_year']}篇  "
+            f"近3年: {years['last_3_years']}篇  近5年: {years['last_5_years']}篇  5年以上: {years['older']}篇"
+        )
+    if citations["max"] is not None:
+        lines.append("====== 引用统计 ======")
+        lines.append(
+            f"最多: {citations['max']:.0f}  中位数: {citations['p50']:.0f}  平均: {citations['avg']:.1f}  "
+            f"总计: {citations['total']}"
+        )
+    for title, key in (("期刊/会议", "venues"), ("研究领域", "fields")):
+        top = stats[key]["top"][:5]
+        if top:
+            lines.append(f"{title}（共 {stats[key]['distinct']} 个）: " + ", ".join(
+                f"{entry['name']} ({entry['count']})" for entry in top
+            ))
+    return "\n".join(lines)
@@ -0,0 +1,94 @@
+# services/single_flight.py
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    合并相同的并发调用：同一个 key 正在执行时，后来的调用者等待同一个结果，不再重复执行
+
+    - 结果和异常都会原样交给所有等待者
+    - 执行放在独立的任务中：某个等待者被取消不会影响其他等待者
+    - 执行结束后立即移除，之后的调用重新执行（这里只合并并发调用，不是缓存）
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+        # 统计
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.peak_waiters = 0
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._finish(key, task))
+        else:
+            self.coalesced += 1
+            logger.debug(f"{self.name}: 合并进行中的调用 {key}")
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        self.peak_waiters = max(self.peak_waiters, self._waiters[key])
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+        # 没有等待者取走的异常不要报 "Task exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+            "in_flight": len(self._inflight),
+            "peak_waiters": self.peak_waiters
+        }
+
+
+class KeyedLock:
+    """
+    按 key 互斥：同一个 key 同时只有一个持有者，其余调用者排队等待
+
+    用于不能共享同一个结果、但会写入相同数据的调用（例如同一查询的流式和非流式搜索）；
+    没有持有者和等待者的 key 立即移除
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._users: Dict[Hashable, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._users[key] = self._users.get(key, 0) + 1
+        if lock.locked():
+            logger.debug(f"{self.name}: 等待进行中的调用 {key}")
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
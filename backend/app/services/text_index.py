@@ -0,0 +1,223 @@
+# services/text_index.py
+
+import logging
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.services.paper_store import has_papers, open_store, store_dir, papers_file
+from app.services.query_cache import query_cache, files_mtime
+from config import (
+    QUERIES_DIR,
+    TEXT_INDEX_BM25_K1,
+    TEXT_INDEX_BM25_B,
+    TEXT_INDEX_TITLE_WEIGHT,
+    TEXT_INDEX_MIN_MATCHES
+)
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it",
+    "of", "on", "or", "that", "the", "their", "this", "to", "via", "we", "with", "based", "using"
+})
+
+
+@lru_cache(maxsize=1 << 16)
+def normalize_term(token: str) -> str:
+    """简单的英文复数归一化，使 network / networks、study / studies 落到同一个词项"""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("sses"):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text) -> List[str]:
+    if not text or not isinstance(text, str):
+        return []
+    return [
+        normalize_term(token)
+        for token in _TOKEN_PATTERN.findall(text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+def query_terms(query: str) -> List[str]:
+    """查询中去重后的词项（保持顺序）"""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+class TextIndex:
+    """
+    跨所有本地查询语料的 BM25 倒排索引（标题 + 摘要，标题词频加权）
+
+    同一 paperId 在多个查询语料中出现时只索引一次，docs[i] 记录它所在的 (查询词, 行号)。
+    """
+
+    def __init__(self, docs: List[Tuple[str, int]], doc_lengths: np.ndarray,
+                 postings: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        self.docs = docs
+        self.doc_lengths = doc_lengths
+        self.postings = postings
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        # BM25 的长度归一化部分与查询无关，预先计算
+        self._length_norm = TEXT_INDEX_BM25_K1 * (
+            1 - TEXT_INDEX_BM25_B + TEXT_INDEX_BM25_B * doc_lengths / (self.avg_length or 1.0)
+        )
+
+    def __len__(self):
+        return len(self.docs)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = sum(ids.nbytes + tfs.nbytes for ids, tfs in self.postings.values())
+        return arrays + self.doc_lengths.nbytes * 2 + len(self.docs) * 80 + len(self.postings) * 100
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings[term][0]) if term in self.postings else 0
+        return float(np.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5)))
+
+    def search(self, query: str, limit: int, require_all: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        返回 BM25 得分最高的 limit 篇文档的 (文档编号, 得分)
+
+        默认包含至少匹配一个词项的文档；require_all 为 True 时只包含匹配全部查询词项的文档
+        """
+        terms = query_terms(query)
+        scores = np.zeros(len(self.docs), dtype=np.float64)
+        matched = np.zeros(len(self.docs), dtype=np.int32)
+        for term in terms:
+            if term not in self.postings:
+                continue
+            doc_ids, tfs = self.postings[term]
+            # 每个词项的倒排表中文档编号不重复，可以直接按下标累加
+            scores[doc_ids] += self.idf(term) * tfs * (TEXT_INDEX_BM25_K1 + 1) / (tfs + self._length_norm[doc_ids])
+            matched[doc_ids] += 1
+
+        candidates = np.flatnonzero(matched >= len(terms) if require_all else matched > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        order = np.argsort(-scores[candidates], kind="stable")
+        candidates = candidates[order]
+        return candidates, scores[candidates]
+
+    def coverage(self, query: str) -> dict:
+        """
+        本地数据对查询的覆盖程度
+
+        - term_coverage: 查询词项中在本地语料出现过的比例
+        - full_matches: 同时包含全部查询词项的文档数
+        - score: term_coverage * min(1, full_matches / TEXT_INDEX_MIN_MATCHES)，范围 [0, 1]
+        """
+        terms = query_terms(query)
+        present = [term for term in terms if term in self.postings]
+        term_coverage = len(present) / len(terms) if terms else 0.0
+
+        full_matches = 0
+        if terms and len(present) == len(terms):
+            # 从最短的倒排表开始求交集
+            lists = sorted((self.postings[term][0] for term in terms), key=len)
+            common = lists[0]
+            for doc_ids in lists[1:]:
+                common = np.intersect1d(common, doc_ids, assume_unique=True)
+                if not len(common):
+                    break
+            full_matches = len(common)
+
+        score = term_coverage * min(1.0, full_matches / TEXT_INDEX_MIN_MATCHES) if TEXT_INDEX_MIN_MATCHES else term_coverage
+        return {
+            "score": round(score, 4),
+            "terms": terms,
+            "term_coverage": round(term_coverage, 4),
+            "full_matches": full_matches,
+            "documents": len(self.docs)
+        }
+
+
+def local_queries() -> List[str]:
+    """本地保存了论文数据的所有查询词"""
+    try:
+        names = sorted(os.listdir(QUERIES_DIR))
+    except OSError:
+        return []
+    return [name for name in names if os.path.isdir(os.path.join(QUERIES_DIR, name)) and has_papers(name)]
+
+
+def build_text_index() -> TextIndex:
+    """遍历所有本地查询语料构建索引"""
+    docs: List[Tuple[str, int]] = []
+    lengths: List[float] = []
+    vocabulary: Dict[str, int] = {}
+    term_ids: List[int] = []
+    doc_ids: List[int] = []
+    tfs: List[float] = []
+    seen_ids = set()
+
+    for query in local_queries():
+        try:
+            store = open_store(query)
+        except Exception as e:
+            logger.warning(f"读取查询 {query} 的论文数据失败，跳过: {str(e)}")
+            continue
+        for row in range(len(store)):
+            paper = store.paper(row)
+            paper_id = paper.get("paperId")
+            if not paper_id or paper_id in seen_ids:
+                continue
+            seen_ids.add(paper_id)
+
+            counts = Counter(tokenize(paper.get("abstract")))
+            for term in tokenize(paper.get("title")):
+                counts[term] += TEXT_INDEX_TITLE_WEIGHT
+            if not counts:
+                continue
+
+            doc_id = len(docs)
+            docs.append((query, row))
+            lengths.append(float(sum(counts.values())))
+            term_ids.extend(vocabulary.setdefault(term, len(vocabulary)) for term in counts)
+            doc_ids.extend([doc_id] * len(counts))
+            tfs.extend(counts.values())
+        store.close()
+
+    # 按词项分组（稳定排序，组内文档编号保持递增）
+    term_ids = np.array(term_ids, dtype=np.int64)
+    order = np.argsort(term_ids, kind="stable")
+    doc_ids = np.array(doc_ids, dtype=np.int32)[order]
+    tfs = np.array(tfs, dtype=np.float32)[order]
+    bounds = np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)))
+    postings = {}
+    for term, term_id in vocabulary.items():
+        start = bounds[term_id - 1] if term_id else 0
+        postings[term] = (doc_ids[start:bounds[term_id]], tfs[start:bounds[term_id]])
+    return TextIndex(docs, np.array(lengths, dtype=np.float64), postings)
+
+
+def get_text_index() -> TextIndex:
+    """获取跨查询全文索引（经过进程内缓存，任何查询的论文数据变化后重建）"""
+    def load():
+        index = build_text_index()
+        logger.info(f"已构建本地全文索引: {len(index)} 篇论文, {len(index.postings)} 个词项")
+        return index, index.nbytes
+
+    def mtime():
+        paths = []
+        for query in local_queries():
+            paths.append(os.path.join(store_dir(query), "meta.json"))
+            paths.append(papers_file(query))
+        # 查询目录的增删也会改变 QUERIES_DIR 的修改时间
+        paths.append(QUERIES_DIR)
+        return files_mtime(paths)
+
+    return query_cache.get_or_load("text", "*", load, mtime)
@@ -0,0 +1,241 @@
+# services/tracing.py
+
+import contextvars
+import functools
+import inspect
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+
+from app.services.profiler import profile_request, is_admin
+from config import TRACING_ENABLED, TRACE_HISTORY, TRACE_MAX_SPANS
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的追踪记录和所在的 span；asyncio 任务和 run_io 的线程都会继承，
+# Trace 对象本身是共享的，因此并发子任务中的 span 也会记录到同一个请求里
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span", default=None)
+
+_TOKEN_INVALID = re.compile(r"[^A-Za-z0-9_.\-]")
+
+
+class Trace:
+    """一次请求的追踪记录：span 列表，以及（管理员开启时）采样分析的结果"""
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status: Optional[int] = None
+        self.spans: List[dict] = []
+        self.dropped = 0
+        self.profile: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration: float, parent: Optional[str], error: bool = False):
+        with self._lock:
+            if len(self.spans) >= TRACE_MAX_SPANS:
+                self.dropped += 1
+                return
+            span = {
+                "name": name,
+                "parent": parent,
+                "start_ms": round((start - self.origin) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3)
+            }
+            if error:
+                span["error"] = True
+            self.spans.append(span)
+
+    def finish(self, status: Optional[int] = None):
+        self.duration = time.perf_counter() - self.origin
+        self.status = status
+
+    def summary(self) -> "OrderedDict[str, dict]":
+        """按 span 名称汇总总耗时和次数（并发的 span 耗时会累加，可能超过请求总耗时）"""
+        totals = OrderedDict()
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            entry = totals.setdefault(span["name"], {"duration_ms": 0.0, "count": 0})
+            entry["duration_ms"] += span["duration_ms"]
+            entry["count"] += 1
+        return totals
+
+    def server_timing(self) -> str:
+        """Server-Timing 响应头：每个 span 名称一项，另加 total（到响应头发出为止的耗时）"""
+        items = []
+        for name, entry in self.summary().items():
+            item = f"{_TOKEN_INVALID.sub('_', name)};dur={entry['duration_ms']:.1f}"
+            if entry["count"] > 1:
+                item += f';desc="x{entry["count"]}"'
+            items.append(item)
+        items.append(f"total;dur={(time.perf_counter() - self.origin) * 1000:.1f}")
+        return ", ".join(items)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "summary": self.summary(),
+            "spans": spans,
+            "dropped_spans": self.dropped,
+            "profile": self.profile
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """记录代码块的耗时；当前请求没有开启追踪时不做任何事"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        trace.add(name, start, time.perf_counter() - start, parent, error)
+        _current_span.reset(token)
+
+
+def traced(name: str):
+    """函数装饰器（同步和异步函数都可以）：每次调用记录一个 span"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TraceStore:
+    """最近的 JSON 追踪记录（按请求顺序，超出 TRACE_HISTORY 时丢弃最早的）"""
+
+    def __init__(self, max_entries: int = TRACE_HISTORY):
+        self.max_entries = max_entries
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+
+    def put(self, trace: Trace):
+        self._traces[trace.id] = trace
+        while len(self._traces) > self.max_entries:
+            self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        return self._traces.get(trace_id)
+
+    def recent(self) -> List[dict]:
+        return [
+            {
+                "id": trace.id,
+                "method": trace.method,
+                "path": trace.path,
+                "started_at": trace.started_at,
+                "status": trace.status,
+                "duration_ms": round(trace.duration * 1000, 3) if trace.duration is not None else None,
+                "profiled": trace.profile is not None
+            }
+            for trace in reversed(self._traces.values())
+        ]
+
+
+# 进程内共享的追踪记录，由 /system/traces 读取
+trace_store = TraceStore()
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _flag(scope, header: bytes, param: str) -> bool:
+    """请求头（X-Trace: 1）或查询参数（?_trace=1）开启的选项"""
+    if _header(scope, header) in ("1", "true"):
+        return True
+    query = scope.get("query_string", b"").decode("latin-1")
+    return any(item in (f"{param}=1", f"{param}=true") for item in query.split("&"))
+
+
+class TracingMiddleware:
+    """
+    为每个 HTTP 请求创建追踪记录，在响应头中加入 Server-Timing
+
+    - X-Trace: 1（或 ?_trace=1）：请求结束后保存 JSON 追踪记录，响应头 X-Trace-Id 指向 /system/traces/{id}
+    - X-Profile: 1（或 ?_profile=1）加正确的 X-Admin-Token：对这个请求运行采样分析，结果随追踪记录保存
+
+    流式响应的响应头在第一个事件之前就已发出，Server-Timing 只包含此前的 span，完整的耗时见 JSON 追踪记录
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope.get("method", ""), scope.get("path", ""))
+        keep = _flag(scope, b"x-trace", "_trace")
+        profiling = _flag(scope, b"x-profile", "_profile") and is_admin(_header(scope, b"x-admin-token"))
+        keep = keep or profiling
+        status = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                if keep:
+                    headers.append((b"x-trace-id", trace.id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_trace.set(trace)
+        try:
+            if profiling:
+                async with profile_request(trace):
+                    await self.app(scope, receive, send_with_timing)
+            else:
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            trace.finish(status)
+            if keep:
+                trace_store.put(trace)
+                logger.info(f"请求追踪 {trace.id}: {trace.method} {trace.path} {trace.duration * 1000:.1f}ms")
@@ -0,0 +1,189 @@
+"""
+端到端基准测试：通过 FastAPI 应用（进程内 ASGI，不经过网络）请求各接口，上游为合成图的 MockTransport
+
+场景:
+- search_offline:   本地数据完整的查询（hybrid 模式走离线路径）
+- search_page:      用游标翻页
+- citation_network: 引用网络可视化数据
+- paper_citations:  单篇论文的引用（经过共享客户端、限流器和 MockTransport）
+- search_online:    本地没有数据的新查询（分页获取、评分、保存），之后等待后台引用网络任务完成
+
+用法（在 backend 目录下运行，不指定 --data-dir 时使用临时目录）:
+    python -m benchmarks.bench_api --requests 50 --concurrency 4 --online-requests 5
+"""
+import argparse
+import asyncio
+import json
+import logging
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import summarize, use_data_dir
+from benchmarks.corpus import add_graph_arguments, graph_from_args, generate_query_dir
+from benchmarks.synthetic import mock_transport
+
+OFFLINE_QUERY = "bench offline"
+
+
+async def measure(name: str, requests: int, concurrency: int, send) -> dict:
+    """发送 requests 个请求（最多 concurrency 个同时进行），send(i) 返回 httpx.Response"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    samples, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send(i)
+            samples.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 6),
+        "throughput_rps": round(requests / elapsed, 3) if elapsed > 0 else None,
+        **summarize(samples)
+    }
+
+
+async def wait_for_jobs(job_runner, queries: list, timeout: float) -> dict:
+    """等待这些查询的后台引用网络任务全部结束"""
+    start = time.perf_counter()
+    jobs = []
+    while time.perf_counter() - start < timeout:
+        jobs = [job_runner.find("networks", query) for query in queries]
+        if all(job is None or job.finished for job in jobs):
+            break
+        await asyncio.sleep(0.05)
+    return {
+        "jobs": len([job for job in jobs if job is not None]),
+        "completed": len([job for job in jobs if job is not None and job.status == "completed"]),
+        "seconds": round(time.perf_counter() - start, 6)
+    }
+
+
+async def run_async(args) -> dict:
+    # app 模块在切换数据目录之后导入
+    import httpx
+    from app.services.client import SemanticScholarClient, start_client, close_client
+    from app.services.jobs import job_runner
+    from app.services.network_store import close_network_stores
+    from app.services.rate_limiter import AdaptiveRateLimiter
+    from app.services.response_cache import ResponseCache, CACHE_OFF
+    from main import app
+
+    logging.getLogger().setLevel(args.log_level)
+
+    graph = graph_from_args(args)
+    corpus = generate_query_dir(graph, OFFLINE_QUERY, args.papers, args.networks)
+    top_ids = [graph.papers[i]["paperId"] for i in graph.query_papers(OFFLINE_QUERY, 100)]
+
+    # 默认不限速（只测应用自身的开销），--upstream-rps 可以模拟真实的限流
+    rate = args.upstream_rps if args.upstream_rps > 0 else 1e9
+    client = SemanticScholarClient(
+        transport=mock_transport(graph, args.upstream_latency),
+        limiter=AdaptiveRateLimiter(rate=rate, burst=max(1, int(min(rate, 1000))),
+                                    max_concurrency=64, initial_concurrency=64),
+        response_cache=ResponseCache(mode=CACHE_OFF)
+    )
+    await start_client(client)
+    await job_runner.start()
+
+    scenarios = []
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                     base_url="http://bench", timeout=None) as api:
+            search_params = {"query": OFFLINE_QUERY, "top_k": args.top_k}
+            first = await api.get("/search_papers", params=search_params)
+            first.raise_for_status()
+            cursor = first.json().get("next_cursor")
+
+            scenarios.append(await measure(
+                "search_offline", args.requests, args.concurrency,
+                lambda i: api.get("/search_papers", params=search_params)
+            ))
+            if cursor:
+                scenarios.append(await measure(
+                    "search_page", args.requests, args.concurrency,
+                    lambda i: api.get("/search_papers/page", params={"cursor": cursor, "limit": args.top_k})
+                ))
+            scenarios.append(await measure(
+                "citation_network", args.requests, args.concurrency,
+                lambda i: api.get(f"/citation_network/{OFFLINE_QUERY}", params={"top_k": args.top_k})
+            ))
+            scenarios.append(await measure(
+                "paper_citations", args.requests, args.concurrency,
+                lambda i: api.get(f"/paper/{top_ids[i % len(top_ids)]}/citations")
+            ))
+
+            # 查询词不在合成词表中，本地全文索引无法覆盖，一定会在线获取
+            online_queries = [f"onlinebench{args.seed}x{i}" for i in range(args.online_requests)]
+            if online_queries:
+                scenarios.append(await measure(
+                    "search_online", len(online_queries), 1,
+                    lambda i: api.get("/search_papers", params={
+                        "query": online_queries[i], "top_k": args.top_k, "fetch_size": args.fetch_size
+                    })
+                ))
+                network_jobs = await wait_for_jobs(job_runner, online_queries, args.job_timeout)
+            else:
+                network_jobs = None
+    finally:
+        await job_runner.stop()
+        await close_client()
+        close_network_stores()
+
+    return {
+        "benchmark": "api",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "top_k": args.top_k,
+        "fetch_size": args.fetch_size,
+        "upstream_latency": args.upstream_latency,
+        "upstream_rps": args.upstream_rps,
+        "graph": graph.config,
+        "corpus": corpus,
+        "scenarios": {scenario.pop("scenario"): scenario for scenario in scenarios},
+        "network_jobs": network_jobs,
+        "upstream_requests": dict(graph.requests)
+    }
+
+
+def run(args) -> dict:
+    return asyncio.run(run_async(args))
+
+
+def add_api_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--papers", type=int, default=1000, help="离线查询的论文数量")
+    parser.add_argument("--networks", type=int, default=200, help="离线查询保存引用网络的论文数量")
+    parser.add_argument("--requests", type=int, default=50, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=1, help="同时进行的请求数")
+    parser.add_argument("--online-requests", type=int, default=3, help="在线搜索的新查询数量")
+    parser.add_argument("--fetch-size", type=int, default=1000, help="在线搜索获取的论文数量")
+    parser.add_argument("--top-k", type=int, default=60, help="返回的论文数量")
+    parser.add_argument("--upstream-latency", type=float, default=0.0, help="模拟上游每个请求的延迟（秒）")
+    parser.add_argument("--upstream-rps", type=float, default=0.0, help="上游限流速率，0 表示不限速")
+    parser.add_argument("--job-timeout", type=float, default=120.0, help="等待后台引用网络任务的最长时间（秒）")
+    parser.add_argument("--log-level", default="WARNING", help="应用日志级别")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="端到端接口基准测试")
+    parser.add_argument("--data-dir", help="数据目录（默认使用临时目录，结束后删除）")
+    add_api_arguments(parser)
+    add_graph_arguments(parser)
+    args = parser.parse_args()
+
+    data_dir = use_data_dir(args.data_dir or tempfile.mkdtemp(prefix="paper-bench-"))
+    try:
+        print(json.dumps(run(args), ensure_ascii=False))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
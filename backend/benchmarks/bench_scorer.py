@@ -0,0 +1,76 @@
+"""
+评分函数基准测试：逐篇调用 calculate_paper_score 与 calculate_paper_scores_batch 的对比
+
+用法（在 backend 目录下运行）:
+    python -m benchmarks.bench_scorer --papers 20000 --repeat 5
+"""
+import argparse
+import json
+import random
+
+import numpy as np
+
+from app.services.scorer import calculate_paper_score, calculate_paper_scores_batch
+from benchmarks.common import time_call
+
+VENUES = [
+    "Nature", "Science", "Cell Reports", "ICML", "International Conference on Learning Representations",
+    "Neural Information Processing Systems", "IEEE Transactions on Pattern Analysis", "ACM Computing Surveys",
+    "arXiv.org", "", None
+]
+
+def generate_papers(count: int, seed: int = 42) -> list:
+    """生成字段分布接近真实数据的合成论文"""
+    rng = random.Random(seed)
+    papers = []
+    for i in range(count):
+        words = rng.choice([0, 0, 20, 60, 120, 250])
+        papers.append({
+            "paperId": f"{i:040x}",
+            "citationCount": rng.choice([0, None, int(rng.paretovariate(1.2) * 5)]),
+            "year": rng.choice([None, rng.randint(1990, 2025)]),
+            "venue": rng.choice(VENUES),
+            "abstract": " ".join("token" for _ in range(words)) if words else rng.choice([None, "No abstract"])
+        })
+    return papers
+
+def run(papers_count: int, repeat: int) -> dict:
+    papers = generate_papers(papers_count)
+
+    scalar = np.array([calculate_paper_score(paper) for paper in papers], dtype=np.float64)
+    batch = calculate_paper_scores_batch(papers)
+    if not np.array_equal(scalar, batch):
+        raise AssertionError("批量评分结果与逐篇评分不一致")
+
+    # 列式输入：数值列为 numpy 数组（缺失值用 0 / NaN 表示）
+    table = {
+        "citationCount": np.array([p["citationCount"] or 0 for p in papers], dtype=np.int64),
+        "year": np.array([p["year"] or np.nan for p in papers], dtype=np.float64),
+        "venue": [p["venue"] for p in papers],
+        "abstract": [p["abstract"] for p in papers]
+    }
+    if not np.array_equal(scalar, calculate_paper_scores_batch(table)):
+        raise AssertionError("列式批量评分结果与逐篇评分不一致")
+
+    scalar_time = time_call(lambda: [calculate_paper_score(paper) for paper in papers], repeat)
+    batch_time = time_call(lambda: calculate_paper_scores_batch(papers), repeat)
+    columnar_time = time_call(lambda: calculate_paper_scores_batch(table), repeat)
+
+    return {
+        "benchmark": "scorer",
+        "papers": papers_count,
+        "repeat": repeat,
+        "scalar_seconds": round(scalar_time, 6),
+        "batch_seconds": round(batch_time, 6),
+        "columnar_seconds": round(columnar_time, 6),
+        "speedup": round(scalar_time / batch_time, 2) if batch_time > 0 else None,
+        "columnar_speedup": round(scalar_time / columnar_time, 2) if columnar_time > 0 else None,
+        "identical": True
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="评分函数基准测试")
+    parser.add_argument("--papers", type=int, default=20000, help="合成论文数量")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数（取最短耗时）")
+    args = parser.parse_args()
+    print(json.dumps(run(args.papers, args.repeat), ensure_ascii=False))
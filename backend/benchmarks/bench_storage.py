@@ -0,0 +1,107 @@
+"""
+数据读取路径的基准测试：papers.json 解析、列式存储、引用网络和引用关系索引的加载
+
+用法（在 backend 目录下运行，不指定 --data-dir 时使用临时目录）:
+    python -m benchmarks.bench_storage --papers 5000 --networks 200 --repeat 5
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+from benchmarks.common import time_call, use_data_dir
+from benchmarks.corpus import add_graph_arguments, graph_from_args, generate_query_dir
+
+QUERY = "bench storage"
+
+
+def run(args) -> dict:
+    # app 模块在切换数据目录之后导入
+    from app.services.graph_index import CitationGraphIndex, build_graph_index, graph_index_file
+    from app.services.network_store import load_networks, open_network_store
+    from app.services.paper_store import open_store, papers_file, write_store
+    from app.services.persistence import dumps, loads
+    from app.services.query_cache import query_cache
+    from app.services.result_pages import get_ranked_results
+    from app.services.scorer import ensure_scores
+
+    graph = graph_from_args(args)
+    corpus = generate_query_dir(graph, QUERY, args.papers, args.networks)
+    repeat = args.repeat
+
+    store = open_store(QUERY)
+    papers = store.papers()
+    ensure_scores(papers)
+    # 旧格式的 papers.json（与 json.dump(indent=2) 写入的文件相同）
+    legacy = papers_file(QUERY) + ".bench"
+    with open(legacy, "w", encoding="utf-8") as f:
+        json.dump(papers, f, ensure_ascii=False, indent=2)
+    with open(legacy, "rb") as f:
+        legacy_bytes = f.read()
+
+    networks = load_networks(QUERY)
+    network_ids = list(networks)
+    top_k = min(60, len(store))
+
+    def cold_networks():
+        query_cache.invalidate("networks", QUERY)
+        return load_networks(QUERY)
+
+    def cold_ranked():
+        query_cache.invalidate("ranked")
+        return get_ranked_results(QUERY)
+
+    def top_k_papers():
+        return store.papers(store.rank(store.filter(None, None, None))[:top_k])
+
+    timings = {
+        # papers.json（旧格式）
+        "papers_json_stdlib_seconds": time_call(lambda: json.loads(legacy_bytes.decode("utf-8")), repeat),
+        "papers_json_codec_seconds": time_call(lambda: loads(legacy_bytes), repeat),
+        "papers_json_dumps_seconds": time_call(lambda: dumps(papers), repeat),
+        # 列式存储
+        "store_write_seconds": time_call(lambda: write_store(QUERY, papers), repeat),
+        "store_open_seconds": time_call(lambda: open_store(QUERY).pin_columns(), repeat),
+        "store_top_k_seconds": time_call(top_k_papers, repeat),
+        "store_all_papers_seconds": time_call(lambda: store.papers(), repeat),
+        "ranked_results_cold_seconds": time_call(cold_ranked, repeat),
+        # 引用网络
+        "networks_load_cold_seconds": time_call(cold_networks, repeat),
+        "networks_load_warm_seconds": time_call(lambda: load_networks(QUERY), repeat),
+        "networks_get_many_seconds": time_call(
+            lambda: open_network_store(QUERY).get_many(network_ids[:100]), repeat
+        ),
+        # 引用关系索引
+        "graph_index_build_seconds": time_call(lambda: build_graph_index(store, networks), repeat),
+        "graph_index_load_seconds": time_call(lambda: CitationGraphIndex.load(graph_index_file(QUERY)), repeat),
+    }
+    os.remove(legacy)
+
+    return {
+        "benchmark": "storage",
+        "papers": len(papers),
+        "networks": len(networks),
+        "repeat": repeat,
+        "graph": graph.config,
+        "papers_json_bytes": len(legacy_bytes),
+        "query_dir_bytes": corpus["bytes"],
+        **{name: round(value, 6) for name, value in timings.items()}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据读取路径基准测试")
+    parser.add_argument("--data-dir", help="数据目录（默认使用临时目录，结束后删除）")
+    parser.add_argument("--papers", type=int, default=1000, help="查询的论文数量")
+    parser.add_argument("--networks", type=int, default=200, help="保存引用网络的论文数量")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数（取最短耗时）")
+    add_graph_arguments(parser)
+    args = parser.parse_args()
+
+    data_dir = use_data_dir(args.data_dir or tempfile.mkdtemp(prefix="paper-bench-"))
+    try:
+        print(json.dumps(run(args), ensure_ascii=False))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
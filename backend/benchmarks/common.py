@@ -0,0 +1,81 @@
+"""
+基准测试的公共工具：计时、延迟分布统计、运行环境信息和数据目录切换
+"""
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+def time_call(func, repeat: int) -> float:
+    """返回多次运行中的最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def summarize(samples: list) -> dict:
+    """延迟样本（秒）的分布，单位为毫秒"""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values),
+        "min_ms": round(float(values.min()), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3)
+    }
+
+
+def use_data_dir(path: str) -> str:
+    """
+    让应用的数据目录指向 path（QUERIES_DIR、networks.db、响应缓存等都在其下）
+
+    config 在导入时读取 DATA_DIR 环境变量，因此必须在导入任何 app 模块之前调用
+    """
+    path = os.path.abspath(path)
+    config = sys.modules.get("config")
+    if config is not None and os.path.abspath(config.DATA_DIR) != path:
+        raise RuntimeError(f"config 已经导入，数据目录为 {config.DATA_DIR}，无法切换到 {path}")
+    os.makedirs(path, exist_ok=True)
+    os.environ["DATA_DIR"] = path
+    return path
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment_info() -> dict:
+    """记录在结果中，用于判断两次运行是否可以直接比较"""
+    try:
+        import orjson  # noqa: F401
+        has_orjson = True
+    except ImportError:
+        has_orjson = False
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "orjson": has_orjson
+    }
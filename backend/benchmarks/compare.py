@@ -0,0 +1,84 @@
+"""
+比较两次 run_all 的结果：逐项列出耗时指标的变化，超过阈值的变慢记为回归（退出码为 1）
+
+用法（在 backend 目录下运行）:
+    python -m benchmarks.compare bench-before.json bench-after.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+# 参与比较的指标（越小越好），max/min 等单次样本噪声太大，不参与比较
+TIME_SUFFIXES = ("_seconds", "p50_ms", "p95_ms", "p99_ms", "mean_ms")
+
+
+def flatten(value, prefix: str = "") -> dict:
+    """嵌套字典展开为 "a.b.c" -> 数值"""
+    metrics = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            metrics.update(flatten(item, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        metrics[prefix] = value
+    return metrics
+
+
+def time_metrics(document: dict) -> dict:
+    metrics = {}
+    for result in document.get("results", []):
+        for name, value in flatten(result, result.get("benchmark", "")).items():
+            if name.endswith(TIME_SUFFIXES):
+                metrics[name] = value
+    return metrics
+
+
+def compare(base: dict, new: dict, threshold: float) -> dict:
+    base_metrics, new_metrics = time_metrics(base), time_metrics(new)
+    rows = []
+    for name in sorted(set(base_metrics) & set(new_metrics)):
+        before, after = base_metrics[name], new_metrics[name]
+        change = (after - before) / before if before > 0 else None
+        rows.append({
+            "metric": name,
+            "base": before,
+            "new": after,
+            "change": round(change, 4) if change is not None else None,
+            "regression": change is not None and change > threshold
+        })
+    return {
+        "base": {"commit": base.get("meta", {}).get("commit"), "timestamp": base.get("meta", {}).get("timestamp")},
+        "new": {"commit": new.get("meta", {}).get("commit"), "timestamp": new.get("meta", {}).get("timestamp")},
+        "threshold": threshold,
+        "metrics": rows,
+        "regressions": [row["metric"] for row in rows if row["regression"]],
+        "missing": sorted(set(base_metrics) ^ set(new_metrics))
+    }
+
+
+def print_table(report: dict):
+    print(f"{'指标':<60} {'基准':>12} {'新结果':>12} {'变化':>9}")
+    for row in report["metrics"]:
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "-"
+        flag = "  <- 回归" if row["regression"] else ""
+        print(f"{row['metric']:<60} {row['base']:>12.6g} {row['new']:>12.6g} {change:>9}{flag}")
+    print(f"\n回归 {len(report['regressions'])} 项（阈值 {report['threshold']:.0%}）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="比较两次基准测试结果")
+    parser.add_argument("base", help="基准结果文件（run_all 的输出）")
+    parser.add_argument("new", help="新结果文件")
+    parser.add_argument("--threshold", type=float, default=0.1, help="变慢超过该比例时记为回归")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 而不是表格")
+    args = parser.parse_args()
+
+    with open(args.base, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    report = compare(base, new, args.threshold)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print_table(report)
+    sys.exit(1 if report["regressions"] else 0)
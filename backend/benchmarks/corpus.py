@@ -0,0 +1,131 @@
+"""
+合成查询目录生成器：按在线搜索保存数据的格式，生成论文存储、引用网络和引用关系索引
+
+用法（在 backend 目录下运行，数据写入 --data-dir，不会影响 backend/data）:
+    python -m benchmarks.corpus --data-dir /tmp/paper-bench --queries 3 --papers 1000 --networks 200 \\
+        --graph-papers 20000 --degree-dist pareto --mean-degree 15 --abstract-words 150
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmarks.common import use_data_dir
+from benchmarks.synthetic import SyntheticGraph, DEGREE_DISTRIBUTIONS
+
+# app 模块在调用方切换数据目录之后才导入（config 在导入时确定 DATA_DIR）
+
+
+def add_graph_arguments(parser: argparse.ArgumentParser):
+    """合成图的参数（各基准测试共用）"""
+    parser.add_argument("--graph-papers", type=int, default=20000, help="合成图中的论文总数")
+    parser.add_argument("--degree-dist", choices=DEGREE_DISTRIBUTIONS, default="pareto", help="参考文献数的分布")
+    parser.add_argument("--mean-degree", type=float, default=15, help="平均参考文献数")
+    parser.add_argument("--degree-alpha", type=float, default=2.0, help="pareto 分布的形状参数（越小尾部越重）")
+    parser.add_argument("--abstract-words", type=int, default=150, help="摘要的平均词数")
+    parser.add_argument("--missing-abstract", type=float, default=0.2, help="没有摘要的论文比例")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+
+
+def graph_from_args(args) -> SyntheticGraph:
+    return SyntheticGraph(
+        papers=args.graph_papers,
+        mean_degree=args.mean_degree,
+        degree_dist=args.degree_dist,
+        degree_alpha=args.degree_alpha,
+        abstract_words=args.abstract_words,
+        missing_abstract=args.missing_abstract,
+        seed=args.seed
+    )
+
+
+def query_papers(graph: SyntheticGraph, query: str, count: int) -> list:
+    """查询的论文，字段与 fetch_papers_batch 获取并标注来源后的一致"""
+    from app.services.fetcher import SEARCH_FIELDS
+    papers = []
+    for i in graph.query_papers(query, count):
+        paper = graph.select(i, SEARCH_FIELDS)
+        paper["source"] = "semantic_scholar"
+        papers.append(paper)
+    return papers
+
+
+def paper_network(graph: SyntheticGraph, paper_id: str, edge_limit: int) -> dict:
+    """与 fetch_network 返回格式相同的引用网络"""
+    from app.services.fetcher import RELATION_FIELDS
+    i = graph.index[paper_id]
+    return {
+        "citations": [graph.select(j, RELATION_FIELDS) for j in graph.citations[i][:edge_limit]],
+        "references": [graph.select(j, RELATION_FIELDS) for j in graph.references[i][:edge_limit]]
+    }
+
+
+def generate_query_dir(graph: SyntheticGraph, query: str, papers: int = 1000, networks: int = 200,
+                       build_index: bool = True) -> dict:
+    """
+    生成一个查询目录：保存 papers 篇论文（评分后写入列式存储），
+    为评分最高的 networks 篇保存引用网络，并构建引用关系索引
+    """
+    from app.services.paper_store import save_papers, query_dir
+    from app.services.network_store import open_network_store
+    from app.services.graph_index import get_graph_index
+    from config import NETWORK_EDGE_LIMIT
+
+    timings = {}
+    start = time.perf_counter()
+    records = query_papers(graph, query, papers)
+    save_papers(query, records)
+    timings["papers_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    top = sorted(records, key=lambda p: p["score"], reverse=True)[:networks]
+    open_network_store(query).put_many({
+        paper["paperId"]: paper_network(graph, paper["paperId"], NETWORK_EDGE_LIMIT) for paper in top
+    })
+    timings["networks_seconds"] = time.perf_counter() - start
+
+    if build_index:
+        start = time.perf_counter()
+        index = get_graph_index(query)
+        timings["index_seconds"] = time.perf_counter() - start
+        timings["index_edges"] = index.edge_count
+
+    size = 0
+    for root, _, files in os.walk(query_dir(query)):
+        size += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return {
+        "query": query,
+        "papers": len(records),
+        "networks": len(top),
+        "bytes": size,
+        **{name: round(value, 6) if isinstance(value, float) else value for name, value in timings.items()}
+    }
+
+
+def run(args) -> dict:
+    start = time.perf_counter()
+    graph = graph_from_args(args)
+    graph_seconds = time.perf_counter() - start
+    queries = args.query or [f"synthetic query {i}" for i in range(args.queries)]
+    return {
+        "benchmark": "corpus",
+        "data_dir": os.environ.get("DATA_DIR"),
+        "graph": {**graph.config, "edges": graph.edge_count, "seconds": round(graph_seconds, 6)},
+        "queries": [
+            generate_query_dir(graph, query, args.papers, args.networks, not args.no_index) for query in queries
+        ]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成查询目录")
+    parser.add_argument("--data-dir", required=True, help="数据目录（相当于 backend/data）")
+    parser.add_argument("--queries", type=int, default=1, help="生成的查询数量（未指定 --query 时）")
+    parser.add_argument("--query", action="append", help="查询词，可以指定多次")
+    parser.add_argument("--papers", type=int, default=1000, help="每个查询的论文数量")
+    parser.add_argument("--networks", type=int, default=200, help="每个查询保存引用网络的论文数量")
+    parser.add_argument("--no-index", action="store_true", help="不预先构建引用关系索引")
+    add_graph_arguments(parser)
+    args = parser.parse_args()
+    use_data_dir(args.data_dir)
+    print(json.dumps(run(args), ensure_ascii=False))
@@ -0,0 +1,273 @@
+"""
+本地的 Semantic Scholar Graph API 替身：由合成引用图回答请求，可以注入延迟、429 和 5xx，并模拟配额
+
+支持 /paper/search、/paper/{id}、/paper/{id}/citations、/paper/{id}/references 和 POST /paper/batch，
+另有 GET /_stats（请求和注入的故障统计）和 POST /_reset（清空统计、重置配额）。
+
+用法（在 backend 目录下运行）:
+    python -m benchmarks.fake_s2 --port 8001 --latency lognormal:80:0.5 --latency batch=lognormal:300:0.5 \\
+        --rate-429 0.05 --rate-5xx 0.01 --quota-rps 10 --quota-burst 20
+    # 后端指向替身（另一个终端）
+    SEMANTIC_SCHOLAR_API_URL=http://127.0.0.1:8001/graph/v1 uvicorn main:app --port 8000
+
+延迟格式（毫秒）: fixed:50 / uniform:20:80 / normal:50:10 / lognormal:<中位数>:<sigma> / exp:<均值>，
+可以加接口前缀（search= / batch= / citations= / references= / paper=）单独设置某个接口
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.corpus import add_graph_arguments, graph_from_args
+from benchmarks.synthetic import SyntheticGraph
+
+ENDPOINTS = ("search", "batch", "citations", "references", "paper")
+SERVER_ERRORS = (500, 502, 503, 504)
+
+
+class LatencyModel:
+    """响应延迟的分布，参数单位为毫秒，sample() 返回秒"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        name, *params = spec.split(":")
+        try:
+            values = [float(p) for p in params]
+        except ValueError:
+            raise ValueError(f"无效的延迟参数: {spec}")
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+        if name not in expected and not params:
+            # 只写一个数字等同于 fixed
+            name, values = "fixed", [float(name)]
+        if name not in expected or len(values) != expected[name]:
+            raise ValueError(f"无效的延迟分布: {spec}")
+        self.name = name
+        self.values = values
+
+    def sample(self, rng: random.Random) -> float:
+        v = self.values
+        if self.name == "fixed":
+            ms = v[0]
+        elif self.name == "uniform":
+            ms = rng.uniform(v[0], v[1])
+        elif self.name == "normal":
+            ms = rng.gauss(v[0], v[1])
+        elif self.name == "lognormal":
+            ms = v[0] * math.exp(rng.gauss(0, v[1]))
+        else:
+            ms = rng.expovariate(1 / v[0]) if v[0] > 0 else 0
+        return max(ms, 0.0) / 1000
+
+
+def parse_latency(specs: List[str]) -> Dict[str, LatencyModel]:
+    """["lognormal:80:0.5", "batch=fixed:300"] -> {"default": ..., "batch": ...}"""
+    models = {"default": LatencyModel("0")}
+    for spec in specs or []:
+        endpoint, _, dist = spec.rpartition("=")
+        endpoint = endpoint or "default"
+        if endpoint not in ENDPOINTS and endpoint != "default":
+            raise ValueError(f"未知的接口: {endpoint}，可选 {', '.join(ENDPOINTS)}")
+        models[endpoint] = LatencyModel(dist)
+    return models
+
+
+class Quota:
+    """API Key 的速率配额（令牌桶），超出时返回需要等待的秒数"""
+
+    def __init__(self, rps: float, burst: int):
+        self.rps = rps
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def acquire(self) -> Optional[float]:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rps)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rps
+
+
+class FakeSemanticScholar:
+    """
+    合成图 + 故障注入，与传输方式无关：create_app() 包装成 HTTP 服务，transport() 包装成进程内的 httpx transport
+
+    处理顺序：配额（超出时立即 429，带 Retry-After）-> 延迟 -> 按概率注入 429 / 5xx -> 合成图的响应
+    """
+
+    def __init__(self, graph: SyntheticGraph, latency: Dict[str, LatencyModel] = None,
+                 rate_429: float = 0.0, rate_5xx: float = 0.0, retry_after: float = 0.0,
+                 quota_rps: float = 0.0, quota_burst: int = 1, seed: int = 42):
+        self.graph = graph
+        self.latency = latency or parse_latency([])
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after  # 注入的 429 携带的 Retry-After（秒），0 表示不带
+        self.quota_rps = quota_rps
+        self.quota_burst = quota_burst
+        self.quota = Quota(quota_rps, quota_burst) if quota_rps > 0 else None
+        self.rng = random.Random(seed)
+        self.config = {
+            "latency": {endpoint: model.spec for endpoint, model in self.latency.items()},
+            "rate_429": rate_429,
+            "rate_5xx": rate_5xx,
+            "retry_after": retry_after,
+            "quota_rps": quota_rps,
+            "quota_burst": quota_burst
+        }
+        self.reset()
+
+    def reset(self):
+        self.statuses = Counter()
+        self.injected = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.graph.requests.clear()
+        if self.quota is not None:
+            self.quota = Quota(self.quota_rps, self.quota_burst)
+
+    @staticmethod
+    def endpoint_of(path: str) -> str:
+        path = path[path.find("/paper"):] if "/paper" in path else path
+        if path == "/paper/search":
+            return "search"
+        if path == "/paper/batch":
+            return "batch"
+        if path.endswith("/citations"):
+            return "citations"
+        if path.endswith("/references"):
+            return "references"
+        return "paper"
+
+    async def respond(self, method: str, path: str, params: dict, body=None) -> Tuple[int, object, dict]:
+        """返回 (状态码, JSON 数据, 响应头)"""
+        endpoint = self.endpoint_of(path)
+        if self.quota is not None:
+            wait = self.quota.acquire()
+            if wait is not None:
+                self.injected["quota_429"] += 1
+                return self._count(429, {"message": "Too Many Requests"}, {"Retry-After": str(math.ceil(wait))})
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            delay = self.latency.get(endpoint, self.latency["default"]).sample(self.rng)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            roll = self.rng.random()
+            if roll < self.rate_429:
+                self.injected["429"] += 1
+                headers = {"Retry-After": f"{self.retry_after:g}"} if self.retry_after > 0 else {}
+                return self._count(429, {"message": "Too Many Requests"}, headers)
+            if roll < self.rate_429 + self.rate_5xx:
+                status = self.rng.choice(SERVER_ERRORS)
+                self.injected[str(status)] += 1
+                return self._count(status, {"message": "Injected server error"}, {})
+
+            status, payload = self.graph.handle(method, path, params, body)
+            return self._count(status, payload, {})
+        finally:
+            self.in_flight -= 1
+
+    def _count(self, status: int, payload, headers: dict) -> Tuple[int, object, dict]:
+        self.statuses[status] += 1
+        return status, payload, headers
+
+    def stats(self) -> dict:
+        total = sum(self.statuses.values())
+        return {
+            "config": self.config,
+            "graph": self.graph.config,
+            "served": dict(self.graph.requests),  # 合成图实际回答的请求（不含注入的故障）
+            "responses": total,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "injected": dict(self.injected),
+            "error_rate": round(1 - self.statuses[200] / total, 4) if total else 0.0,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight
+        }
+
+    def transport(self) -> httpx.MockTransport:
+        """进程内使用（注入 SemanticScholarClient），不需要启动服务器"""
+        async def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content) if request.content else None
+            status, payload, headers = await self.respond(
+                request.method, request.url.path, dict(request.url.params), body
+            )
+            return httpx.Response(status, json=payload, headers=headers)
+
+        return httpx.MockTransport(handler)
+
+
+def create_app(fake: FakeSemanticScholar):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI(title="Fake Semantic Scholar Graph API")
+
+    @app.get("/_stats")
+    async def get_stats():
+        return fake.stats()
+
+    @app.post("/_reset")
+    async def reset_stats():
+        fake.reset()
+        return {"reset": True}
+
+    @app.api_route("/{path:path}", methods=["GET", "POST"])
+    async def graph_api(path: str, request: Request):
+        body = await request.body()
+        status, payload, headers = await fake.respond(
+            request.method, "/" + path, dict(request.query_params), json.loads(body) if body else None
+        )
+        return JSONResponse(payload, status_code=status, headers=headers)
+
+    return app
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    """故障注入和配额的参数（替身服务器和负载测试共用）"""
+    parser.add_argument("--latency", action="append", default=[],
+                        help="响应延迟分布，例如 lognormal:80:0.5 或 batch=fixed:300，可以指定多次")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="随机返回 429 的比例")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="随机返回 5xx 的比例")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="注入的 429 携带的 Retry-After（秒）")
+    parser.add_argument("--quota-rps", type=float, default=0.0, help="配额：每秒请求数，0 表示不限制")
+    parser.add_argument("--quota-burst", type=int, default=1, help="配额：允许的突发请求数")
+
+
+def fake_from_args(graph: SyntheticGraph, args) -> FakeSemanticScholar:
+    return FakeSemanticScholar(
+        graph,
+        latency=parse_latency(args.latency),
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+        quota_rps=args.quota_rps,
+        quota_burst=args.quota_burst,
+        seed=args.seed
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地 Semantic Scholar Graph API 替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    add_fault_arguments(parser)
+    add_graph_arguments(parser)
+    args = parser.parse_args()
+
+    fake = fake_from_args(graph_from_args(args), args)
+    print(json.dumps({"graph": fake.graph.config, "edges": fake.graph.edge_count, **fake.config}, ensure_ascii=False))
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
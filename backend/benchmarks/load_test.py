@@ -0,0 +1,215 @@
+"""
+负载测试：模拟并发用户会话请求后端接口，统计各接口的 p50/p95/p99 延迟、状态码和吞吐量
+
+每个会话循环执行：搜索（查询词按 Zipf 分布从查询池中选择，热门查询会并发重复）-> 用游标翻页 ->
+引用网络 -> 前几篇结果的引用列表，每轮之间按指数分布停顿。
+
+两种运行方式（在 backend 目录下运行）:
+    # 进程内：后端应用和 Semantic Scholar 替身都在本进程中（不需要启动任何服务，数据写入临时目录）
+    python -m benchmarks.load_test --in-process --sessions 20 --duration 60 \\
+        --latency lognormal:80:0.5 --rate-429 0.05 --rate-5xx 0.01 --quota-rps 20 --quota-burst 20
+
+    # 外部服务：先启动 benchmarks.fake_s2 和指向它的后端，--upstream 用于读取替身的统计
+    python -m benchmarks.load_test --target http://127.0.0.1:8000 --upstream http://127.0.0.1:8001 \\
+        --sessions 20 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from benchmarks.common import environment_info, summarize, use_data_dir
+from benchmarks.corpus import add_graph_arguments, graph_from_args
+from benchmarks.fake_s2 import add_fault_arguments, fake_from_args
+
+
+class LoadRecorder:
+    """按接口记录每个请求的延迟和状态码"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.failures = Counter()  # 没有收到响应（连接错误、超时）
+
+    async def call(self, name: str, request):
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError as e:
+            self.failures[name] += 1
+            self.statuses[name][type(e).__name__] += 1
+            return None
+        self.samples[name].append(time.perf_counter() - start)
+        self.statuses[name][str(response.status_code)] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name in sorted(set(self.samples) | set(self.statuses)):
+            statuses = self.statuses[name]
+            total = sum(statuses.values())
+            endpoints[name] = {
+                "requests": total,
+                "errors": total - statuses.get("200", 0),
+                "throughput_rps": round(total / elapsed, 3) if elapsed > 0 else None,
+                "statuses": dict(statuses),
+                **summarize(self.samples[name])
+            }
+        total = sum(sum(statuses.values()) for statuses in self.statuses.values())
+        return {
+            "requests": total,
+            "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+            "throughput_rps": round(total / elapsed, 3) if elapsed > 0 else None,
+            "endpoints": endpoints
+        }
+
+
+def choose_query(rng: random.Random, queries: list, skew: float) -> str:
+    """Zipf 分布：排名靠前的查询被选中的概率更高（skew 为 0 时均匀）"""
+    weights = [1 / (rank + 1) ** skew for rank in range(len(queries))]
+    return rng.choices(queries, weights=weights)[0]
+
+
+async def run_session(api: httpx.AsyncClient, recorder: LoadRecorder, args, session_id: int,
+                      queries: list, deadline: float) -> int:
+    """一个用户会话，返回完成的轮数"""
+    rng = random.Random(args.seed * 1000 + session_id)
+    rounds = 0
+    while time.monotonic() < deadline and (not args.iterations or rounds < args.iterations):
+        query = choose_query(rng, queries, args.query_skew)
+        response = await recorder.call("search_papers", api.get("/search_papers", params={
+            "query": query, "top_k": args.top_k, "fetch_size": args.fetch_size
+        }))
+        data = response.json() if response is not None and response.status_code == 200 else {}
+
+        cursor = data.get("next_cursor")
+        for _ in range(args.pages):
+            if not cursor:
+                break
+            page = await recorder.call("search_papers_page", api.get(
+                "/search_papers/page", params={"cursor": cursor, "limit": args.top_k}
+            ))
+            cursor = page.json().get("next_cursor") if page is not None and page.status_code == 200 else None
+
+        await recorder.call("citation_network", api.get(f"/citation_network/{query}", params={"top_k": args.top_k}))
+        for paper in (data.get("results") or [])[:args.details]:
+            await recorder.call("paper_citations", api.get(f"/paper/{paper['id']}/citations"))
+
+        rounds += 1
+        if args.think_time > 0:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+    return rounds
+
+
+async def drive(api: httpx.AsyncClient, args) -> dict:
+    recorder = LoadRecorder()
+    queries = [f"loadtest topic {i}" for i in range(args.queries)]
+    start = time.perf_counter()
+    deadline = time.monotonic() + args.duration
+    rounds = await asyncio.gather(*(
+        run_session(api, recorder, args, i, queries, deadline) for i in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - start
+    return {"elapsed_seconds": round(elapsed, 3), "rounds": sum(rounds), **recorder.report(elapsed)}
+
+
+async def run_in_process(args) -> dict:
+    # app 模块在切换数据目录之后导入
+    from app.services.client import SemanticScholarClient, start_client, close_client
+    from app.services.jobs import job_runner
+    from app.services.network_store import close_network_stores
+    from app.services.rate_limiter import AdaptiveRateLimiter
+    from app.services.response_cache import ResponseCache, CACHE_OFF
+    from main import app
+
+    logging.getLogger().setLevel(args.log_level)
+    fake = fake_from_args(graph_from_args(args), args)
+    # 默认使用应用配置的限流参数；--client-rps 可以放宽，观察配额和故障注入下的行为
+    limiter = None
+    if args.client_rps > 0:
+        limiter = AdaptiveRateLimiter(rate=args.client_rps, burst=max(1, int(args.client_rps)))
+    client = SemanticScholarClient(
+        transport=fake.transport(), limiter=limiter, response_cache=ResponseCache(mode=CACHE_OFF)
+    )
+    await start_client(client)
+    await job_runner.start()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load",
+                                     timeout=args.timeout) as api:
+            result = await drive(api, args)
+        result["client"] = client.stats()
+        result["upstream"] = fake.stats()
+    finally:
+        await job_runner.stop()
+        await close_client()
+        close_network_stores()
+    return result
+
+
+async def run_remote(args) -> dict:
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout) as api:
+        result = await drive(api, args)
+        try:
+            result["client"] = (await api.get("/system/client_stats")).json()
+        except (httpx.HTTPError, ValueError):
+            result["client"] = None
+    if args.upstream:
+        try:
+            async with httpx.AsyncClient(base_url=args.upstream, timeout=10) as upstream:
+                result["upstream"] = (await upstream.get("/_stats")).json()
+        except (httpx.HTTPError, ValueError):
+            result["upstream"] = None
+    return result
+
+
+def run(args) -> dict:
+    result = asyncio.run(run_in_process(args) if args.in_process else run_remote(args))
+    return {
+        "benchmark": "load",
+        "meta": environment_info(),
+        "mode": "in_process" if args.in_process else args.target,
+        "sessions": args.sessions,
+        "duration": args.duration,
+        **result
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发用户会话负载测试")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="后端地址（--in-process 时忽略）")
+    parser.add_argument("--upstream", help="Semantic Scholar 替身的地址，用于读取 /_stats")
+    parser.add_argument("--in-process", action="store_true", help="在本进程中运行后端和替身")
+    parser.add_argument("--data-dir", help="进程内模式的数据目录（默认使用临时目录，结束后删除）")
+    parser.add_argument("--sessions", type=int, default=10, help="并发会话数")
+    parser.add_argument("--duration", type=float, default=30.0, help="测试时长（秒）")
+    parser.add_argument("--iterations", type=int, default=0, help="每个会话最多执行的轮数，0 表示不限")
+    parser.add_argument("--queries", type=int, default=10, help="查询池大小")
+    parser.add_argument("--query-skew", type=float, default=1.0, help="查询热度的 Zipf 指数")
+    parser.add_argument("--pages", type=int, default=1, help="每轮翻页次数")
+    parser.add_argument("--details", type=int, default=2, help="每轮查看引用列表的论文数")
+    parser.add_argument("--think-time", type=float, default=1.0, help="每轮之间的平均停顿（秒）")
+    parser.add_argument("--top-k", type=int, default=20, help="每次返回的论文数量")
+    parser.add_argument("--fetch-size", type=int, default=300, help="在线搜索获取的论文数量")
+    parser.add_argument("--timeout", type=float, default=300.0, help="单个请求的超时（秒）")
+    parser.add_argument("--client-rps", type=float, default=0.0,
+                        help="进程内模式下客户端限流速率，0 表示使用应用配置")
+    parser.add_argument("--log-level", default="WARNING", help="进程内模式的应用日志级别")
+    add_fault_arguments(parser)
+    add_graph_arguments(parser)
+    args = parser.parse_args()
+
+    data_dir = None
+    if args.in_process:
+        data_dir = use_data_dir(args.data_dir or tempfile.mkdtemp(prefix="paper-load-"))
+    try:
+        print(json.dumps(run(args), ensure_ascii=False))
+    finally:
+        if data_dir and not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
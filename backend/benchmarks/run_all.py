@@ -0,0 +1,67 @@
+"""
+运行全部基准测试，输出一个 JSON 文档（运行环境 + 各项结果），可以用 benchmarks.compare 比较两次运行
+
+用法（在 backend 目录下运行）:
+    python -m benchmarks.run_all --output bench-before.json
+    python -m benchmarks.run_all --quick --only storage --only api
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+
+from benchmarks.common import environment_info, use_data_dir
+from benchmarks.corpus import add_graph_arguments
+from benchmarks.bench_api import add_api_arguments
+
+BENCHMARKS = ("scorer", "storage", "api")
+
+
+def run(args) -> dict:
+    # 各基准测试模块会导入 app，必须在切换数据目录之后导入
+    results = []
+    for name in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+        print(f"运行基准测试: {name}", file=sys.stderr)
+        if name == "scorer":
+            from benchmarks import bench_scorer
+            results.append(bench_scorer.run(args.scorer_papers, args.repeat))
+        elif name == "storage":
+            from benchmarks import bench_storage
+            results.append(bench_storage.run(args))
+        elif name == "api":
+            from benchmarks import bench_api
+            results.append(bench_api.run(args))
+    return {"meta": {**environment_info(), "args": vars(args)}, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="运行全部基准测试")
+    parser.add_argument("--output", help="结果写入的文件（默认输出到标准输出）")
+    parser.add_argument("--only", action="append", choices=BENCHMARKS, help="只运行指定的基准测试，可以指定多次")
+    parser.add_argument("--quick", action="store_true", help="缩小数据规模和请求数，用于快速检查")
+    parser.add_argument("--data-dir", help="数据目录（默认使用临时目录，结束后删除）")
+    parser.add_argument("--scorer-papers", type=int, default=20000, help="评分基准测试的论文数量")
+    parser.add_argument("--repeat", type=int, default=5, help="微基准测试的重复次数（取最短耗时）")
+    add_api_arguments(parser)
+    add_graph_arguments(parser)
+    args = parser.parse_args()
+    if args.quick:
+        args.scorer_papers, args.repeat = 2000, 2
+        args.graph_papers, args.papers, args.networks = 3000, 500, 100
+        args.requests, args.online_requests, args.fetch_size = 10, 1, 300
+
+    data_dir = use_data_dir(args.data_dir or tempfile.mkdtemp(prefix="paper-bench-"))
+    try:
+        document = json.dumps(run(args), ensure_ascii=False, indent=2)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(document + "\n")
+        print(f"结果已写入 {args.output}", file=sys.stderr)
+    else:
+        print(document)
@@ -0,0 +1,263 @@
+"""
+合成引用图：生成字段和分布接近 Semantic Scholar 的论文及引用关系，并按 Graph API 的格式回答请求
+
+- 论文按发表时间排列，每篇论文只引用更早的论文；出度服从可配置的分布，
+  被引用的论文按优先连接（已有引用越多越容易被引用）选择，入度呈长尾分布
+- 每个查询词对应一个固定的论文子集和排序（由查询词决定，可重复）
+- handle() 不依赖任何 HTTP 框架，mock_transport() 把它包装成 httpx 的 MockTransport，
+  基准测试可以注入到 SemanticScholarClient 中，完全不访问网络
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+VENUES = [
+    "Nature", "Science", "Cell Reports", "ICML", "International Conference on Learning Representations",
+    "Neural Information Processing Systems", "IEEE Transactions on Pattern Analysis", "ACM Computing Surveys",
+    "arXiv.org", "", None
+]
+
+FIELDS_OF_STUDY = [["Computer Science"], ["Computer Science", "Mathematics"], ["Medicine"], ["Biology"], ["Physics"], None]
+
+PUBLICATION_TYPES = [["JournalArticle"], ["Conference"], ["Review"], ["JournalArticle", "Review"], None]
+
+# 摘要和标题的词表（按 Zipf 分布抽样），查询词使用词表之外的词时本地全文索引不会命中
+VOCABULARY = (
+    "model learning graph network neural data method results analysis performance training task approach "
+    "system information deep language representation structure algorithm evaluation dataset feature "
+    "knowledge retrieval attention transformer citation semantic embedding inference optimization "
+    "generation benchmark framework clustering classification prediction signal protein cell gene "
+    "quantum energy material surface temperature estimation robust efficient scalable sparse adaptive"
+).split()
+
+DEGREE_DISTRIBUTIONS = ("pareto", "poisson", "fixed")
+
+# 引用/参考文献接口每页的上限（与 Semantic Scholar 一致）
+RELATION_PAGE_LIMIT = 1000
+# /paper/batch 一次最多的论文ID数
+BATCH_MAX_IDS = 500
+
+_PAPER_PATH = re.compile(r"^/paper/(?P<paper_id>[^/]+?)(?:/(?P<relation>citations|references))?$")
+
+
+def _words(rng: random.Random, count: int, cum_weights: List[float]) -> str:
+    return " ".join(rng.choices(VOCABULARY, cum_weights=cum_weights, k=count))
+
+
+def sample_degrees(count: int, mean: float, distribution: str = "pareto", alpha: float = 2.0,
+                   seed: int = 42) -> np.ndarray:
+    """
+    每篇论文的参考文献数
+
+    pareto 为长尾分布（alpha 越小尾部越重，需要大于 1），poisson 集中在均值附近，fixed 全部等于均值
+    """
+    rng = np.random.default_rng(seed)
+    if distribution == "fixed":
+        degrees = np.full(count, mean)
+    elif distribution == "poisson":
+        degrees = rng.poisson(mean, count)
+    elif distribution == "pareto":
+        if alpha <= 1:
+            raise ValueError("pareto 分布的 alpha 必须大于 1")
+        scale = mean * (alpha - 1) / alpha  # 使期望等于 mean
+        degrees = (rng.pareto(alpha, count) + 1) * scale
+    else:
+        raise ValueError(f"未知的度分布: {distribution}，可选 {', '.join(DEGREE_DISTRIBUTIONS)}")
+    return np.rint(degrees).astype(np.int64)
+
+
+class SyntheticGraph:
+    """内存中的合成论文库和引用图"""
+
+    def __init__(self, papers: int = 5000, mean_degree: float = 15, degree_dist: str = "pareto",
+                 degree_alpha: float = 2.0, abstract_words: int = 150, missing_abstract: float = 0.2,
+                 results_per_query: int = 1000, nested_limit: int = 500, seed: int = 42):
+        self.size = papers
+        self.results_per_query = results_per_query
+        self.nested_limit = nested_limit  # /paper/batch 中嵌套的引用列表最多返回多少条
+        self.seed = seed
+        self.config = {
+            "papers": papers,
+            "mean_degree": mean_degree,
+            "degree_dist": degree_dist,
+            "degree_alpha": degree_alpha,
+            "abstract_words": abstract_words,
+            "missing_abstract": missing_abstract,
+            "results_per_query": results_per_query,
+            "nested_limit": nested_limit,
+            "seed": seed
+        }
+
+        self.papers: List[dict] = []
+        self.index = {}
+        self.references: List[List[int]] = [[] for _ in range(papers)]
+        self.citations: List[List[int]] = [[] for _ in range(papers)]
+        self.requests = Counter()  # 按接口统计收到的请求数
+
+        self._build_edges(sample_degrees(papers, mean_degree, degree_dist, degree_alpha, seed))
+        self._build_papers(abstract_words, missing_abstract)
+
+    @property
+    def edge_count(self) -> int:
+        return sum(len(refs) for refs in self.references)
+
+    def _build_edges(self, degrees: np.ndarray):
+        """优先连接：pool 中每篇论文出现 1 + 被引次数 次，均匀抽样即按引用数加权"""
+        rng = random.Random(self.seed)
+        pool: List[int] = []
+        for i, degree in enumerate(degrees.tolist()):
+            targets = set()
+            wanted = min(degree, i)
+            attempts = 0
+            while len(targets) < wanted and attempts < wanted * 4:
+                targets.add(pool[int(rng.random() * len(pool))])
+                attempts += 1
+            refs = sorted(targets, reverse=True)
+            self.references[i] = refs
+            for target in refs:
+                self.citations[target].append(i)
+            pool.append(i)
+            pool.extend(refs)
+        # 引用列表按时间倒序（最新的引用在前），与 Semantic Scholar 一致
+        for cites in self.citations:
+            cites.reverse()
+
+    def _build_papers(self, abstract_words: int, missing_abstract: float):
+        rng = random.Random(self.seed + 1)
+        cum_weights, total = [], 0.0
+        for rank in range(len(VOCABULARY)):
+            total += 1.0 / (rank + 1)
+            cum_weights.append(total)
+
+        first_year, last_year = 1990, 2025
+        for i in range(self.size):
+            paper_id = hashlib.sha1(f"{self.seed}:{i}".encode("ascii")).hexdigest()
+            year = first_year + (last_year - first_year) * i // max(self.size - 1, 1)
+            if rng.random() < missing_abstract:
+                abstract = None
+            else:
+                abstract = _words(rng, max(5, int(rng.gauss(abstract_words, abstract_words / 3))), cum_weights)
+            self.papers.append({
+                "paperId": paper_id,
+                "title": _words(rng, rng.randint(4, 12), cum_weights).capitalize(),
+                "authors": [
+                    {"authorId": str(rng.randint(1, 10 ** 8)), "name": f"Author {rng.randint(1, 50000)}"}
+                    for _ in range(rng.randint(1, 6))
+                ],
+                "abstract": abstract,
+                "year": year,
+                "citationCount": len(self.citations[i]),
+                "referenceCount": len(self.references[i]),
+                "venue": rng.choice(VENUES),
+                "url": f"https://www.semanticscholar.org/paper/{paper_id}",
+                "openAccessPdf": {"url": f"https://example.org/{paper_id}.pdf"} if rng.random() < 0.3 else None,
+                "fieldsOfStudy": rng.choice(FIELDS_OF_STUDY),
+                "publicationTypes": rng.choice(PUBLICATION_TYPES),
+                "publicationDate": f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            })
+            self.index[paper_id] = i
+
+    @lru_cache(maxsize=64)
+    def _query_order(self, query: str) -> np.ndarray:
+        rng = np.random.default_rng(zlib.crc32(query.encode("utf-8")) ^ self.seed)
+        return rng.permutation(self.size)
+
+    def query_papers(self, query: str, count: int = None) -> List[int]:
+        """查询词对应的论文（按相关性排序的下标），前缀与 count 无关"""
+        count = self.results_per_query if count is None else count
+        return self._query_order(query)[:min(count, self.size)].tolist()
+
+    def select(self, i: int, fields: Optional[str]) -> dict:
+        """按 fields 参数裁剪论文字段；citations.x / references.x 为嵌套列表"""
+        paper = self.papers[i]
+        result = {"paperId": paper["paperId"]}
+        nested = {}
+        for field in (fields or "title").split(","):
+            field = field.strip()
+            if "." in field:
+                relation, sub = field.split(".", 1)
+                nested.setdefault(relation, []).append(sub)
+            elif field in ("citations", "references"):
+                nested.setdefault(field, [])
+            elif field and field != "paperId":
+                result[field] = paper.get(field)
+        for relation, subfields in nested.items():
+            if relation not in ("citations", "references"):
+                continue
+            related = (self.citations if relation == "citations" else self.references)[i][:self.nested_limit]
+            sub = ",".join(subfields) if subfields else "title"
+            result[relation] = [self.select(j, sub) for j in related]
+        return result
+
+    def handle(self, method: str, path: str, params: dict, body=None) -> Tuple[int, object]:
+        """按 Graph API 的路径和参数返回 (状态码, JSON 数据)，path 可以带 /graph/v1 之类的前缀"""
+        position = path.find("/paper/")
+        path = path[position:] if position >= 0 else path
+        fields = params.get("fields")
+
+        if method == "GET" and path == "/paper/search":
+            self.requests["search"] += 1
+            offset, limit = int(params.get("offset", 0)), int(params.get("limit", 100))
+            if limit > 100:
+                return 400, {"error": "Requested limit exceeds maximum of 100"}
+            ids = self.query_papers(params.get("query", ""))
+            data = [self.select(i, fields) for i in ids[offset:offset + limit]]
+            result = {"total": len(ids), "offset": offset, "data": data}
+            if offset + limit < len(ids):
+                result["next"] = offset + limit
+            return 200, result
+
+        if method == "POST" and path == "/paper/batch":
+            self.requests["batch"] += 1
+            ids = (body or {}).get("ids") or []
+            if len(ids) > BATCH_MAX_IDS:
+                return 400, {"error": f"Cannot process more than {BATCH_MAX_IDS} ids"}
+            return 200, [
+                self.select(self.index[pid], fields) if pid in self.index else None
+                for pid in ids
+            ]
+
+        match = _PAPER_PATH.match(path)
+        if method == "GET" and match:
+            paper_id, relation = match.group("paper_id"), match.group("relation")
+            self.requests[relation or "paper"] += 1
+            i = self.index.get(paper_id)
+            if i is None:
+                return 404, {"error": f"Paper with id {paper_id} not found"}
+            if relation is None:
+                return 200, self.select(i, fields)
+            offset, limit = int(params.get("offset", 0)), int(params.get("limit", 100))
+            if limit > RELATION_PAGE_LIMIT:
+                return 400, {"error": f"Requested limit exceeds maximum of {RELATION_PAGE_LIMIT}"}
+            related = (self.citations if relation == "citations" else self.references)[i]
+            item_key = "citingPaper" if relation == "citations" else "citedPaper"
+            result = {"offset": offset, "data": [
+                {item_key: self.select(j, fields)} for j in related[offset:offset + limit]
+            ]}
+            if offset + limit < len(related):
+                result["next"] = offset + limit
+            return 200, result
+
+        self.requests["other"] += 1
+        return 404, {"error": f"Not found: {method} {path}"}
+
+
+def mock_transport(graph: SyntheticGraph, latency: float = 0.0) -> httpx.MockTransport:
+    """把合成图包装成 httpx transport；latency 为每个请求的固定延迟（秒）"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency > 0:
+            await asyncio.sleep(latency)
+        body = json.loads(request.content) if request.content else None
+        status, payload = graph.handle(request.method, request.url.path, dict(request.url.params), body)
+        return httpx.Response(status, json=payload)
+
+    return httpx.MockTransport(handler)
@@ -8,8 +8,10 @@ class SearchMode(Enum):
     OFFLINE = "offline" # 本地数据
     HYBRID = "hybrid"   # 优先本地，本地没有再用API
 
-# Semantic Scholar API的基础URL
-SEMANTIC_SCHOLAR_API_URL = "https://api.semanticscholar.org/graph/v1"
+# Semantic Scholar API的基础URL（可通过环境变量指向本地模拟服务器）
+SEMANTIC_SCHOLAR_API_URL = os.getenv(
+    "SEMANTIC_SCHOLAR_API_URL", "https://api.semanticscholar.org/graph/v1"
+)
 
 # 论文质量评分的最低阈值，低于此分数的论文将被过滤
 MIN_SCORE_THRESHOLD = 20
@@ -20,14 +22,52 @@ MAX_PARALLEL_REQUESTS = 5
 # 默认获取的论文数量，用于确保有足够的论文进行筛选
 DEFAULT_FETCH_SIZE = 1000
 
+# 自适应获取（/search_papers?adaptive=true）：top-k 稳定后不再请求后续页
+ADAPTIVE_FETCH_ENABLED = False       # 默认是否启用
+ADAPTIVE_FETCH_CONFIDENCE = 0.95     # 剩余页面预计进入 top-k 的论文数不超过 (1 - 置信度) * top_k 时停止
+ADAPTIVE_FETCH_MIN_PAGES = 2         # 至少获取的页数
+ADAPTIVE_FETCH_WINDOW_PAGES = 2      # 用最近几页估计后续页面的论文进入 top-k 的比例
+
 # API 限流配置
 MAX_CONCURRENT_REQUESTS = 2  # 最大并发请求数
 REQUEST_INTERVAL = 1.0      # 请求间隔（秒）
 
+# 自适应限流器配置（令牌桶 + AIMD 并发控制）
+RATE_LIMIT_RPS = 1.0 / REQUEST_INTERVAL   # 令牌桶速率（每秒请求数）
+RATE_LIMIT_BURST = 2                      # 令牌桶容量（允许的突发请求数）
+RATE_LIMIT_MIN_CONCURRENCY = 1            # 并发上限的下限
+RATE_LIMIT_MAX_CONCURRENCY = 8            # 并发上限的上限
+RATE_LIMIT_INITIAL_CONCURRENCY = MAX_CONCURRENT_REQUESTS  # 初始并发上限
+RATE_LIMIT_INCREASE_STEP = 1.0            # 每个并发窗口成功后增加的并发数（加性增）
+RATE_LIMIT_DECREASE_FACTOR = 0.5          # 遇到429时并发上限的缩减系数（乘性减）
+RATE_LIMIT_DEFAULT_BACKOFF = 2.0          # 429 未带 Retry-After 时的暂停时间（秒）
+RATE_LIMIT_MAX_BACKOFF = 60.0             # Retry-After 的最长暂停时间（秒）
+
+# 共享HTTP客户端（连接池）配置
+HTTP_TIMEOUT = 60.0                   # 请求超时（秒）
+HTTP_MAX_CONNECTIONS = 20             # 连接池最大连接数
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10   # 保持活跃的空闲连接数上限
+HTTP_KEEPALIVE_EXPIRY = 30.0          # 空闲连接保留时间（秒）
+HTTP2_ENABLED = False                 # 是否启用HTTP/2（需要额外安装 h2）
+
+# Semantic Scholar 响应的磁盘缓存
+# 模式: readwrite（默认）/ offline（只读缓存，未命中时不请求上游，用于离线重放）/ off
+RESPONSE_CACHE_MODE = os.getenv("RESPONSE_CACHE_MODE", "readwrite")
+RESPONSE_CACHE_MAX_BYTES = 1024 * 1024 * 1024   # 缓存总大小上限，超过后按最近访问时间淘汰
+RESPONSE_CACHE_TTLS = {                          # 各接口响应的有效期（秒），0 表示不缓存
+    "search": 24 * 3600,
+    "batch": 7 * 24 * 3600,
+    "citations": 7 * 24 * 3600,
+    "references": 7 * 24 * 3600,
+    "paper": 7 * 24 * 3600,
+    "other": 0
+}
+
 # 添加新的配置
 SEARCH_MODE = SearchMode.HYBRID  # 默认使用混合模式
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")  # 数据存储目录
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(__file__), "data"))  # 数据存储目录（基准测试等可通过环境变量指向临时目录）
 QUERIES_DIR = os.path.join(DATA_DIR, "queries")  # 按查询词存储的目录
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", os.path.join(DATA_DIR, "http_cache.db"))  # 响应缓存数据库
 
 # 创建必要的目录
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -36,3 +76,71 @@ os.makedirs(QUERIES_DIR, exist_ok=True)
 # 添加配置项
 NETWORK_CACHE_SIZE = 200  # 存储更多的引用网络，比如200篇
 NETWORK_MINIMUM_REQUIRED = 100  # 最少需要100篇才能离线使用
+SIMPLIFIED_PAPER_COUNT = 150  # 简化版 papers.txt 保留的高分论文数量
+
+# 引用网络预取配置
+NETWORK_PREFETCH_WORKERS = 4       # 并发 worker 数量（实际请求速率仍由限流器控制）
+NETWORK_PREFETCH_MAX_RETRIES = 3   # 单篇论文失败后的最大重试次数
+NETWORK_PREFETCH_RETRY_DELAY = 2.0 # 首次重试的延迟（秒），之后指数增长
+NETWORK_PREFETCH_LOG_EVERY = 10    # 每完成多少篇输出一次进度日志
+NETWORK_EDGE_LIMIT = 100           # 每篇论文保存的引用/参考文献条数上限
+PAPER_RELATION_MAX_RETRIES = 5     # /paper/{id}/citations 等接口的 max_retries 参数上限
+
+# 全局引用网络存储（按 paperId 去重，所有查询共享）
+NETWORKS_DB = os.path.join(DATA_DIR, "networks.db")
+NETWORK_FRESHNESS_TTL = 7 * 24 * 3600  # 其他查询获取的网络在多少秒内可以直接复用
+
+# 持久化（序列化和文件读写放到线程池中，不阻塞事件循环）
+PERSIST_IO_WORKERS = 4                 # I/O 线程池大小
+NETWORK_WRITE_BATCH_SIZE = 20          # 引用网络累积多少篇后批量写入
+NETWORK_WRITE_FLUSH_INTERVAL = 1.0     # 引用网络最多延迟多少秒写入
+
+# 后台任务（引用网络预取在搜索返回后继续进行）
+NETWORK_PREFETCH_IN_BACKGROUND = True        # /search_papers 是否把引用网络获取交给后台任务
+JOBS_DIR = os.path.join(DATA_DIR, "jobs")    # 任务状态持久化目录（每个任务一个 JSON 文件）
+JOB_WORKERS = 2                              # 同时运行的后台任务数
+JOB_PERSIST_INTERVAL = 2.0                   # 任务进度最多每隔多少秒写入一次磁盘
+JOB_RETENTION = 24 * 3600                    # 已完成的任务在磁盘上保留多久（秒）
+
+# 运行指标（/metrics，Prometheus 文本格式）
+METRICS_PREFIX = "paper_insight_"                                              # 指标名前缀
+METRICS_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)        # 上游请求耗时的分桶（秒）
+METRICS_WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60)      # 限流器和信号量等待时间的分桶（秒）
+METRICS_STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)  # 搜索流程各阶段耗时的分桶（秒）
+
+# 请求追踪（Server-Timing 响应头、JSON 追踪记录）和单请求采样分析
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"  # 是否记录各阶段的 span 并输出 Server-Timing
+TRACE_HISTORY = 100                  # 保留最近多少条请求的 JSON 追踪记录（请求带 X-Trace: 1 时保存）
+TRACE_MAX_SPANS = 2000               # 单个请求最多记录的 span 数，超出的只计数
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # 管理员令牌（X-Admin-Token），为空时不允许采样分析
+PROFILE_INTERVAL = 0.005             # 采样分析的采样间隔（秒）
+PROFILE_MAX_DURATION = 300.0         # 单次采样分析的最长时间（秒），超时后停止采样
+PROFILE_TOP_STACKS = 50              # 返回的调用栈数量（按样本数排序）
+
+# 搜索结果统计（/search_papers 的 stats、/search_stats 和搜索日志）
+SEARCH_STATS_SCORE_BINS = (50, 60, 70, 80, 90)           # 分数分布的分桶边界
+SEARCH_STATS_CITATION_BINS = (1, 10, 100, 1000, 10000)   # 引用数分布的分桶边界
+SEARCH_STATS_TOP_N = 10                                   # 期刊/会议和研究领域各返回前几名
+
+# /paper_network 子网络扩展配置
+PAPER_NETWORK_MAX_DEPTH = 4        # 允许的最大扩展层数
+PAPER_NETWORK_MAX_FANOUT = 10      # 每个节点允许保留的最大论文数
+PAPER_NETWORK_MAX_NODES = 200      # 单次扩展最多加入的节点数（达到后不再加入新节点，上游请求数不超过其 2 倍）
+PAPER_NETWORK_PARALLEL = 4         # 同时展开的节点数（每个节点并发请求引用和参考文献）
+
+# 进程内查询缓存（解析后的论文数据和引用网络）
+QUERY_CACHE_MAX_ENTRIES = 32                 # 最多缓存的项数（每个查询的论文、网络各算一项）
+QUERY_CACHE_MAX_BYTES = 512 * 1024 * 1024    # 缓存总大小上限（按数据在磁盘上的大小估算）
+QUERY_CACHE_TTL = 600.0                      # 缓存项的最长存活时间（秒）
+QUERY_CACHE_REVALIDATE_INTERVAL = 5.0        # 每隔多少秒检查一次源文件修改时间（期间不访问磁盘）
+
+# 跨查询全文索引（本地语料足够覆盖新查询时不再在线检索）
+TEXT_INDEX_BM25_K1 = 1.2                # BM25 词频饱和参数
+TEXT_INDEX_BM25_B = 0.75                # BM25 文档长度归一化参数
+TEXT_INDEX_TITLE_WEIGHT = 2             # 标题中的词项按几倍词频计算
+TEXT_INDEX_MIN_MATCHES = 300            # 同时包含全部查询词的论文达到多少篇时覆盖度为满分
+TEXT_INDEX_COVERAGE_THRESHOLD = 0.8     # 覆盖度不低于此值时使用本地数据回答新查询
+
+# /paper/batch 批量接口配置
+PAPER_BATCH_SIZE = 100             # 每个批量请求包含的论文ID数（接口上限500）
+PAPER_BATCH_PARALLEL = 4           # 同时进行的批量请求数
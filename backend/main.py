@@ -1,16 +1,35 @@
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.routers.search import router as search_router
 from app.routers.paper import router as paper_router
 from app.routers.network import router as network_router
+from app.routers.system import router as system_router
+from app.routers.jobs import router as jobs_router
+from app.routers.metrics import router as metrics_router
+from app.services.client import start_client, close_client
+from app.services.network_store import close_network_stores
+from app.services.jobs import job_runner
+from app.services.tracing import TracingMiddleware
 
 # 配置日志记录
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时创建共享的 Semantic Scholar 客户端，关闭时释放连接池
+    await start_client()
+    # 启动后台任务队列（恢复上次未完成的任务），关闭时先停止任务再释放连接池
+    await job_runner.start()
+    yield
+    await job_runner.stop()
+    await close_client()
+    close_network_stores()
+
+app = FastAPI(lifespan=lifespan)
 
 # 配置CORS中间件，允许前端访问
 app.add_middleware(
@@ -25,9 +44,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # 允许所有HTTP方法
     allow_headers=["*"],  # 允许所有请求头
+    expose_headers=["Server-Timing", "X-Trace-Id"],  # 前端可以读取各阶段耗时和追踪记录编号
 )
 
+# 请求追踪：Server-Timing 响应头、可选的 JSON 追踪记录和管理员的单请求采样分析
+app.add_middleware(TracingMiddleware)
+
 # 注册路由模块
 app.include_router(search_router)  # 搜索相关的路由
 app.include_router(paper_router)   # 论文详情相关的路由
 app.include_router(network_router) # 引用网络相关的路由
+app.include_router(system_router)  # 系统状态相关的路由
+app.include_router(jobs_router)    # 后台任务相关的路由
+app.include_router(metrics_router) # Prometheus 指标
@@ -0,0 +1,17 @@
+"""
+测试的公共配置：数据目录指向临时目录（必须在导入任何 app 模块之前设置）
+"""
+import tempfile
+import uuid
+
+import pytest
+
+from benchmarks.common import use_data_dir
+
+DATA_DIR = use_data_dir(tempfile.mkdtemp(prefix="paper-search-tests-"))
+
+
+@pytest.fixture
+def query() -> str:
+    """每个测试使用不同的查询词，避免共享数据目录中的数据互相影响"""
+    return f"test query {uuid.uuid4().hex[:8]}"
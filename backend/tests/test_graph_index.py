@@ -0,0 +1,100 @@
+"""/citation_network 使用 CSR 引用关系索引，输出与逐篇遍历引用网络的旧实现完全一致"""
+import asyncio
+import random
+
+import pytest
+
+from app.routers.network import get_citation_network
+from app.services.network_store import load_networks, open_network_store
+from app.services.paper_store import get_store, save_papers
+
+
+def legacy_citation_network(query: str, top_k, min_score) -> dict:
+    """改用索引之前的实现：按分数逐篇读取论文，再遍历每篇论文的引用网络"""
+    store = get_store(query)
+    top_papers, seen_ids = [], set()
+    for index in store.rank(store.filter(min_score=min_score)):
+        if top_k is not None and len(top_papers) >= top_k:
+            break
+        paper = store.paper(int(index), with_abstract=False)
+        if paper["paperId"] not in seen_ids:
+            seen_ids.add(paper["paperId"])
+            top_papers.append(paper)
+
+    nodes = [{
+        "id": paper["paperId"],
+        "title": paper.get("title", "Unknown"),
+        "year": paper.get("year", "Unknown"),
+        "authors": [author.get("name", "") for author in paper.get("authors", [])],
+        "citations_count": paper.get("citationCount", 0),
+        "score": paper.get("score", 0),
+        "type": "main"
+    } for paper in top_papers]
+
+    edges, edge_set = [], set()
+    networks = load_networks(query)
+    for paper in top_papers:
+        paper_id = paper["paperId"]
+        network = networks.get(paper_id, {"citations": [], "references": []})
+        for citation in network.get("citations", []):
+            citing_id = citation.get("paperId")
+            if citing_id in seen_ids and f"{citing_id}->{paper_id}" not in edge_set:
+                edges.append({"source": citing_id, "target": paper_id, "type": "citation"})
+                edge_set.add(f"{citing_id}->{paper_id}")
+        for reference in network.get("references", []):
+            ref_id = reference.get("paperId")
+            if ref_id in seen_ids and f"{paper_id}->{ref_id}" not in edge_set:
+                edges.append({"source": paper_id, "target": ref_id, "type": "reference"})
+                edge_set.add(f"{paper_id}->{ref_id}")
+    return {"nodes": nodes, "edges": edges}
+
+
+@pytest.fixture
+def corpus(query) -> str:
+    """带有重复论文、缺失字段、自引用、重复边和语料之外的引用的随机语料"""
+    rng = random.Random(7)
+    ids = [f"p{i}" for i in range(150)]
+    papers = []
+    for i, paper_id in enumerate(ids):
+        paper = {"paperId": paper_id, "title": f"Paper {i}", "authors": [{"name": f"Author {i}"}]}
+        if i % 5:
+            paper["year"] = rng.randint(1995, 2025)
+        if i % 7:
+            paper["citationCount"] = rng.choice([0, 1, 3, 10, 10, 50, 400])
+        if i % 3 == 0:
+            paper["venue"] = rng.choice(["Nature", "ICML", "Unknown Workshop"])
+        papers.append(paper)
+    # 同一篇论文出现多次（字段不同，分数也不同）
+    papers += [dict(papers[i], citationCount=rng.randint(0, 1000)) for i in rng.sample(range(150), 20)]
+    rng.shuffle(papers)
+    save_papers(query, papers)
+
+    def neighbours():
+        pool = ids + [f"external{i}" for i in range(30)] + [None]
+        return [{"paperId": rng.choice(pool)} for _ in range(rng.randint(0, 25))]
+
+    open_network_store(query).put_many({
+        paper_id: {"citations": neighbours(), "references": neighbours() + [{"paperId": paper_id}]}
+        for paper_id in ids if rng.random() < 0.9
+    })
+    return query
+
+
+@pytest.mark.parametrize("top_k", [None, 1, 10, 37, 149, 150, 500])
+@pytest.mark.parametrize("min_score", [0, 45, 60, 200])
+def test_csr_output_matches_legacy(corpus, top_k, min_score):
+    response = asyncio.run(get_citation_network(corpus, top_k=top_k, min_score=min_score))
+    expected = legacy_citation_network(corpus, top_k, min_score)
+    assert response["nodes"] == expected["nodes"]
+    assert response["edges"] == expected["edges"]
+    assert response["stats"]["total_edges"] == len(expected["edges"])
+
+
+def test_index_follows_network_updates(corpus):
+    before = asyncio.run(get_citation_network(corpus, top_k=None, min_score=0))
+    top = [node["id"] for node in before["nodes"][:2]]
+    open_network_store(corpus).put(top[0], {"citations": [], "references": [{"paperId": top[1]}]})
+
+    after = asyncio.run(get_citation_network(corpus, top_k=None, min_score=0))
+    assert after["edges"] == legacy_citation_network(corpus, None, 0)["edges"]
+    assert {"source": top[0], "target": top[1], "type": "reference"} in after["edges"]
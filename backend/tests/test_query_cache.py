@@ -0,0 +1,89 @@
+"""进程内查询缓存的失效：本进程写入、其他进程修改文件、TTL 和容量淘汰"""
+import os
+import time
+
+from app.services.network_store import load_networks, open_network_store
+from app.services.paper_store import get_store, save_papers
+from app.services.query_cache import QueryCache
+
+
+class Source:
+    """记录加载次数的数据源"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.loads = 0
+        with open(path, "w") as f:
+            f.write("1")
+
+    def load(self):
+        self.loads += 1
+        with open(self.path) as f:
+            return f.read(), 1
+
+    def mtime(self) -> float:
+        return os.path.getmtime(self.path)
+
+
+def test_hit_until_bumped(tmp_path):
+    cache, source = QueryCache(revalidate_interval=60), Source(str(tmp_path / "data"))
+    assert cache.get_or_load("papers", "q", source.load, source.mtime) == "1"
+    assert cache.get_or_load("papers", "q", source.load, source.mtime) == "1"
+    assert source.loads == 1
+
+    cache.bump("papers", "q")
+    cache.get_or_load("papers", "q", source.load, source.mtime)
+    assert source.loads == 2
+    # 其他类型和其他 key 不受影响
+    cache.get_or_load("networks", "q", source.load, source.mtime)
+    cache.bump("papers", "other")
+    cache.get_or_load("networks", "q", source.load, source.mtime)
+    assert source.loads == 3
+
+
+def test_external_modification_detected_after_revalidate_interval(tmp_path):
+    cache, source = QueryCache(revalidate_interval=0), Source(str(tmp_path / "data"))
+    cache.get_or_load("papers", "q", source.load, source.mtime)
+    cache.get_or_load("papers", "q", source.load, source.mtime)
+    assert source.loads == 1
+
+    with open(source.path, "w") as f:
+        f.write("2")
+    os.utime(source.path, (time.time() + 10, time.time() + 10))
+    assert cache.get_or_load("papers", "q", source.load, source.mtime) == "2"
+    assert source.loads == 2
+
+
+def test_ttl_and_capacity(tmp_path):
+    source = Source(str(tmp_path / "data"))
+    cache = QueryCache(ttl=0)
+    cache.get_or_load("papers", "q", source.load, source.mtime)
+    cache.get_or_load("papers", "q", source.load, source.mtime)
+    assert source.loads == 2
+
+    cache = QueryCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.get_or_load("papers", key, source.load, source.mtime)
+    assert cache.stats()["evictions"] == 1
+    cache.get_or_load("papers", "a", source.load, source.mtime)
+    assert source.loads == 6
+
+
+def test_saving_papers_invalidates_store(query):
+    save_papers(query, [{"paperId": "a", "year": 2020, "citationCount": 1}])
+    store = get_store(query)
+    assert get_store(query) is store
+
+    save_papers(query, [{"paperId": "a", "year": 2020, "citationCount": 1}, {"paperId": "b", "year": 2021}])
+    reopened = get_store(query)
+    assert reopened is not store
+    assert [paper["paperId"] for paper in reopened.papers()] == ["a", "b"]
+
+
+def test_saving_networks_invalidates_loaded_networks(query):
+    networks = open_network_store(query)
+    networks.put("a", {"citations": [], "references": []})
+    assert set(load_networks(query)) == {"a"}
+
+    networks.put("b", {"citations": [{"paperId": "a"}], "references": []})
+    assert load_networks(query)["b"]["citations"] == [{"paperId": "a"}]
@@ -0,0 +1,85 @@
+"""游标翻页：往返、篡改的游标和过期的游标"""
+import asyncio
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+from app.routers.search import search_papers_page
+from app.services.paper_store import save_papers
+from app.services.persistence import dumps
+from app.services.result_pages import decode_cursor, encode_cursor, get_ranked_results
+
+
+def make_papers(count: int) -> list:
+    return [
+        {"paperId": f"p{i}", "title": f"Paper {i}", "year": 2000 + i % 25, "citationCount": (i * 37) % 500,
+         "venue": "Nature" if i % 7 == 0 else "", "authors": [{"name": f"Author {i}"}]}
+        for i in range(count)
+    ]
+
+
+def page(cursor: str, limit: int = 20) -> dict:
+    return asyncio.run(search_papers_page(cursor=cursor, limit=limit))
+
+
+def test_cursor_round_trip():
+    state = {"q": "graph neural networks", "f": [2015, None, 60.5], "o": 40, "v": "123"}
+    assert decode_cursor(encode_cursor(state)) == {
+        "query": "graph neural networks", "filters": (2015, None, 60.5), "offset": 40, "version": "123"
+    }
+
+
+def test_paging_returns_every_ranked_paper_once(query):
+    save_papers(query, make_papers(95))
+    ranked = get_ranked_results(query, 2005, None, None)
+    expected = [paper["paperId"] for paper in ranked.page(0, len(ranked))]
+
+    seen, cursor = [], ranked.cursor(0)
+    while cursor is not None:
+        response = page(cursor, limit=20)
+        assert response["offset"] == len(seen)
+        assert response["qualified_papers"] == len(ranked)
+        seen += [paper["id"] for paper in response["results"]]
+        cursor = response["next_cursor"]
+    assert seen == expected
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    "",
+    base64.urlsafe_b64encode(b"[1, 2, 3]").decode(),
+    base64.urlsafe_b64encode(dumps({"q": "x", "f": [None, None], "o": 0, "v": "1"})).decode(),
+    base64.urlsafe_b64encode(dumps({"q": "x", "f": [None, None, None], "o": -20, "v": "1"})).decode(),
+    base64.urlsafe_b64encode(dumps({"q": 1, "f": [None, None, None], "o": 0, "v": "1"})).decode(),
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+    with pytest.raises(HTTPException) as error:
+        page(cursor)
+    assert error.value.status_code == 400
+
+
+def test_tampered_cursor_is_rejected(query):
+    save_papers(query, make_papers(30))
+    state = decode_cursor(get_ranked_results(query).cursor(0))
+    # 改动了版本号的游标不能用来读取结果
+    cursor = encode_cursor({"q": state["query"], "f": list(state["filters"]), "o": 0, "v": state["version"] + "0"})
+    with pytest.raises(HTTPException) as error:
+        page(cursor)
+    assert error.value.status_code == 409
+
+
+def test_cursor_from_older_store_version_is_rejected(query):
+    save_papers(query, make_papers(30))
+    cursor = get_ranked_results(query).cursor(0)
+    assert page(cursor, limit=5)["showing"] == 5
+
+    save_papers(query, make_papers(31))
+    with pytest.raises(HTTPException) as error:
+        page(cursor)
+    assert error.value.status_code == 409
+
+    fresh = get_ranked_results(query).cursor(0)
+    assert page(fresh, limit=50)["showing"] == 31
@@ -0,0 +1,98 @@
+"""批量评分与逐篇评分的一致性，以及评分器版本变化时已保存分数的失效"""
+import numpy as np
+import pytest
+
+from app.services import paper_store, scorer
+from app.services.paper_store import get_store, load_papers, save_papers
+from app.services.scorer import calculate_paper_score, calculate_paper_scores_batch, ensure_scores
+
+LONG_ABSTRACT = " ".join(["word"] * 120)
+
+EDGE_CASES = [
+    {"paperId": "complete", "year": 2020, "citationCount": 150, "venue": "Nature", "abstract": LONG_ABSTRACT},
+    {"paperId": "empty"},
+    {"paperId": "no-year", "citationCount": 10, "venue": "ICML"},
+    {"paperId": "year-none", "year": None, "citationCount": 3},
+    {"paperId": "year-string", "year": "2021", "citationCount": 3},
+    {"paperId": "year-float", "year": 2015.0},
+    {"paperId": "year-zero", "year": 0, "citationCount": 1},
+    {"paperId": "no-citations", "year": 2010, "venue": "Science"},
+    {"paperId": "citations-none", "year": 2010, "citationCount": None},
+    {"paperId": "citations-zero", "year": 2010, "citationCount": 0},
+    {"paperId": "citations-float", "year": 2010, "citationCount": 12.5},
+    {"paperId": "citations-string", "year": 2010, "citationCount": "12"},
+    {"paperId": "no-venue", "year": 2022, "citationCount": 5, "abstract": "short abstract here"},
+    {"paperId": "venue-none", "year": 2022, "venue": None},
+    {"paperId": "venue-empty", "year": 2022, "venue": ""},
+    {"paperId": "venue-mixed-case", "year": 2022, "venue": "Proceedings of NeurIPS"},
+    {"paperId": "venue-unknown", "year": 2022, "venue": "Journal of Nothing"},
+    {"paperId": "abstract-invalid", "year": 2019, "abstract": "  No Abstract "},
+    {"paperId": "abstract-blank", "year": 2019, "abstract": "   "},
+    {"paperId": "abstract-not-string", "year": 2019, "abstract": ["not", "a", "string"]},
+]
+
+
+def scalar_scores(papers):
+    return np.array([calculate_paper_score(paper) for paper in papers], dtype=np.float64)
+
+
+def test_batch_matches_scalar_on_edge_cases():
+    np.testing.assert_array_equal(calculate_paper_scores_batch(EDGE_CASES), scalar_scores(EDGE_CASES))
+
+
+def test_columnar_input_matches_scalar():
+    columns = {
+        "citationCount": [paper.get("citationCount") for paper in EDGE_CASES],
+        "year": [paper.get("year") for paper in EDGE_CASES],
+        "venue": [paper.get("venue") for paper in EDGE_CASES],
+        "abstract": [paper.get("abstract") for paper in EDGE_CASES],
+    }
+    np.testing.assert_array_equal(calculate_paper_scores_batch(columns), scalar_scores(EDGE_CASES))
+
+
+def test_batch_returns_nan_where_scalar_raises():
+    papers = [{"year": 2020, "venue": 123}, {"year": 2020, "venue": "Nature"}]
+    with pytest.raises(ValueError):
+        calculate_paper_score(papers[0])
+    scores = calculate_paper_scores_batch(papers)
+    assert np.isnan(scores[0])
+    assert scores[1] == calculate_paper_score(papers[1])
+
+
+def test_ensure_scores_reuses_current_scores():
+    papers = [dict(paper) for paper in EDGE_CASES]
+    assert ensure_scores(papers) == len(papers)
+    assert [paper["score"] for paper in papers] == scalar_scores(EDGE_CASES).tolist()
+    assert ensure_scores(papers) == 0
+
+    papers[0]["citationCount"] = 151
+    assert ensure_scores(papers) == 1
+    assert papers[0]["score"] == calculate_paper_score(papers[0])
+
+
+def test_scorer_version_change_invalidates_stored_scores(query, monkeypatch):
+    save_papers(query, [dict(paper) for paper in EDGE_CASES])
+    old_version = scorer.scorer_version()
+    assert get_store(query).score_version == old_version
+
+    # 模拟评分规则改变：新版本号，且新规则给每篇论文加1分
+    new_version = old_version + "-changed"
+    original_batch = scorer.calculate_paper_scores_batch
+
+    def changed_batch(papers, *args, **kwargs):
+        scores, components = original_batch(papers, *args, **kwargs)
+        return scores + 1, components
+
+    monkeypatch.setattr(scorer, "scorer_version", lambda current_year=None: new_version)
+    monkeypatch.setattr(paper_store, "scorer_version", scorer.scorer_version)
+    monkeypatch.setattr(scorer, "calculate_paper_scores_batch", changed_batch)
+
+    store = get_store(query)
+    assert store.score_version == new_version
+    papers = load_papers(query)
+    assert all(paper["score_version"] == new_version for paper in papers)
+    np.testing.assert_array_equal(
+        np.array([np.nan if paper["score"] is None else paper["score"] for paper in papers]),
+        scalar_scores(EDGE_CASES) + 1
+    )
+    np.testing.assert_array_equal(np.asarray(store.scores), scalar_scores(EDGE_CASES) + 1)
@@ -0,0 +1,150 @@
+"""请求合并（SingleFlight）和按 key 互斥（KeyedLock）的取消语义"""
+import asyncio
+
+import pytest
+
+from app.services.single_flight import KeyedLock, SingleFlight
+
+
+class Call:
+    """可以从外部控制何时完成的调用"""
+
+    def __init__(self):
+        self.started = 0
+        self.finished = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.started += 1
+        number = self.started
+        await self.release.wait()
+        self.finished += 1
+        return number
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_calls_are_coalesced():
+    async def scenario():
+        flight, call = SingleFlight("test"), Call()
+        waiters = [asyncio.create_task(flight.do("key", call)) for _ in range(5)]
+        other = asyncio.create_task(flight.do("other", call))
+        await settle()
+        call.release.set()
+        assert await asyncio.gather(*waiters) == [1] * 5
+        await other
+        assert call.started == 2
+        assert flight.stats()["coalesced"] == 4
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_one_waiter_does_not_cancel_the_call():
+    async def scenario():
+        flight, call = SingleFlight("test"), Call()
+        first = asyncio.create_task(flight.do("key", call))
+        second = asyncio.create_task(flight.do("key", call))
+        await settle()
+        first.cancel()
+        await settle()
+        call.release.set()
+        assert await second == 1
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert call.started == call.finished == 1
+
+    asyncio.run(scenario())
+
+
+def test_call_completes_after_every_waiter_is_cancelled():
+    async def scenario():
+        flight, call = SingleFlight("test"), Call()
+        waiters = [asyncio.create_task(flight.do("key", call)) for _ in range(3)]
+        await settle()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert flight.stats()["in_flight"] == 1
+
+        # 取消后到来的调用仍然合并到进行中的执行上
+        late = asyncio.create_task(flight.do("key", call))
+        await settle()
+        call.release.set()
+        assert await late == 1
+        assert call.finished == 1
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_exceptions_reach_every_waiter_and_are_not_cached():
+    async def scenario():
+        flight, attempts = SingleFlight("test"), []
+
+        async def failing():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failed")
+
+        results = await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert len(attempts) == 1
+
+        with pytest.raises(RuntimeError):
+            await flight.do("key", failing)
+        assert len(attempts) == 2
+
+    asyncio.run(scenario())
+
+
+def test_keyed_lock_serializes_same_key_only():
+    async def scenario():
+        locks, active, peak = KeyedLock("test"), {}, {}
+
+        async def hold(key):
+            async with locks.hold(key):
+                active[key] = active.get(key, 0) + 1
+                peak[key] = max(peak.get(key, 0), active[key])
+                peak["total"] = max(peak.get("total", 0), sum(active.values()))
+                await asyncio.sleep(0.01)
+                active[key] -= 1
+
+        await asyncio.gather(*(hold(key) for key in ("a", "a", "a", "b", "b")))
+        assert peak["a"] == peak["b"] == 1
+        assert peak["total"] == 2
+        assert not locks._locks and not locks._users
+
+    asyncio.run(scenario())
+
+
+def test_keyed_lock_cancelled_waiter_releases_its_slot():
+    async def scenario():
+        locks, release = KeyedLock("test"), asyncio.Event()
+
+        async def holder():
+            async with locks.hold("key"):
+                await release.wait()
+
+        async def waiter():
+            async with locks.hold("key"):
+                pass
+
+        first = asyncio.create_task(holder())
+        await settle()
+        queued = asyncio.create_task(waiter())
+        await settle()
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert locks._users["key"] == 1
+
+        release.set()
+        await first
+        assert not locks._locks and not locks._users
+        await asyncio.wait_for(waiter(), timeout=1)
+
+    asyncio.run(scenario())